@@ -9,6 +9,9 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core.utils.opus_encoder_utils import set_default_profile
+from core.utils.executors import configure_executors
+from core.prefork_server import PreforkServer, supports_prefork
 
 TAG = __name__
 logger = setup_logging()
@@ -42,10 +45,16 @@ async def monitor_stdin():
         await ainput()  # 异步等待输入，消费回车
 
 
-async def main():
+def prepare_config() -> dict:
+    """加载配置并完成进程级的初始化，单进程和多进程模式共用"""
     check_ffmpeg_installed()
     config = load_config()
 
+    # 设置TTS音频的Opus编码档位
+    set_default_profile(config.get("opus_encoder_profile"))
+    # 设置进程级共享线程池的大小和各QoS等级的并发上限
+    configure_executors(config.get("executors"))
+
     # 默认使用manager-api的secret作为auth_key
     # 如果secret为空，则生成随机密钥
     # auth_key用于jwt认证，比如视觉分析接口的jwt认证
@@ -54,16 +63,21 @@ async def main():
         auth_key = str(uuid.uuid4().hex)
     config["server"]["auth_key"] = auth_key
 
-    # 添加 stdin 监控任务
-    stdin_task = asyncio.create_task(monitor_stdin())
+    mcp_endpoint = config.get("mcp_endpoint", None)
+    if mcp_endpoint is not None and "你" not in mcp_endpoint:
+        # 校验MCP接入点格式
+        if validate_mcp_endpoint(mcp_endpoint):
+            logger.bind(tag=TAG).info("mcp接入点是\t{}", mcp_endpoint)
+            # 将mcp计入点地址转成调用点
+            mcp_endpoint = mcp_endpoint.replace("/mcp/", "/call/")
+            config["mcp_endpoint"] = mcp_endpoint
+        else:
+            logger.bind(tag=TAG).error("mcp接入点不符合规范")
+            config["mcp_endpoint"] = "你的接入点 websocket地址"
+    return config
 
-    # 启动 WebSocket 服务器
-    ws_server = WebSocketServer(config)
-    ws_task = asyncio.create_task(ws_server.start())
-    # 启动 Simple http 服务器
-    ota_server = SimpleHttpServer(config)
-    ota_task = asyncio.create_task(ota_server.start())
 
+def log_server_addresses(config: dict):
     read_config_from_api = config.get("read_config_from_api", False)
     port = int(config["server"].get("http_port", 8003))
     if not read_config_from_api:
@@ -77,17 +91,6 @@ async def main():
         get_local_ip(),
         port,
     )
-    mcp_endpoint = config.get("mcp_endpoint", None)
-    if mcp_endpoint is not None and "你" not in mcp_endpoint:
-        # 校验MCP接入点格式
-        if validate_mcp_endpoint(mcp_endpoint):
-            logger.bind(tag=TAG).info("mcp接入点是\t{}", mcp_endpoint)
-            # 将mcp计入点地址转成调用点
-            mcp_endpoint = mcp_endpoint.replace("/mcp/", "/call/")
-            config["mcp_endpoint"] = mcp_endpoint
-        else:
-            logger.bind(tag=TAG).error("mcp接入点不符合规范")
-            config["mcp_endpoint"] = "你的接入点 websocket地址"
 
     # 获取WebSocket配置，使用安全的默认值
     websocket_port = 8000
@@ -111,6 +114,28 @@ async def main():
         "=============================================================\n"
     )
 
+
+def run_prefork(config: dict, workers: int):
+    """多进程模式：主进程加载一次模块，fork出多个工作进程共同监听端口"""
+    ws_server = WebSocketServer(config)
+    ota_server = SimpleHttpServer(config)
+    log_server_addresses(config)
+    PreforkServer(config, ws_server, ota_server, workers).run()
+
+
+async def main(config: dict):
+    # 添加 stdin 监控任务
+    stdin_task = asyncio.create_task(monitor_stdin())
+
+    # 启动 WebSocket 服务器
+    ws_server = WebSocketServer(config)
+    ws_task = asyncio.create_task(ws_server.start())
+    # 启动 Simple http 服务器
+    ota_server = SimpleHttpServer(config)
+    ota_task = asyncio.create_task(ota_server.start())
+
+    log_server_addresses(config)
+
     try:
         await wait_for_exit()  # 阻塞直到收到退出信号
     except asyncio.CancelledError:
@@ -132,7 +157,15 @@ async def main():
 
 
 if __name__ == "__main__":
+    config = prepare_config()
+    workers = int(config["server"].get("workers", 1) or 1)
+    if workers > 1 and not supports_prefork():
+        logger.bind(tag=TAG).warning("当前系统不支持多进程模式，以单进程方式运行")
+        workers = 1
     try:
-        asyncio.run(main())
+        if workers > 1:
+            run_prefork(config, workers)
+        else:
+            asyncio.run(main(config))
     except KeyboardInterrupt:
         print("手动中断，程序终止。")
@@ -1,7 +1,17 @@
 import os
+import json
 import yaml
 from collections.abc import Mapping
-from config.manage_api_client import init_service, get_server_config, get_agent_models
+from config.private_config_cache import PrivateConfigCache
+from config.manage_api_client import (
+    init_service,
+    get_server_config,
+    get_agent_models,
+    get_agent_models_async,
+)
+
+# 设备差异化配置缓存，进程内共享
+_private_config_cache = PrivateConfigCache()
 
 
 def get_project_dir():
@@ -58,6 +68,7 @@ def get_config_from_api(config):
     config_data["manager-api"] = {
         "url": config["manager-api"].get("url", ""),
         "secret": config["manager-api"].get("secret", ""),
+        "private_config_ttl": config["manager-api"].get("private_config_ttl", 60),
     }
     # server的配置以本地为准
     if config.get("server"):
@@ -76,6 +87,29 @@ def get_private_config_from_api(config, device_id, client_id):
     return get_agent_models(device_id, client_id, config["selected_module"])
 
 
+async def get_private_config_from_api_async(config, device_id, client_id):
+    """异步从Java API获取私有配置，带按设备的TTL缓存和并发请求合并
+
+    返回的是副本，调用方可以直接修改
+    """
+    selected_module = config["selected_module"]
+    _private_config_cache.ttl = config.get("manager-api", {}).get(
+        "private_config_ttl", 60
+    )
+    key = (device_id, client_id, json.dumps(selected_module, sort_keys=True))
+
+    async def fetch(etag):
+        return await get_agent_models_async(
+            device_id, client_id, selected_module, etag=etag
+        )
+
+    return await _private_config_cache.get(key, fetch)
+
+
+def get_private_config_cache_stats():
+    return _private_config_cache.get_stats()
+
+
 def ensure_directories(config):
     """确保所有配置路径存在"""
     dirs_to_create = set()
@@ -1,12 +1,16 @@
 import os
 import time
 import base64
+import asyncio
 from typing import Optional, Dict
 
 import httpx
 
 TAG = __name__
 
+# 条件请求命中时（服务端返回304）的占位返回值，表示缓存的数据仍然有效
+NOT_MODIFIED = object()
+
 
 class DeviceNotFoundException(Exception):
     pass
@@ -22,6 +26,9 @@ class ManageApiClient:
     _instance = None
     _client = None
     _secret = None
+    # 异步客户端绑定创建时的事件循环，多进程模式下每个工作进程各自创建
+    _async_client = None
+    _async_client_loop = None
 
     def __new__(cls, config):
         """单例模式确保全局唯一实例，并支持传入配置参数"""
@@ -59,15 +66,50 @@ class ManageApiClient:
             timeout=cls.config.get("timeout", 30),  # 默认超时时间30秒
         )
 
+    @classmethod
+    def _get_async_client(cls) -> "httpx.AsyncClient":
+        """获取当前事件循环的异步连接池"""
+        loop = asyncio.get_running_loop()
+        if cls._async_client is None or cls._async_client_loop is not loop:
+            cls._async_client = httpx.AsyncClient(
+                base_url=cls.config.get("url"),
+                headers=cls._client.headers,
+                timeout=cls.config.get("timeout", 30),
+                limits=httpx.Limits(
+                    max_connections=cls.config.get("max_connections", 100),
+                    max_keepalive_connections=cls.config.get("max_keepalive", 20),
+                ),
+            )
+            cls._async_client_loop = loop
+        return cls._async_client
+
     @classmethod
     def _request(cls, method: str, endpoint: str, **kwargs) -> Dict:
         """发送单次HTTP请求并处理响应"""
         endpoint = endpoint.lstrip("/")
         response = cls._client.request(method, endpoint, **kwargs)
         response.raise_for_status()
+        return cls._parse_result(response.json())
 
-        result = response.json()
+    @classmethod
+    async def _request_async(
+        cls, method: str, endpoint: str, **kwargs
+    ) -> tuple[Optional[Dict], Optional[str]]:
+        """异步发送单次HTTP请求
+
+        Returns:
+            (data, etag)，服务端返回304时data为NOT_MODIFIED
+        """
+        endpoint = endpoint.lstrip("/")
+        response = await cls._get_async_client().request(method, endpoint, **kwargs)
+        if response.status_code == 304:
+            return NOT_MODIFIED, response.headers.get("etag")
+        response.raise_for_status()
+        return cls._parse_result(response.json()), response.headers.get("etag")
 
+    @staticmethod
+    def _parse_result(result: Dict) -> Optional[Dict]:
+        """解析API响应，业务错误转换为异常"""
         # 处理API返回的业务错误
         if result.get("code") == 10041:
             raise DeviceNotFoundException(result.get("msg"))
@@ -117,6 +159,26 @@ class ManageApiClient:
                     # 不重试，直接抛出异常
                     raise
 
+    @classmethod
+    async def _execute_request_async(
+        cls, method: str, endpoint: str, **kwargs
+    ) -> tuple[Optional[Dict], Optional[str]]:
+        """带重试机制的异步请求执行器，重试等待不阻塞事件循环"""
+        retry_count = 0
+
+        while True:
+            try:
+                return await cls._request_async(method, endpoint, **kwargs)
+            except Exception as e:
+                if retry_count < cls.max_retries and cls._should_retry(e):
+                    retry_count += 1
+                    print(
+                        f"{method} {endpoint} 请求失败，将在 {cls.retry_delay:.1f} 秒后进行第 {retry_count} 次重试"
+                    )
+                    await asyncio.sleep(cls.retry_delay)
+                    continue
+                raise
+
     @classmethod
     def safe_close(cls):
         """安全关闭连接池"""
@@ -145,6 +207,30 @@ def get_agent_models(
     )
 
 
+async def get_agent_models_async(
+    mac_address: str,
+    client_id: str,
+    selected_module: Dict,
+    etag: Optional[str] = None,
+) -> tuple[Optional[Dict], Optional[str]]:
+    """异步获取代理模型配置
+
+    Args:
+        etag: 上次返回的ETag，传入时发起条件请求，配置未变化时返回(NOT_MODIFIED, etag)
+    """
+    headers = {"If-None-Match": etag} if etag else None
+    return await ManageApiClient._instance._execute_request_async(
+        "POST",
+        "/config/agent-models",
+        json={
+            "macAddress": mac_address,
+            "clientId": client_id,
+            "selectedModule": selected_module,
+        },
+        headers=headers,
+    )
+
+
 def save_mem_local_short(mac_address: str, short_momery: str) -> Optional[Dict]:
     try:
         return ManageApiClient._instance._execute_request(
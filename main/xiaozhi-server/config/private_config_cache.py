@@ -0,0 +1,107 @@
+"""
+设备差异化配置缓存
+设备断线重连、网络抖动时同一设备会在短时间内多次建立连接，每次都向智控台请求一遍配置既慢又会放大智控台压力：
+- TTL内直接使用缓存
+- 过期后带上次的ETag发起条件请求，配置未变化（304）时只刷新有效期
+- 同一设备并发的请求合并为一次（single-flight），其余请求等待同一个结果
+"""
+
+import copy
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from config.manage_api_client import NOT_MODIFIED
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class _Entry:
+    __slots__ = ("config", "etag", "expires_at")
+
+    def __init__(self, config: Dict, etag: Optional[str], expires_at: float):
+        self.config = config
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class PrivateConfigCache:
+    """按设备缓存差异化配置
+
+    Args:
+        ttl: 缓存有效期（秒），为0时每次都请求，但仍然合并并发请求
+        max_entries: 最多缓存的设备数，超出时淘汰最久未使用的
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "refreshed": 0,
+            "coalesced": 0,
+            "errors": 0,
+        }
+
+    async def get(
+        self,
+        key: Hashable,
+        fetch: Callable[[Optional[str]], Awaitable[Tuple[Any, Optional[str]]]],
+    ) -> Dict:
+        """获取配置，返回值是副本，调用方可以随意修改
+
+        Args:
+            key: 缓存键
+            fetch: 请求配置的协程函数，参数为上次的ETag，返回(配置或NOT_MODIFIED, 新ETag)
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return copy.deepcopy(entry.config)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._load(key, fetch, entry))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：某个等待方被取消（如设备断开）不影响其他等待同一结果的连接
+        config = await asyncio.shield(task)
+        return copy.deepcopy(config)
+
+    async def _load(self, key, fetch, entry: Optional[_Entry]) -> Dict:
+        try:
+            data, etag = await fetch(entry.etag if entry is not None else None)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        if data is NOT_MODIFIED and entry is not None:
+            self.stats["revalidated"] += 1
+            config = entry.config
+            etag = etag or entry.etag
+        else:
+            self.stats["refreshed" if entry is not None else "misses"] += 1
+            config = data
+        self._entries[key] = _Entry(config, etag, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return config
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """删除指定缓存，key为None时清空"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._entries), "inflight": len(self._inflight)}
@@ -1,11 +1,11 @@
 import json
-import copy
 from aiohttp import web
 from config.logger import setup_logging
 from core.utils.util import get_vision_url, is_valid_image_file
 from core.utils.vllm import create_instance
-from config.config_loader import get_private_config_from_api
+from config.config_loader import get_private_config_from_api_async
 from core.utils.auth import AuthToken
+from core.utils.config_overlay import ConfigOverlay
 import base64
 from typing import Tuple, Optional
 from plugins_func.register import Action
@@ -93,10 +93,11 @@ class VisionHandler:
             image_base64 = base64.b64encode(image_data).decode("utf-8")
 
             # 如果开启了智控台，则从智控台获取模型配置
-            current_config = copy.deepcopy(self.config)
+            # 只读取配置，用覆盖层代替每个请求深拷贝整份配置
+            current_config = ConfigOverlay(self.config)
             read_config_from_api = current_config.get("read_config_from_api", False)
             if read_config_from_api:
-                current_config = get_private_config_from_api(
+                current_config = await get_private_config_from_api_async(
                     current_config,
                     device_id,
                     client_id,
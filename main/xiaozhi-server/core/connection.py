@@ -1,6 +1,7 @@
 import os
 import sys
 import copy
+import contextlib
 import json
 import uuid
 import time
@@ -11,7 +12,6 @@ import traceback
 import subprocess
 import websockets
 from core.utils.util import (
-    extract_json_from_string,
     check_vad_update,
     check_asr_update,
     filter_sensitive_info,
@@ -25,24 +25,55 @@ from core.utils.modules_initialize import (
 )
 from core.handle.reportHandle import report
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
-from core.utils.dialogue import Message, Dialogue
+from core.providers.llm.base import iterate_until_aborted
+from core.utils.dialogue import (
+    DEFAULT_LOW_WATERMARK,
+    DEFAULT_SUMMARY_MAX_CHARS,
+    Message,
+    Dialogue,
+    estimate_messages_tokens,
+    estimate_tokens,
+)
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
 from core.providers.tools.unified_tool_handler import UnifiedToolHandler
 from plugins_func.loadplugins import auto_import_modules
 from plugins_func.register import Action, ActionResponse
 from core.auth import AuthMiddleware, AuthenticationError
-from config.config_loader import get_private_config_from_api
+from config.config_loader import (
+    get_private_config_from_api_async,
+    get_private_config_cache_stats,
+)
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
 from config.logger import setup_logging, build_module_string, create_connection_logger
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
 from core.utils.prompt_manager import PromptManager
+from core.utils.jitter_buffer import JitterBuffer
+from core.utils.opus_codec_pool import opus_codec_pool
+from core.utils.mqtt_framing import HEADER_SIZE, parse_header
+from core.utils.loop_queue import LoopQueue
+from core.utils.config_overlay import ConfigOverlay
+from core.utils.component_init import ComponentInitializer
+from core.utils.session_cache import SessionState, save_memory_in_background
+from core.utils.speculation import SpeculativeChat
+from core.utils.tool_call_parser import ToolCallAssembler
+from core.prefork_server import request_restart
+from core.utils.executors import (
+    BACKGROUND,
+    INTERACTIVE,
+    get_executor,
+    get_executor_pool,
+)
 from core.utils.voiceprint_provider import VoiceprintProvider
 from core.utils import textUtils
+from core.utils import llm as llm_utils
 
 TAG = __name__
 
+# 开始对话前需要就绪的组件，及最长等待时间（秒）
+CHAT_COMPONENTS = ("prompt", "tts", "memory", "intent")
+COMPONENT_READY_TIMEOUT = 10
+
 auto_import_modules("plugins_func.functions")
 
 
@@ -62,7 +93,8 @@ class ConnectionHandler:
         server=None,
     ):
         self.common_config = config
-        self.config = copy.deepcopy(config)
+        # 共享服务配置，本连接只在覆盖层中保存差异化配置
+        self.config = ConfigOverlay(config)
         self.session_id = str(uuid.uuid4())
         self.logger = setup_logging()
         self.server = server  # 保存server实例的引用
@@ -81,6 +113,10 @@ class ConnectionHandler:
         self.max_output_size = 0
         self.chat_history_conf = 0
         self.audio_format = "opus"
+        # 客户端上行音频的帧时长（毫秒），以hello中的audio_params为准
+        self.audio_frame_duration = 60
+        # 下行音频每条消息合并的帧数，大于1表示已协商多帧格式
+        self.audio_batch_max_frames = 1
 
         # 客户端状态相关
         self.client_abort = False
@@ -90,22 +126,32 @@ class ConnectionHandler:
         # 线程任务相关
         self.loop = asyncio.get_event_loop()
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
-
-        # 添加上报线程池
-        self.report_queue = queue.Queue()
-        self.report_thread = None
+        # 阻塞调用使用进程级共享线程池，连接内的流水线以asyncio任务运行
+        # 影响当前对话轮次的调用用interactive，记忆总结、上报等用background
+        self.executor = get_executor(INTERACTIVE)
+        self.background_executor = get_executor(BACKGROUND)
+        self.pipeline_tasks = set()
+
+        # 聊天记录上报队列
+        self.report_queue = LoopQueue(self.loop)
+        self.report_task = None
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
         self.report_tts_enable = self.read_config_from_api
 
         # 依赖的组件
+        self.components = None
+        # 是否恢复了设备断线前的会话，及本连接的会话是否已暂存
+        self.resumed = False
+        self.session_parked = False
         self.vad = None
         self.asr = None
         self.tts = None
         self._asr = _asr
         self._vad = _vad
         self.llm = _llm
+        # 本连接从进程内注册表获取的LLM实例，连接释放时归还
+        self.llm_instances = []
         self.memory = _memory
         self.intent = _intent
 
@@ -124,14 +170,39 @@ class ConnectionHandler:
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
         self.asr_audio = []
-        self.asr_audio_queue = queue.Queue()
+        self.asr_audio_queue = LoopQueue(self.loop)
 
         # llm相关变量
         self.llm_finish_task = True
         self.dialogue = Dialogue()
+        # 被移出对话窗口的消息并入滚动总结的任务
+        self.summary_task = None
+        # 基于流式ASR中间结果的投机请求，未开启时为None
+        self.speculation = None
+        # 每轮LLM请求的提示词大小和耗时统计
+        self.turn_stats = {
+            "turns": 0,
+            "prompt_tokens": 0,
+            "max_prompt_tokens": 0,
+            "first_token_ms": 0,
+            "total_ms": 0,
+        }
+        # 进行中的LLM轮次的打断信号，打断时全部置为完成
+        self.abort_waiters = set()
+        # 打断统计：取消的LLM流式请求、被打断轮次的输出token、取消合成的文本字数、打断到静音的耗时
+        self.abort_stats = {
+            "aborts": 0,
+            "llm_streams_cancelled": 0,
+            "aborted_output_tokens": 0,
+            "tts_chars_cancelled": 0,
+            "silence_ms_total": 0.0,
+            "silence_ms_max": 0.0,
+        }
 
         # tts相关变量
         self.sentence_id = None
+        # 下行音频流，由全局音频调度器按节拍发送
+        self.audio_stream = None
         # 处理TTS响应没有文本返回
         self.tts_MessageText = ""
 
@@ -156,6 +227,11 @@ class ConnectionHandler:
 
         # 标记连接是否来自MQTT
         self.conn_from_mqtt_gateway = False
+        # MQTT网关上行音频的抖动缓冲
+        self.jitter_buffer = None
+        self.jitter_drain_handle = None
+        self.jitter_sequence_from_timestamp = False
+        self.jitter_silence_frame = None
 
         # 初始化提示词管理器
         self.prompt_manager = PromptManager(config, self.logger)
@@ -213,13 +289,16 @@ class ConnectionHandler:
             # 启动超时检查任务
             self.timeout_task = asyncio.create_task(self._check_timeout())
 
-            self.welcome_msg = self.config["xiaozhi"]
+            # 欢迎消息会按连接修改，不能直接改共享配置
+            self.welcome_msg = copy.deepcopy(self.config["xiaozhi"])
             self.welcome_msg["session_id"] = self.session_id
 
-            # 获取差异化配置
-            self._initialize_private_config()
+            # 宽限期内重连的设备直接恢复上次的会话，否则获取差异化配置
+            if not self._resume_session():
+                await self._initialize_private_config()
             # 异步初始化
-            self.executor.submit(self._initialize_components)
+            self.components = self._create_component_initializer()
+            self.start_pipeline_task(self._initialize_components())
 
             try:
                 async for message in self.websocket:
@@ -250,26 +329,10 @@ class ConnectionHandler:
     async def _save_and_close(self, ws):
         """保存记忆并关闭连接"""
         try:
-            if self.memory:
-                # 使用线程池异步保存记忆
-                def save_memory_task():
-                    try:
-                        # 创建新事件循环（避免与主循环冲突）
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(
-                            self.memory.save_memory(self.dialogue.dialogue)
-                        )
-                    except Exception as e:
-                        self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
-                    finally:
-                        try:
-                            loop.close()
-                        except Exception:
-                            pass
-
-                # 启动线程保存记忆，不等待完成
-                threading.Thread(target=save_memory_task, daemon=True).start()
+            # 暂存的会话可能很快被重连的设备恢复，记忆在会话过期或被淘汰时再保存
+            if self.memory and not self._park_session():
+                # 记忆总结是后台任务，不等待完成
+                save_memory_in_background(self.memory, list(self.dialogue.dialogue))
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
         finally:
@@ -309,58 +372,90 @@ class ConnectionHandler:
             bool: 是否成功处理了消息
         """
         try:
-            # 提取头部信息
-            timestamp = int.from_bytes(message[8:12], "big")
-            audio_length = int.from_bytes(message[12:16], "big")
-
-            # 提取音频数据
-            if audio_length > 0 and len(message) >= 16 + audio_length:
-                # 有指定长度，提取精确的音频数据
-                audio_data = message[16 : 16 + audio_length]
-                # 基于时间戳进行排序处理
-                self._process_websocket_audio(audio_data, timestamp)
-                return True
-            elif len(message) > 16:
+            # 原地解析头部，不切片
+            header = parse_header(message)
+            if header is None:
+                return False
+            _, sequence, timestamp, audio_length, payload_end = header
+            if payload_end <= HEADER_SIZE:
+                return False
+            # 解码器需要bytes，这里做唯一一次负载拷贝
+            audio_data = message[HEADER_SIZE:payload_end]
+
+            if audio_length == payload_end - HEADER_SIZE:
+                # 有指定长度，经抖动缓冲按序列号重排后处理
+                self._process_websocket_audio(audio_data, sequence, timestamp)
+            else:
                 # 没有指定长度或长度无效，去掉头部后处理剩余数据
-                audio_data = message[16:]
                 self.asr_audio_queue.put(audio_data)
-                return True
+            return True
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"解析WebSocket音频包失败: {e}")
 
         # 处理失败，返回False表示需要继续处理
         return False
 
-    def _process_websocket_audio(self, audio_data, timestamp):
+    def _process_websocket_audio(self, audio_data, sequence, timestamp):
         """处理WebSocket格式的音频包"""
-        # 初始化时间戳序列管理
-        if not hasattr(self, "audio_timestamp_buffer"):
-            self.audio_timestamp_buffer = {}
-            self.last_processed_timestamp = 0
-            self.max_timestamp_buffer_size = 20
-
-        # 如果时间戳是递增的，直接处理
-        if timestamp >= self.last_processed_timestamp:
-            self.asr_audio_queue.put(audio_data)
-            self.last_processed_timestamp = timestamp
-
-            # 处理缓冲区中的后续包
-            processed_any = True
-            while processed_any:
-                processed_any = False
-                for ts in sorted(self.audio_timestamp_buffer.keys()):
-                    if ts > self.last_processed_timestamp:
-                        buffered_audio = self.audio_timestamp_buffer.pop(ts)
-                        self.asr_audio_queue.put(buffered_audio)
-                        self.last_processed_timestamp = ts
-                        processed_any = True
-                        break
-        else:
-            # 乱序包，暂存
-            if len(self.audio_timestamp_buffer) < self.max_timestamp_buffer_size:
-                self.audio_timestamp_buffer[timestamp] = audio_data
+        # 初始化抖动缓冲
+        if self.jitter_buffer is None:
+            jitter_config = self.config.get("jitter_buffer", {})
+            self.jitter_buffer = JitterBuffer(
+                playout_delay_ms=int(jitter_config.get("playout_delay_ms", 120)),
+                max_packets=int(jitter_config.get("max_packets", 50)),
+                on_lost=(
+                    self._conceal_lost_frame
+                    if jitter_config.get("conceal_lost", True)
+                    else None
+                ),
+            )
+
+        # 网关未填写序列号（非首包序列号仍为0）时，改为按协商的帧时长从时间戳推算
+        if (
+            sequence == 0
+            and not self.jitter_sequence_from_timestamp
+            and self.jitter_buffer.stats["received"] > 0
+        ):
+            self.jitter_sequence_from_timestamp = True
+            self.jitter_buffer.reset()
+        if self.jitter_sequence_from_timestamp:
+            sequence = round(timestamp / self.audio_frame_duration)
+
+        for frame in self.jitter_buffer.push(sequence, audio_data):
+            self.asr_audio_queue.put(frame)
+        self._schedule_jitter_drain()
+
+    def _conceal_lost_frame(self, sequence):
+        """丢包补偿：用一帧等长的静音代替丢失的包，保持ASR和VAD看到的音频时长不变"""
+        if self.jitter_silence_frame is None:
+            samples = 16000 * self.audio_frame_duration // 1000
+            pcm = bytes(samples * 2)
+            if self.audio_format == "pcm":
+                self.jitter_silence_frame = pcm
             else:
-                self.asr_audio_queue.put(audio_data)
+                try:
+                    with opus_codec_pool.encoder(16000, 1) as encoder:
+                        self.jitter_silence_frame = encoder.encode(pcm, samples)
+                except Exception as e:
+                    # 帧时长不被Opus支持时只计数，不做补偿
+                    self.logger.bind(tag=TAG).warning(f"生成丢包补偿帧失败: {e}")
+                    self.jitter_silence_frame = b""
+        return self.jitter_silence_frame or None
+
+    def _schedule_jitter_drain(self):
+        """队首存在序号空洞时，在等待超时后强制输出，避免说话结束时包卡在缓冲中"""
+        if self.jitter_drain_handle is not None:
+            return
+        delay = self.jitter_buffer.next_deadline()
+        if delay is None:
+            return
+        self.jitter_drain_handle = self.loop.call_later(delay, self._drain_jitter_buffer)
+
+    def _drain_jitter_buffer(self):
+        self.jitter_drain_handle = None
+        for frame in self.jitter_buffer.pop_ready():
+            self.asr_audio_queue.put(frame)
+        self._schedule_jitter_drain()
 
     async def handle_restart(self, message):
         """处理服务器重启请求"""
@@ -385,6 +480,9 @@ class ConnectionHandler:
                 """实际执行重启的方法"""
                 time.sleep(1)
                 self.logger.bind(tag=TAG).info("执行服务器重启...")
+                # 多进程模式下由主进程排空所有工作进程后重启
+                if request_restart():
+                    return
                 subprocess.Popen(
                     [sys.executable, "app.py"],
                     stdin=sys.stdin,
@@ -410,54 +508,291 @@ class ConnectionHandler:
                 )
             )
 
-    def _initialize_components(self):
-        try:
-            self.selected_module_str = build_module_string(
-                self.config.get("selected_module", {})
+    def _create_component_initializer(self):
+        """按依赖关系组织组件初始化步骤，互不依赖的步骤并发执行"""
+        components = ComponentInitializer(self.executor)
+        components.add("vad", self._init_vad)
+        components.add("asr", self._init_asr_channel)
+        if self.resumed:
+            # 恢复的会话沿用提示词、记忆、意图和工具，只需重新创建TTS和打开音频通道
+            components.add("tts", self._init_tts_channel)
+            return components
+        components.add("prompt", self._init_quick_prompt)
+        components.add("voiceprint", self._initialize_voiceprint)
+        components.add("tts", self._init_tts_channel)
+        components.add("memory", self._initialize_memory)
+        components.add("intent", self._initialize_intent)
+        components.add("tools", self._init_tools, depends=["intent"])
+        components.add(
+            "prompt_enhancement", self._init_prompt_enhancement, depends=["prompt"]
+        )
+        return components
+
+    async def _initialize_components(self):
+        """初始化组件，VAD和ASR就绪后即可接收音频，其余组件在后台继续初始化"""
+        self.selected_module_str = build_module_string(
+            self.config.get("selected_module", {})
+        )
+        self.logger = create_connection_logger(self.selected_module_str)
+        self.components.logger = self.logger
+        self._init_dialogue_window()
+        self.speculation = SpeculativeChat.create(self)
+
+        """初始化上报任务"""
+        self._init_report_threads()
+
+        stats = await self.components.run()
+        self.logger.bind(tag=TAG).info(
+            f"组件初始化完成，总耗时: {stats['total_ms']}ms，"
+            f"各组件耗时(ms): {stats['components']}"
+            + (f"，失败: {stats['failed']}" if stats["failed"] else "")
+        )
+
+    def _init_dialogue_window(self):
+        """按当前LLM配置设置对话窗口的token预算，LLM配置中的context_token_budget优先"""
+        window_config = self.config.get("dialogue_window") or {}
+        if not window_config.get("enabled", False):
+            self.dialogue.set_token_budget(None)
+            return
+        llm_name = self.config.get("selected_module", {}).get("LLM")
+        llm_config = self.config.get("LLM", {}).get(llm_name) or {}
+        self.dialogue.set_token_budget(
+            llm_config.get("context_token_budget")
+            or window_config.get("token_budget"),
+            float(window_config.get("low_watermark") or DEFAULT_LOW_WATERMARK),
+        )
+
+    def _compact_dialogue(self):
+        """对话超出token预算时移出最早的轮次，并在后台并入滚动总结"""
+        evicted = self.dialogue.trim_to_budget()
+        if evicted:
+            self.logger.bind(tag=TAG).info(
+                f"对话超出token预算{self.dialogue.token_budget}，移出最早的{len(evicted)}条消息，"
+                f"剩余约{self.dialogue.estimate_tokens()}tokens"
             )
-            self.logger = create_connection_logger(self.selected_module_str)
-
-            """初始化组件"""
-            if self.config.get("prompt") is not None:
-                user_prompt = self.config["prompt"]
-                # 使用快速提示词进行初始化
-                prompt = self.prompt_manager.get_quick_prompt(user_prompt)
-                self.change_system_prompt(prompt)
-                self.logger.bind(tag=TAG).info(
-                    f"快速初始化组件: prompt成功 {prompt[:50]}..."
+        # 恢复的会话可能带有断线前尚未总结的消息
+        if not self.dialogue.pending_evicted:
+            return
+        if self.summary_task is None or self.summary_task.done():
+            self.summary_task = self.start_pipeline_task(self._summarize_evicted())
+
+    async def _summarize_evicted(self):
+        """把移出窗口的消息并入滚动总结，执行期间新移出的消息在下一次循环中合并"""
+        max_chars = int(
+            (self.config.get("dialogue_window") or {}).get("summary_max_chars")
+            or DEFAULT_SUMMARY_MAX_CHARS
+        )
+        while self.dialogue.pending_evicted:
+            messages = self.dialogue.pending_evicted
+            self.dialogue.pending_evicted = []
+            summary = None
+            if self.llm is not None:
+                system_prompt, user_prompt = self.dialogue.build_summary_prompt(
+                    messages, max_chars
                 )
+                try:
+                    summary = await self.loop.run_in_executor(
+                        self.background_executor,
+                        self.llm.response_no_stream,
+                        system_prompt,
+                        user_prompt,
+                    )
+                except asyncio.CancelledError:
+                    # 连接关闭时取消，放回待总结的消息，会话被暂存时由恢复后的连接继续总结
+                    self.dialogue.pending_evicted[:0] = messages
+                    raise
+                except Exception as e:
+                    self.logger.bind(tag=TAG).warning(f"总结早期对话失败: {e}")
+            # response_no_stream出错时返回【LLM服务响应异常】
+            if not summary or not summary.strip() or summary.startswith("【"):
+                summary = self.dialogue.fallback_summary(messages, max_chars)
+            self.dialogue.update_summary(summary[: max_chars * 2])
+            self.logger.bind(tag=TAG).debug(f"早期对话总结: {self.dialogue.summary}")
+
+    def _record_turn(self, prompt_tokens, message_count, first_token_ms, total_ms):
+        stats = self.turn_stats
+        stats["turns"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], prompt_tokens)
+        stats["first_token_ms"] += first_token_ms or 0
+        stats["total_ms"] += total_ms
+        self.logger.bind(tag=TAG).info(
+            f"本轮LLM请求: 提示词约{prompt_tokens}tokens/{message_count}条消息，"
+            f"首token耗时{first_token_ms}ms，总耗时{total_ms}ms"
+        )
 
-            """初始化本地组件"""
-            if self.vad is None:
-                self.vad = self._vad
-            if self.asr is None:
-                self.asr = self._initialize_asr()
+    def get_turn_stats(self) -> Dict[str, Any]:
+        stats = self.turn_stats
+        turns = stats["turns"]
+        if not turns:
+            return dict(stats)
+        return {
+            "turns": turns,
+            "avg_prompt_tokens": round(stats["prompt_tokens"] / turns),
+            "max_prompt_tokens": stats["max_prompt_tokens"],
+            "avg_first_token_ms": round(stats["first_token_ms"] / turns),
+            "avg_total_ms": round(stats["total_ms"] / turns),
+        }
+
+    async def abort_turn(self):
+        """打断当前轮次：关闭LLM流式请求，取消进行中的合成，丢弃未发送的音频
+
+        等到正在发送的一条音频消息结束后返回，记录打断到静音的耗时
+        """
+        start = time.monotonic()
+        self.client_abort = True
+        stats = self.abort_stats
+        stats["aborts"] += 1
+        waiters, self.abort_waiters = self.abort_waiters, set()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(True)
+        stats["tts_chars_cancelled"] += self.clear_queues()
+        if self.tts:
+            try:
+                stats["tts_chars_cancelled"] += await self.tts.cancel_synthesis() or 0
+            except Exception as e:
+                self.logger.bind(tag=TAG).error(f"取消语音合成失败: {e}")
+        stream = self.audio_stream
+        if stream is not None:
+            await stream.wait_sent()
+        silence_ms = (time.monotonic() - start) * 1000
+        stats["silence_ms_total"] += silence_ms
+        stats["silence_ms_max"] = max(stats["silence_ms_max"], silence_ms)
+        self.logger.bind(tag=TAG).info(f"打断完成，{silence_ms:.1f}ms后停止输出")
+
+    def _on_llm_stream_cancelled(self):
+        self.abort_stats["llm_streams_cancelled"] += 1
+
+    def get_abort_stats(self) -> Dict[str, Any]:
+        stats = self.abort_stats
+        aborts = max(1, stats["aborts"])
+        return {
+            "aborts": stats["aborts"],
+            "llm_streams_cancelled": stats["llm_streams_cancelled"],
+            "aborted_output_tokens": stats["aborted_output_tokens"],
+            "tts_chars_cancelled": stats["tts_chars_cancelled"],
+            "avg_silence_ms": round(stats["silence_ms_total"] / aborts, 1),
+            "max_silence_ms": round(stats["silence_ms_max"], 1),
+        }
+
+    async def wait_components_ready(self, names=CHAT_COMPONENTS):
+        """等待对话需要的组件初始化完成，超时或失败时仍继续，由各组件自行降级"""
+        if self.components is None:
+            return
+        if not await self.components.wait(names, COMPONENT_READY_TIMEOUT):
+            self.logger.bind(tag=TAG).warning(
+                f"组件未就绪: {[n for n in names if not self.components.is_ready(n)]}"
+            )
 
-            # 初始化声纹识别
-            self._initialize_voiceprint()
+    def _session_key(self):
+        return (self.device_id, self.headers.get("client-id"))
+
+    def _resume_session(self):
+        """恢复设备断线前暂存的会话，成功返回True"""
+        session_cache = getattr(self.server, "session_cache", None)
+        if session_cache is None or not self.device_id:
+            return False
+        session = session_cache.take(self._session_key(), self.common_config)
+        if session is None:
+            return False
+
+        self.config.overrides = session.config_overrides
+        for name, value in session.attributes.items():
+            setattr(self, name, value)
+        for name, component in session.components.items():
+            setattr(self, name, component)
+        if self.func_handler is not None:
+            self.func_handler.rebind(self)
+        self.resumed = True
+        self.logger.bind(tag=TAG).info(
+            f"恢复{time.monotonic() - session.parked_at:.1f}秒前断开的会话，"
+            f"对话历史{len(self.dialogue.dialogue)}条"
+        )
+        return True
 
-            # 打开语音识别通道
-            asyncio.run_coroutine_threadsafe(
-                self.asr.open_audio_channels(self), self.loop
+    def _park_session(self):
+        """连接关闭时暂存可复用的会话状态，已暂存返回True
+
+        需要绑定、主动结束对话或组件未完整初始化的连接不暂存
+        """
+        session_cache = getattr(self.server, "session_cache", None)
+        if self.session_parked:
+            return True
+        if (
+            session_cache is None
+            or not session_cache.enabled
+            or not self.device_id
+            or self.need_bind
+            or self.close_after_chat
+            or self.components is None
+            or self.components.pending()
+            or self.components.get_stats()["failed"]
+        ):
+            return False
+
+        components = {
+            "dialogue": self.dialogue,
+            "vad": self.vad,
+            "llm": self.llm,
+            "memory": self.memory,
+            "intent": self.intent,
+            "voiceprint_provider": self.voiceprint_provider,
+            "func_handler": self.func_handler,
+        }
+        # 本地ASR由所有连接共享，远程ASR持有连接级的上游会话，需重新创建
+        if self.asr is not None and self.asr.interface_type == InterfaceType.LOCAL:
+            components["asr"] = self.asr
+        attributes = {
+            "prompt": self.prompt,
+            "intent_type": self.intent_type,
+            "load_function_plugin": self.load_function_plugin,
+            "max_output_size": self.max_output_size,
+            "chat_history_conf": self.chat_history_conf,
+            "llm_instances": self.llm_instances,
+        }
+        session_cache.park(
+            self._session_key(),
+            SessionState(
+                self.common_config, self.config.overrides, components, attributes
+            ),
+        )
+        self.session_parked = True
+        return True
+
+    def _init_quick_prompt(self):
+        if self.config.get("prompt") is not None:
+            user_prompt = self.config["prompt"]
+            # 使用快速提示词进行初始化
+            prompt = self.prompt_manager.get_quick_prompt(user_prompt)
+            self.change_system_prompt(prompt)
+            self.logger.bind(tag=TAG).info(
+                f"快速初始化组件: prompt成功 {prompt[:50]}..."
             )
-            if self.tts is None:
-                self.tts = self._initialize_tts()
-            # 打开语音合成通道
-            asyncio.run_coroutine_threadsafe(
-                self.tts.open_audio_channels(self), self.loop
+
+    async def _init_vad(self):
+        if self.vad is None:
+            self.vad = self._vad
+
+    async def _init_asr_channel(self):
+        if self.asr is None:
+            self.asr = await self.loop.run_in_executor(
+                self.executor, self._initialize_asr
             )
+        # 打开语音识别通道
+        await self.asr.open_audio_channels(self)
 
-            """加载记忆"""
-            self._initialize_memory()
-            """加载意图识别"""
-            self._initialize_intent()
-            """初始化上报线程"""
-            self._init_report_threads()
-            """更新系统提示词"""
-            self._init_prompt_enhancement()
+    async def _init_tts_channel(self):
+        if self.tts is None:
+            self.tts = await self.loop.run_in_executor(
+                self.executor, self._initialize_tts
+            )
+        # 打开语音合成通道
+        await self.tts.open_audio_channels(self)
 
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"实例化组件失败: {e}")
+    async def _init_tools(self):
+        if self.func_handler is not None:
+            await self.func_handler._initialize()
 
     def _init_prompt_enhancement(self):
         # 更新上下文信息
@@ -469,18 +804,25 @@ class ConnectionHandler:
             self.change_system_prompt(enhanced_prompt)
             self.logger.bind(tag=TAG).info("系统提示词已增强更新")
 
+    def start_pipeline_task(self, coro):
+        """在事件循环上启动连接内的流水线任务，连接关闭时统一取消"""
+        task = self.loop.create_task(coro)
+        self.pipeline_tasks.add(task)
+        task.add_done_callback(self.pipeline_tasks.discard)
+        return task
+
+    def _start_report_task(self):
+        if self.report_task is None or self.report_task.done():
+            self.report_task = self.start_pipeline_task(self._report_worker())
+            self.logger.bind(tag=TAG).info("TTS上报任务已启动")
+
     def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
+        """初始化ASR和TTS上报任务"""
         if not self.read_config_from_api or self.need_bind:
             return
         if self.chat_history_conf == 0:
             return
-        if self.report_thread is None or not self.report_thread.is_alive():
-            self.report_thread = threading.Thread(
-                target=self._report_worker, daemon=True
-            )
-            self.report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
+        self.loop.call_soon_threadsafe(self._start_report_task)
 
     def _initialize_tts(self):
         """初始化TTS"""
@@ -495,8 +837,11 @@ class ConnectionHandler:
 
     def _initialize_asr(self):
         """初始化ASR"""
-        if self._asr.interface_type == InterfaceType.LOCAL:
-            # 如果公共ASR是本地服务，则直接返回
+        if (
+            self._asr.interface_type == InterfaceType.LOCAL
+            and "ASR" not in self.config.overrides
+        ):
+            # 如果公共ASR是本地服务且没有差异化的ASR配置，则直接返回
             # 因为本地一个实例ASR，可以被多个连接共享
             asr = self._asr
         else:
@@ -522,14 +867,14 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).warning(f"声纹识别初始化失败: {str(e)}")
 
-    def _initialize_private_config(self):
+    async def _initialize_private_config(self):
         """如果是从配置文件获取，则进行二次实例化"""
         if not self.read_config_from_api:
             return
         """从接口获取差异化的配置进行二次实例化，非全量重新实例化"""
         try:
             begin_time = time.time()
-            private_config = get_private_config_from_api(
+            private_config = await get_private_config_from_api_async(
                 self.config,
                 self.headers.get("device-id"),
                 self.headers.get("client-id", self.headers.get("device-id")),
@@ -538,6 +883,9 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).info(
                 f"{time.time() - begin_time} 秒，获取差异化配置成功: {json.dumps(filter_sensitive_info(private_config), ensure_ascii=False)}"
             )
+            self.logger.bind(tag=TAG).debug(
+                f"差异化配置缓存统计: {get_private_config_cache_stats()}"
+            )
         except DeviceNotFoundException as e:
             self.need_bind = True
             private_config = {}
@@ -550,6 +898,13 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).error(f"获取差异化配置失败: {e}")
             private_config = {}
 
+        # 按差异化配置实例化组件可能较慢，放到线程池执行，不阻塞其他连接
+        await self.loop.run_in_executor(
+            self.executor, self._apply_private_config, private_config
+        )
+
+    def _apply_private_config(self, private_config):
+        """按差异化配置更新本连接的配置并重新实例化相关组件"""
         init_llm, init_tts, init_memory, init_intent = (
             False,
             False,
@@ -559,6 +914,8 @@ class ConnectionHandler:
 
         init_vad = check_vad_update(self.common_config, private_config)
         init_asr = check_asr_update(self.common_config, private_config)
+        # selected_module会被逐项修改，先换成本连接自己的副本
+        self.config["selected_module"] = dict(self.config["selected_module"])
 
         if init_vad:
             self.config["VAD"] = private_config["VAD"]
@@ -642,6 +999,7 @@ class ConnectionHandler:
             self.asr = modules["asr"]
         if modules.get("llm", None) is not None:
             self.llm = modules["llm"]
+            self.llm_instances.append(self.llm)
         if modules.get("intent", None) is not None:
             self.intent = modules["intent"]
         if modules.get("memory", None) is not None:
@@ -672,14 +1030,11 @@ class ConnectionHandler:
                 "llm"
             ]
             if memory_llm_name and memory_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
-                memory_llm_config = self.config["LLM"][memory_llm_name]
-                memory_llm_type = memory_llm_config.get("type", memory_llm_name)
-                memory_llm = llm_utils.create_instance(
-                    memory_llm_type, memory_llm_config
+                # 如果配置了专用LLM，则获取共享的LLM实例
+                memory_llm_type, memory_llm_config = llm_utils.resolve_config(
+                    memory_llm_name, self.config["LLM"]
                 )
+                memory_llm = self._acquire_llm(memory_llm_type, memory_llm_config)
                 self.logger.bind(tag=TAG).info(
                     f"为记忆总结创建了专用LLM: {memory_llm_name}, 类型: {memory_llm_type}"
                 )
@@ -689,6 +1044,17 @@ class ConnectionHandler:
                 self.memory.set_llm(self.llm)
                 self.logger.bind(tag=TAG).info("使用主LLM作为意图识别模型")
 
+    def _acquire_llm(self, llm_type, llm_config):
+        """获取进程内共享的LLM实例，连接关闭时归还"""
+        instance = llm_utils.acquire_instance(llm_type, llm_config)
+        self.llm_instances.append(instance)
+        return instance
+
+    def _release_llm_instances(self):
+        instances, self.llm_instances = self.llm_instances, []
+        for instance in instances:
+            llm_utils.release_instance(instance)
+
     def _initialize_intent(self):
         if self.intent is None:
             return
@@ -714,14 +1080,11 @@ class ConnectionHandler:
             ]
 
             if intent_llm_name and intent_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
-                intent_llm_config = self.config["LLM"][intent_llm_name]
-                intent_llm_type = intent_llm_config.get("type", intent_llm_name)
-                intent_llm = llm_utils.create_instance(
-                    intent_llm_type, intent_llm_config
+                # 如果配置了专用LLM，则获取共享的LLM实例
+                intent_llm_type, intent_llm_config = llm_utils.resolve_config(
+                    intent_llm_name, self.config["LLM"]
                 )
+                intent_llm = self._acquire_llm(intent_llm_type, intent_llm_config)
                 self.logger.bind(tag=TAG).info(
                     f"为意图识别创建了专用LLM: {intent_llm_name}, 类型: {intent_llm_type}"
                 )
@@ -731,19 +1094,35 @@ class ConnectionHandler:
                 self.intent.set_llm(self.llm)
                 self.logger.bind(tag=TAG).info("使用主LLM作为意图识别模型")
 
-        """加载统一工具处理器"""
+        """加载统一工具处理器，由tools步骤异步初始化"""
         self.func_handler = UnifiedToolHandler(self)
 
-        # 异步初始化工具处理器
-        if hasattr(self, "loop") and self.loop:
-            asyncio.run_coroutine_threadsafe(self.func_handler._initialize(), self.loop)
-
     def change_system_prompt(self, prompt):
         self.prompt = prompt
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, depth=0):
+    def get_chat_functions(self):
+        """function_call模式下本轮可用的函数描述"""
+        if self.intent_type == "function_call" and self.func_handler is not None:
+            return self.func_handler.get_functions()
+        return None
+
+    def open_llm_stream(self, llm_dialogue, functions):
+        """发起LLM流式请求，返回异步生成器"""
+        if self.intent_type == "function_call" and functions is not None:
+            # 使用支持functions的streaming接口
+            return self.llm.response_with_functions_async(
+                self.session_id, llm_dialogue, functions=functions
+            )
+        return self.llm.response_async(self.session_id, llm_dialogue)
+
+    async def chat(self, query, depth=0, speculation=None):
+        """在事件循环上消费LLM的异步流式响应，等待期间不占用线程
+
+        Args:
+            speculation: 已按中间识别结果提前发起的投机请求，传入时直接消费其缓存的输出
+        """
         self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
         self.llm_finish_task = False
 
@@ -759,147 +1138,164 @@ class ConnectionHandler:
                 )
             )
 
-        # Define intent functions
-        functions = None
-        if self.intent_type == "function_call" and hasattr(self, "func_handler"):
-            functions = self.func_handler.get_functions()
         response_message = []
 
+        # 无状态问题先查回复缓存，投机请求已经发出时只写入不查询
+        response_cache = getattr(self.server, "response_cache", None)
+        cache_query = cache_context = None
+        personal = False
+        if depth == 0 and response_cache is not None:
+            cache_query = response_cache.cacheable(
+                query, self.prompt, self.dialogue.has_history()
+            )
+            # 回复可能用到本设备的记忆或说话人信息，只在本设备内复用
+            personal = self._uses_personal_context()
+            if personal and not self.device_id:
+                cache_query = None
+        if cache_query is not None:
+            cache_context = response_cache.context_key(
+                self.prompt,
+                self.config.get("selected_module", {}).get("LLM"),
+                self.get_chat_functions(),
+                self.device_id if personal else None,
+            )
+            cached = (
+                response_cache.get(cache_context, cache_query)
+                if speculation is None
+                else None
+            )
+            if cached is not None:
+                if speculation is not None:
+                    speculation.cancel()
+                self._reply_from_cache(cached)
+                return True
+
+        # 本轮的打断信号，在查询记忆、等待首token期间被打断也能立即停止
+        abort = self.loop.create_future()
+        self.abort_waiters.add(abort)
         try:
-            # 使用带记忆的对话
-            memory_str = None
-            if self.memory is not None:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
-
-            if self.intent_type == "function_call" and functions is not None:
-                # 使用支持functions的streaming接口
-                llm_responses = self.llm.response_with_functions(
-                    self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {})
-                    ),
-                    functions=functions,
-                )
+            request_start = time.monotonic()
+            if speculation is not None:
+                functions = speculation.functions
+                prompt_tokens = speculation.prompt_tokens
+                message_count = speculation.message_count
+                llm_responses = speculation.responses()
             else:
-                llm_responses = self.llm.response(
-                    self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {})
-                    ),
+                # Define intent functions
+                functions = self.get_chat_functions()
+                # 使用带记忆的对话
+                memory_str = None
+                if self.memory is not None:
+                    memory_str = await self.memory.query_memory(query)
+
+                llm_dialogue = self.dialogue.get_llm_dialogue_with_memory(
+                    memory_str,
+                    self.config.get("voiceprint", {}),
+                    self.llm.volatile_context,
                 )
+                prompt_tokens = estimate_messages_tokens(llm_dialogue)
+                message_count = len(llm_dialogue)
+                request_start = time.monotonic()
+                llm_responses = self.open_llm_stream(llm_dialogue, functions)
         except Exception as e:
+            self.abort_waiters.discard(abort)
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
             return None
 
         # 处理流式响应
-        tool_call_flag = False
-        function_name = None
-        function_id = None
-        function_arguments = ""
-        content_arguments = ""
+        tool_calls = None
+        if self.intent_type == "function_call" and functions is not None:
+            tool_calls = ToolCallAssembler()
+        # 参数完整的函数调用立即开始执行，不等流结束
+        tool_tasks = []
         self.client_abort = False
         emotion_flag = True
-        for response in llm_responses:
-            if self.client_abort:
-                break
-            if self.intent_type == "function_call" and functions is not None:
-                content, tools_call = response
-                if "content" in response:
-                    content = response["content"]
-                    tools_call = None
-                if content is not None and len(content) > 0:
-                    content_arguments += content
-
-                if not tool_call_flag and content_arguments.startswith("<tool_call>"):
-                    # print("content_arguments", content_arguments)
-                    tool_call_flag = True
-
-                if tools_call is not None and len(tools_call) > 0:
-                    tool_call_flag = True
-                    if tools_call[0].id is not None:
-                        function_id = tools_call[0].id
-                    if tools_call[0].function.name is not None:
-                        function_name = tools_call[0].function.name
-                    if tools_call[0].function.arguments is not None:
-                        function_arguments += tools_call[0].function.arguments
-            else:
-                content = response
+        first_token_ms = None
+        # 被打断或提前退出循环时，aclosing保证立即关闭读取循环和上游的流式请求
+        async with contextlib.aclosing(llm_responses), contextlib.aclosing(
+            iterate_until_aborted(
+                llm_responses, abort, on_cancel=self._on_llm_stream_cancelled
+            )
+        ) as responses:
+            async for response in responses:
+                if first_token_ms is None:
+                    first_token_ms = int((time.monotonic() - request_start) * 1000)
+                if self.client_abort:
+                    break
+                if tool_calls is not None:
+                    content, tools_call = response
+                    if "content" in response:
+                        content = response["content"]
+                        tools_call = None
+                    completed = tool_calls.feed_deltas(tools_call)
+                    content, text_calls = tool_calls.feed_text(content)
+                    for call in completed + text_calls:
+                        tool_tasks.append((call, self._start_tool_call(call)))
+                else:
+                    content = response
 
-            # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
-            if emotion_flag and content is not None and content.strip():
-                asyncio.run_coroutine_threadsafe(
-                    textUtils.get_emotion(self, content),
-                    self.loop,
+                # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
+                if emotion_flag and content is not None and content.strip():
+                    self.start_pipeline_task(textUtils.get_emotion(self, content))
+                    emotion_flag = False
+
+                if content is not None and len(content) > 0:
+                    if tool_calls is None or not tool_calls.has_tool_calls:
+                        self._speak_llm_text(content, response_message)
+        self._record_turn(
+            prompt_tokens,
+            message_count,
+            first_token_ms,
+            int((time.monotonic() - request_start) * 1000),
+        )
+        if abort.done() and response_message:
+            # 被打断的轮次在打断前已经生成的输出，流式请求关闭后不再继续计费
+            self.abort_stats["aborted_output_tokens"] += estimate_tokens(
+                "".join(response_message)
+            )
+        if tool_calls is not None:
+            # 参数为空或流结束才能确定完整的调用，被打断时不再发起新的调用
+            if not self.client_abort:
+                for call in tool_calls.finish():
+                    tool_tasks.append((call, self._start_tool_call(call)))
+            pending_text = tool_calls.pending_text()
+            if pending_text:
+                self._speak_llm_text(pending_text, response_message)
+            if tool_calls.invalid_text:
+                self.logger.bind(tag=TAG).error(
+                    f"function call error: {tool_calls.invalid_text}"
                 )
-                emotion_flag = False
-
-            if content is not None and len(content) > 0:
-                if not tool_call_flag:
-                    response_message.append(content)
-                    self.tts.tts_text_queue.put(
-                        TTSMessageDTO(
-                            sentence_id=self.sentence_id,
-                            sentence_type=SentenceType.MIDDLE,
-                            content_type=ContentType.TEXT,
-                            content_detail=content,
-                        )
-                    )
+                if not tool_tasks:
+                    response_message.extend(tool_calls.invalid_text)
+
         # 处理function call
-        if tool_call_flag:
-            bHasError = False
-            if function_id is None:
-                a = extract_json_from_string(content_arguments)
-                if a is not None:
-                    try:
-                        content_arguments_json = json.loads(a)
-                        function_name = content_arguments_json["name"]
-                        function_arguments = json.dumps(
-                            content_arguments_json["arguments"], ensure_ascii=False
-                        )
-                        function_id = str(uuid.uuid4().hex)
-                    except Exception as e:
-                        bHasError = True
-                        response_message.append(a)
-                else:
-                    bHasError = True
-                    response_message.append(content_arguments)
-                if bHasError:
-                    self.logger.bind(tag=TAG).error(
-                        f"function call error: {content_arguments}"
-                    )
-            if not bHasError:
-                # 如需要大模型先处理一轮，添加相关处理后的日志情况
-                if len(response_message) > 0:
-                    text_buff = "".join(response_message)
-                    self.tts_MessageText = text_buff
-                    self.dialogue.put(Message(role="assistant", content=text_buff))
-                response_message.clear()
-                self.logger.bind(tag=TAG).debug(
-                    f"function_name={function_name}, function_id={function_id}, function_arguments={function_arguments}"
+        if tool_tasks:
+            # 如需要大模型先处理一轮，添加相关处理后的日志情况
+            if len(response_message) > 0:
+                text_buff = "".join(response_message)
+                self.tts_MessageText = text_buff
+                self.dialogue.put(Message(role="assistant", content=text_buff))
+            response_message.clear()
+            # 各调用已在流式输出期间并行执行，等待全部完成（单个工具有超时）后统一处理
+            results = asyncio.gather(*(task for _, task in tool_tasks))
+            await asyncio.wait({results, abort}, return_when=asyncio.FIRST_COMPLETED)
+            if results.done():
+                await self._handle_function_results(
+                    [call for call, _ in tool_tasks], results.result(), depth=depth
                 )
-                function_call_data = {
-                    "name": function_name,
-                    "id": function_id,
-                    "arguments": function_arguments,
-                }
-
-                # 使用统一工具处理器处理所有工具调用
-                result = asyncio.run_coroutine_threadsafe(
-                    self.func_handler.handle_llm_function_call(
-                        self, function_call_data
-                    ),
-                    self.loop,
-                ).result()
-                self._handle_function_result(result, function_call_data, depth=depth)
+            else:
+                # 被打断时已开始的工具在后台执行完，结果不再播报也不再请求LLM
+                self.logger.bind(tag=TAG).info("本轮已被打断，不再处理工具调用结果")
+        self.abort_waiters.discard(abort)
 
         # 存储对话内容
         if len(response_message) > 0:
             text_buff = "".join(response_message)
             self.tts_MessageText = text_buff
             self.dialogue.put(Message(role="assistant", content=text_buff))
+            # 只缓存完整输出且没有调用工具的回复
+            if cache_query is not None and not tool_tasks and not self.client_abort:
+                response_cache.put(cache_context, cache_query, text_buff)
         if depth == 0:
             self.tts.tts_text_queue.put(
                 TTSMessageDTO(
@@ -908,6 +1304,8 @@ class ConnectionHandler:
                     content_type=ContentType.ACTION,
                 )
             )
+            # 一轮对话（含工具调用）完整结束后再裁剪，保证工具调用和结果成对移出
+            self._compact_dialogue()
         self.llm_finish_task = True
         # 使用lambda延迟计算，只有在DEBUG级别时才执行get_llm_dialogue()
         self.logger.bind(tag=TAG).debug(
@@ -918,77 +1316,144 @@ class ConnectionHandler:
 
         return True
 
-    def _handle_function_result(self, result, function_call_data, depth):
-        if result.action == Action.RESPONSE:  # 直接回复前端
-            text = result.response
-            self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
-            self.dialogue.put(Message(role="assistant", content=text))
-        elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
-            text = result.result
-            if text is not None and len(text) > 0:
-                function_id = function_call_data["id"]
-                function_name = function_call_data["name"]
-                function_arguments = function_call_data["arguments"]
-                self.dialogue.put(
-                    Message(
-                        role="assistant",
-                        tool_calls=[
-                            {
-                                "id": function_id,
-                                "function": {
-                                    "arguments": (
-                                        "{}"
-                                        if function_arguments == ""
-                                        else function_arguments
-                                    ),
-                                    "name": function_name,
-                                },
-                                "type": "function",
-                                "index": 0,
-                            }
-                        ],
-                    )
-                )
+    def _speak_llm_text(self, content, response_message):
+        response_message.append(content)
+        self.tts.tts_text_queue.put(
+            TTSMessageDTO(
+                sentence_id=self.sentence_id,
+                sentence_type=SentenceType.MIDDLE,
+                content_type=ContentType.TEXT,
+                content_detail=content,
+            )
+        )
 
-                self.dialogue.put(
-                    Message(
-                        role="tool",
-                        tool_call_id=(
-                            str(uuid.uuid4()) if function_id is None else function_id
-                        ),
-                        content=text,
+    def _start_tool_call(self, function_call_data):
+        """参数完整的函数调用立即在后台开始执行，返回执行任务"""
+        self.logger.bind(tag=TAG).debug(
+            f"function_name={function_call_data['name']}, function_id={function_call_data['id']}, "
+            f"function_arguments={function_call_data['arguments']}"
+        )
+        # 使用统一工具处理器处理所有工具调用
+        return self.start_pipeline_task(
+            self.func_handler.handle_llm_function_call(self, function_call_data)
+        )
+
+    def _uses_personal_context(self):
+        """请求中是否会带上设备的记忆或说话人信息"""
+        if self.config.get("voiceprint", {}).get("speakers"):
+            return True
+        if self.memory is None:
+            return False
+        selected = self.config.get("selected_module", {}).get("Memory")
+        memory_config = self.config.get("Memory", {}).get(selected) or {}
+        return memory_config.get("type", selected) != "nomem"
+
+    def _reply_from_cache(self, text):
+        """命中回复缓存，跳过LLM请求直接送TTS"""
+        self.logger.bind(tag=TAG).info(f"命中回复缓存: {text}")
+        self.start_pipeline_task(textUtils.get_emotion(self, text))
+        self.tts.tts_text_queue.put(
+            TTSMessageDTO(
+                sentence_id=self.sentence_id,
+                sentence_type=SentenceType.MIDDLE,
+                content_type=ContentType.TEXT,
+                content_detail=text,
+            )
+        )
+        self.tts_MessageText = text
+        self.dialogue.put(Message(role="assistant", content=text))
+        self.tts.tts_text_queue.put(
+            TTSMessageDTO(
+                sentence_id=self.sentence_id,
+                sentence_type=SentenceType.LAST,
+                content_type=ContentType.ACTION,
+            )
+        )
+        self._compact_dialogue()
+        self.llm_finish_task = True
+
+    async def _handle_function_results(self, calls, results, depth):
+        """处理同一轮的函数调用结果
+
+        直接回复的结果按调用顺序播报；需要LLM继续处理的结果合并为一条带多个tool_calls的
+        assistant消息和对应的tool消息写入对话，再只请求一次LLM生成回复。
+        有结果需要LLM处理时，执行失败或超时的调用也作为tool结果交给LLM，由LLM说明情况
+        """
+        need_llm = any(
+            result.action == Action.REQLLM and result.result for result in results
+        )
+        tool_calls = []
+        tool_messages = []
+        for function_call_data, result in zip(calls, results):
+            if result.action == Action.RESPONSE:  # 直接回复前端
+                text = result.response
+                self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
+                self.dialogue.put(Message(role="assistant", content=text))
+                continue
+            if result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
+                text = result.result
+            elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
+                if not need_llm:
+                    text = result.response if result.response else result.result
+                    self.tts.tts_one_sentence(
+                        self, ContentType.TEXT, content_detail=text
                     )
-                )
-                self.chat(text, depth=depth + 1)
-        elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
-            text = result.response if result.response else result.result
-            self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
-            self.dialogue.put(Message(role="assistant", content=text))
-        else:
-            pass
+                    self.dialogue.put(Message(role="assistant", content=text))
+                    continue
+                text = result.result if result.result else result.response
+            else:
+                continue
+            if text is None or len(text) == 0:
+                continue
+            function_id = function_call_data["id"] or str(uuid.uuid4())
+            function_arguments = function_call_data["arguments"]
+            tool_calls.append(
+                {
+                    "id": function_id,
+                    "function": {
+                        "arguments": (
+                            "{}" if function_arguments == "" else function_arguments
+                        ),
+                        "name": function_call_data["name"],
+                    },
+                    "type": "function",
+                    "index": len(tool_calls),
+                }
+            )
+            tool_messages.append(
+                Message(role="tool", tool_call_id=function_id, content=text)
+            )
 
-    def _report_worker(self):
-        """聊天记录上报工作线程"""
+        if not tool_calls:
+            return
+        self.dialogue.put(Message(role="assistant", tool_calls=tool_calls))
+        for message in tool_messages:
+            self.dialogue.put(message)
+        await self.chat(
+            "\n".join(message.content for message in tool_messages), depth=depth + 1
+        )
+
+    async def _report_worker(self):
+        """聊天记录上报任务"""
         while not self.stop_event.is_set():
             try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.report_queue.get(timeout=1)
+                item = await self.report_queue.get()
                 if item is None:  # 检测毒丸对象
                     break
                 try:
                     # 检查线程池状态
                     if self.executor is None:
                         continue
-                    # 提交任务到线程池
-                    self.executor.submit(self._process_report, *item)
+                    # 上报是阻塞的HTTP请求，作为后台任务提交到线程池
+                    self.background_executor.submit(self._process_report, *item)
                 except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
-            except queue.Empty:
-                continue
+                    self.logger.bind(tag=TAG).error(f"聊天记录上报任务异常: {e}")
+            except asyncio.CancelledError:
+                break
             except Exception as e:
-                self.logger.bind(tag=TAG).error(f"聊天记录上报工作线程异常: {e}")
+                self.logger.bind(tag=TAG).error(f"聊天记录上报任务异常: {e}")
 
-        self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
+        self.logger.bind(tag=TAG).info("聊天记录上报任务已退出")
 
     def _process_report(self, type, text, audio_data, report_time):
         """处理上报任务"""
@@ -997,9 +1462,6 @@ class ConnectionHandler:
             report(self, type, text, audio_data, report_time)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"上报处理异常: {e}")
-        finally:
-            # 标记任务完成
-            self.report_queue.task_done()
 
     def clearSpeakStatus(self):
         self.client_is_speaking = False
@@ -1021,8 +1483,13 @@ class ConnectionHandler:
                     pass
                 self.timeout_task = None
 
+            # 暂存会话供设备重连时恢复，暂存的工具处理器由会话缓存负责释放
+            parked = self._park_session()
+
             # 清理工具处理器资源
-            if hasattr(self, "func_handler") and self.func_handler:
+            if not parked:
+                self._release_llm_instances()
+            if hasattr(self, "func_handler") and self.func_handler and not parked:
                 try:
                     await self.func_handler.cleanup()
                 except Exception as cleanup_error:
@@ -1036,6 +1503,34 @@ class ConnectionHandler:
 
             # 清空任务队列
             self.clear_queues()
+            if self.audio_stream:
+                self.audio_stream.close()
+            if self.jitter_drain_handle:
+                self.jitter_drain_handle.cancel()
+                self.jitter_drain_handle = None
+            if self.jitter_buffer:
+                self.logger.bind(tag=TAG).info(
+                    f"上行音频抖动缓冲统计: {self.jitter_buffer.get_stats()}"
+                )
+            if self.dialogue.prefix_stats["requests"]:
+                self.logger.bind(tag=TAG).info(
+                    f"提示词前缀稳定性统计: {self.dialogue.get_prefix_stats()}"
+                )
+            if self.speculation is not None:
+                self.speculation.cancel()
+                if self.speculation.stats["started"]:
+                    self.logger.bind(tag=TAG).info(
+                        f"投机请求统计: {self.speculation.get_stats()}"
+                    )
+            if hasattr(self.llm, "get_stats"):
+                self.logger.bind(tag=TAG).info(f"LLM故障转移统计（进程内累计）: {self.llm.get_stats()}")
+            if self.abort_stats["aborts"]:
+                self.logger.bind(tag=TAG).info(f"打断统计: {self.get_abort_stats()}")
+            if self.turn_stats["turns"]:
+                self.logger.bind(tag=TAG).info(
+                    f"LLM请求统计: {self.get_turn_stats()}，"
+                    f"对话窗口: {self.dialogue.get_window_stats()}"
+                )
 
             # 关闭WebSocket连接
             try:
@@ -1076,15 +1571,14 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
-            # 最后关闭线程池（避免阻塞）
-            if self.executor:
-                try:
-                    self.executor.shutdown(wait=False)
-                except Exception as executor_error:
-                    self.logger.bind(tag=TAG).error(
-                        f"关闭线程池时出错: {executor_error}"
-                    )
-                self.executor = None
+            # 取消连接内的流水线任务，共享线程池由进程统一管理，不在这里关闭
+            for task in list(self.pipeline_tasks):
+                if task is not asyncio.current_task():
+                    task.cancel()
+            self.executor = None
+            self.logger.bind(tag=TAG).debug(
+                f"共享线程池状态: {get_executor_pool().get_stats()}"
+            )
 
             self.logger.bind(tag=TAG).info("连接资源已释放")
         except Exception as e:
@@ -1095,7 +1589,11 @@ class ConnectionHandler:
                 self.stop_event.set()
 
     def clear_queues(self):
-        """清空所有任务队列"""
+        """清空所有任务队列，返回丢弃的待合成文本字数"""
+        dropped_chars = 0
+        if self.audio_stream:
+            # 丢弃调度器中尚未发出的音频帧
+            self.audio_stream.clear()
         if self.tts:
             self.logger.bind(tag=TAG).debug(
                 f"开始清理: TTS队列大小={self.tts.tts_text_queue.qsize()}, 音频队列大小={self.tts.tts_audio_queue.qsize()}"
@@ -1111,13 +1609,16 @@ class ConnectionHandler:
                     continue
                 while True:
                     try:
-                        q.get_nowait()
+                        item = q.get_nowait()
                     except queue.Empty:
                         break
+                    if isinstance(item, TTSMessageDTO) and item.content_detail:
+                        dropped_chars += len(item.content_detail)
 
             self.logger.bind(tag=TAG).debug(
                 f"清理结束: TTS队列大小={self.tts.tts_text_queue.qsize()}, 音频队列大小={self.tts.tts_audio_queue.qsize()}"
             )
+        return dropped_chars
 
     def reset_vad_states(self):
         self.client_audio_buffer = bytearray()
@@ -1125,11 +1626,11 @@ class ConnectionHandler:
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
 
-    def chat_and_close(self, text):
+    async def chat_and_close(self, text):
         """Chat with the user and then close the connection"""
         try:
             # Use the existing chat method
-            self.chat(text)
+            await self.chat(text)
 
             # After chat is complete, close the connection
             self.close_after_chat = True
@@ -5,9 +5,8 @@ TAG = __name__
 
 async def handleAbortMessage(conn):
     conn.logger.bind(tag=TAG).info("Abort message received")
-    # 设置成打断状态，会自动打断llm、tts任务
-    conn.client_abort = True
-    conn.clear_queues()
+    # 关闭LLM流式请求、取消进行中的语音合成并停止下行音频
+    await conn.abort_turn()
     # 打断客户端说话状态
     await conn.websocket.send(
         json.dumps({"type": "tts", "state": "stop", "session_id": conn.session_id})
@@ -6,7 +6,11 @@ from core.utils.dialogue import Message
 from core.utils.util import audio_to_data
 from core.providers.tts.dto.dto import SentenceType
 from core.utils.wakeup_word import WakeupWordsConfig
-from core.handle.sendAudioHandle import sendAudioMessage, send_stt_message
+from core.handle.sendAudioHandle import (
+    sendAudioMessage,
+    send_stt_message,
+    negotiate_audio_batch,
+)
 from core.utils.util import remove_punctuation_and_length, opus_datas_to_wav_bytes
 from core.providers.tools.device_mcp import (
     MCPClient,
@@ -35,6 +39,8 @@ async def handleHelloMessage(conn, msg_json):
         format = audio_params.get("format")
         conn.logger.bind(tag=TAG).info(f"客户端音频格式: {format}")
         conn.audio_format = format
+        if audio_params.get("frame_duration"):
+            conn.audio_frame_duration = int(audio_params["frame_duration"])
         conn.welcome_msg["audio_params"] = audio_params
     features = msg_json.get("features")
     if features:
@@ -47,6 +53,15 @@ async def handleHelloMessage(conn, msg_json):
             asyncio.create_task(send_mcp_initialize_message(conn))
             # 发送mcp消息，获取tools列表
             asyncio.create_task(send_mcp_tools_list_request(conn))
+        if features.get("audio_batch"):
+            max_frames = negotiate_audio_batch(conn, features.get("audio_batch"))
+            if max_frames > 1:
+                conn.logger.bind(tag=TAG).info(
+                    f"客户端支持多帧音频消息，每条最多{max_frames}帧"
+                )
+                conn.welcome_msg.setdefault("features", {})["audio_batch"] = {
+                    "max_frames": max_frames
+                }
 
     await conn.websocket.send(json.dumps(conn.welcome_msg))
 
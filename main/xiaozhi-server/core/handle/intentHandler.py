@@ -12,7 +12,8 @@ from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType
 TAG = __name__
 
 
-async def handle_user_intent(conn, text):
+async def handle_user_intent(conn, text, intent_result=None):
+    """处理用户意图，intent_result为提前识别（投机请求）的结果时不再重复识别"""
     # 预处理输入文本，处理可能的JSON格式
     try:
         if text.strip().startswith('{') and text.strip().endswith('}'):
@@ -36,7 +37,8 @@ async def handle_user_intent(conn, text):
         # 使用支持function calling的聊天方法,不再进行意图分析
         return False
     # 使用LLM进行意图分析
-    intent_result = await analyze_intent_with_llm(conn, text)
+    if intent_result is None:
+        intent_result = await analyze_intent_with_llm(conn, text)
     if not intent_result:
         return False
     # 会话开始时生成sentence_id
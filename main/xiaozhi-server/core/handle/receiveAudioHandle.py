@@ -62,7 +62,17 @@ async def startToChat(conn, text):
     else:
         conn.current_speaker = None
 
+    # 最终结果与提前发起的投机请求一致时直接采用，否则取消
+    speculation = None
+    if conn.speculation is not None:
+        speculation = conn.speculation.take(actual_text)
+
+    # 新连接的TTS、意图等组件可能仍在后台初始化
+    await conn.wait_components_ready()
+
     if conn.need_bind:
+        if speculation is not None:
+            speculation.cancel()
         await check_bind_device(conn)
         return
 
@@ -71,21 +81,37 @@ async def startToChat(conn, text):
         if check_device_output_limit(
             conn.headers.get("device-id"), conn.max_output_size
         ):
+            if speculation is not None:
+                speculation.cancel()
             await max_out_size(conn)
             return
     if conn.client_is_speaking:
         await handleAbortMessage(conn)
 
+    intent_result = None
+    if speculation is not None:
+        await speculation.ready.wait()
+        if speculation.error is not None:
+            speculation = None
+        else:
+            intent_result = speculation.intent_result
+
     # 首先进行意图分析，使用实际文本内容
-    intent_handled = await handle_user_intent(conn, actual_text)
+    intent_handled = await handle_user_intent(conn, actual_text, intent_result)
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
+        if speculation is not None:
+            speculation.cancel()
         return
 
+    # 只有意图识别结果的投机请求（需要调用函数但最终未处理）不能用于聊天
+    if speculation is not None and speculation.queue is None:
+        speculation = None
+
     # 意图未被处理，继续常规聊天流程，使用实际文本内容
     await send_stt_message(conn, actual_text)
-    conn.executor.submit(conn.chat, actual_text)
+    conn.start_pipeline_task(conn.chat(actual_text, speculation=speculation))
 
 
 async def no_voice_close_connect(conn, have_voice):
@@ -1,12 +1,21 @@
 import json
 import time
-import asyncio
 from core.utils import textUtils
+from core.utils.audio_scheduler import audio_scheduler
+from core.utils.mqtt_framing import (
+    pack_frames,
+    pack_packet,
+    pack_batch_packet,
+    PACKET_TYPE_AUDIO,
+)
 from core.utils.util import audio_to_data
 from core.providers.tts.dto.dto import SentenceType
 
 TAG = __name__
 
+# 整段音频开始播放时立即发送的帧数
+PRE_BUFFER_FRAMES = 3
+
 
 async def sendAudioMessage(conn, sentenceType, audios, text):
     if conn.tts.tts_audio_first_sentence:
@@ -24,38 +33,19 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
 
     # 发送结束消息（如果是最后一个文本）
     if conn.llm_finish_task and sentenceType == SentenceType.LAST:
+        if conn.audio_stream:
+            conn.logger.bind(tag=TAG).debug(
+                f"下行音频节拍统计: {conn.audio_stream.get_stats()}"
+            )
         await send_tts_message(conn, "stop", None)
         conn.client_is_speaking = False
         if conn.close_after_chat:
             await conn.close()
 
 
-def calculate_timestamp_and_sequence(conn, start_time, packet_index, frame_duration=60):
-    """
-    计算音频数据包的时间戳和序列号
-    Args:
-        conn: 连接对象
-        start_time: 起始时间（性能计数器值）
-        packet_index: 数据包索引
-        frame_duration: 帧时长（毫秒），匹配 Opus 编码
-    Returns:
-        tuple: (timestamp, sequence)
-    """
-    # 计算时间戳（使用播放位置计算）
-    timestamp = int((start_time + packet_index * frame_duration / 1000) * 1000) % (
-        2**32
-    )
-
-    # 计算序列号
-    if hasattr(conn, "audio_flow_control"):
-        sequence = conn.audio_flow_control["sequence"]
-    else:
-        sequence = packet_index  # 如果没有流控状态，直接使用索引
-
-    return timestamp, sequence
-
-
-async def _send_to_mqtt_gateway(conn, opus_packet, timestamp, sequence):
+async def _send_to_mqtt_gateway(
+    conn, opus_packet, timestamp, sequence, packet_type=PACKET_TYPE_AUDIO
+):
     """
     发送带16字节头部的opus数据包给mqtt_gateway
     Args:
@@ -63,127 +53,93 @@ async def _send_to_mqtt_gateway(conn, opus_packet, timestamp, sequence):
         opus_packet: opus数据包
         timestamp: 时间戳
         sequence: 序列号
+        packet_type: 包类型，默认单帧opus
     """
-    # 为opus数据包添加16字节头部
-    header = bytearray(16)
-    header[0] = 1  # type
-    header[2:4] = len(opus_packet).to_bytes(2, "big")  # payload length
-    header[4:8] = sequence.to_bytes(4, "big")  # sequence
-    header[8:12] = timestamp.to_bytes(4, "big")  # 时间戳
-    header[12:16] = len(opus_packet).to_bytes(4, "big")  # opus长度
-
-    # 发送包含头部的完整数据包
-    complete_packet = bytes(header) + opus_packet
-    await conn.websocket.send(complete_packet)
+    # 头部直接写入包缓冲区，整个包只分配一次
+    await conn.websocket.send(pack_packet(opus_packet, timestamp, sequence, packet_type))
 
 
-# 播放音频
-async def sendAudio(conn, audios, frame_duration=60):
+def negotiate_audio_batch(conn, audio_batch):
     """
-    发送单个opus包，支持流控
+    协商多帧合并下发能力，返回本连接每条消息最多合并的帧数
     Args:
         conn: 连接对象
-        opus_packet: 单个opus数据包
-        pre_buffer: 快速发送音频
-        frame_duration: 帧时长（毫秒），匹配 Opus 编码
+        audio_batch: 客户端hello中features.audio_batch的值，true或{"max_frames": N}
     """
-    if audios is None or len(audios) == 0:
-        return
-
-    if isinstance(audios, bytes):
-        if conn.client_abort:
-            return
-
-        conn.last_activity_time = time.time() * 1000
-
-        # 获取或初始化流控状态
-        if not hasattr(conn, "audio_flow_control"):
-            conn.audio_flow_control = {
-                "last_send_time": 0,
-                "packet_count": 0,
-                "start_time": time.perf_counter(),
-                "sequence": 0,  # 添加序列号
-            }
-
-        flow_control = conn.audio_flow_control
-        current_time = time.perf_counter()
-        # 计算预期发送时间
-        expected_time = flow_control["start_time"] + (
-            flow_control["packet_count"] * frame_duration / 1000
-        )
-        delay = expected_time - current_time
-        if delay > 0:
-            await asyncio.sleep(delay)
-        else:
-            # 纠正误差
-            flow_control["start_time"] += abs(delay)
-
-        if conn.conn_from_mqtt_gateway:
-            # 计算时间戳和序列号
-            timestamp, sequence = calculate_timestamp_and_sequence(
-                conn,
-                flow_control["start_time"],
-                flow_control["packet_count"],
-                frame_duration,
-            )
-            # 调用通用函数发送带头部的数据包
-            await _send_to_mqtt_gateway(conn, audios, timestamp, sequence)
-        else:
-            # 直接发送opus数据包，不添加头部
-            await conn.websocket.send(audios)
-
-        # 更新流控状态
-        flow_control["packet_count"] += 1
-        flow_control["sequence"] += 1
-        flow_control["last_send_time"] = time.perf_counter()
-    else:
-        # 文件型音频走普通播放
-        start_time = time.perf_counter()
-        play_position = 0
-
-        # 执行预缓冲
-        pre_buffer_frames = min(3, len(audios))
-        for i in range(pre_buffer_frames):
+    server_max = int(conn.config.get("audio_batch_max_frames", 8) or 0)
+    client_max = server_max
+    if isinstance(audio_batch, dict):
+        client_max = int(audio_batch.get("max_frames", server_max) or 0)
+    max_frames = min(server_max, client_max)
+    conn.audio_batch_max_frames = max_frames if max_frames > 1 else 1
+    if conn.audio_stream:
+        conn.audio_stream.max_frames_per_message = conn.audio_batch_max_frames
+    return conn.audio_batch_max_frames
+
+
+def get_audio_stream(conn, frame_duration=60):
+    """获取连接的下行音频流，首次调用时在全局调度器上注册"""
+    stream = getattr(conn, "audio_stream", None)
+    if stream is None or stream.closed:
+
+        async def send_frames(opus_packets, timestamp, sequence):
+            # 重置没有声音的状态
+            conn.last_activity_time = time.time() * 1000
             if conn.conn_from_mqtt_gateway:
-                # 计算时间戳和序列号
-                timestamp, sequence = calculate_timestamp_and_sequence(
-                    conn, start_time, i, frame_duration
+                await conn.websocket.send(
+                    pack_batch_packet(opus_packets, timestamp, sequence)
                 )
-                # 调用通用函数发送带头部的数据包
-                await _send_to_mqtt_gateway(conn, audios[i], timestamp, sequence)
             else:
-                # 直接发送预缓冲包，不添加头部
-                await conn.websocket.send(audios[i])
-        remaining_audios = audios[pre_buffer_frames:]
-
-        # 播放剩余音频帧
-        for i, opus_packet in enumerate(remaining_audios):
-            if conn.client_abort:
-                break
+                await conn.websocket.send(pack_frames(opus_packets))
 
+        async def send_frame(opus_packet, timestamp, sequence):
+            if conn.audio_batch_max_frames > 1:
+                # 协商了多帧格式后，单帧也按同一格式发送，客户端无需区分
+                await send_frames([opus_packet], timestamp, sequence)
+                return
             # 重置没有声音的状态
             conn.last_activity_time = time.time() * 1000
-
-            # 计算预期发送时间
-            expected_time = start_time + (play_position / 1000)
-            current_time = time.perf_counter()
-            delay = expected_time - current_time
-            if delay > 0:
-                await asyncio.sleep(delay)
-
             if conn.conn_from_mqtt_gateway:
-                # 计算时间戳和序列号（使用当前的数据包索引确保连续性）
-                packet_index = pre_buffer_frames + i
-                timestamp, sequence = calculate_timestamp_and_sequence(
-                    conn, start_time, packet_index, frame_duration
-                )
                 # 调用通用函数发送带头部的数据包
                 await _send_to_mqtt_gateway(conn, opus_packet, timestamp, sequence)
             else:
                 # 直接发送opus数据包，不添加头部
                 await conn.websocket.send(opus_packet)
 
-            play_position += frame_duration
+        stream = audio_scheduler.create_stream(
+            send_frame,
+            frame_duration=frame_duration,
+            should_drop=lambda: conn.client_abort,
+            name=conn.session_id,
+            send_frames=send_frames,
+            max_frames_per_message=conn.audio_batch_max_frames,
+        )
+        conn.audio_stream = stream
+    return stream
+
+
+# 播放音频
+async def sendAudio(conn, audios, frame_duration=60):
+    """
+    把音频交给全局调度器按帧时长发送，发送完成后返回
+    Args:
+        conn: 连接对象
+        audios: 单个opus包（流式TTS），或整段音频的opus包列表
+        frame_duration: 帧时长（毫秒），匹配 Opus 编码
+    """
+    if audios is None or len(audios) == 0:
+        return
+    if conn.client_abort:
+        return
+
+    conn.last_activity_time = time.time() * 1000
+    stream = get_audio_stream(conn, frame_duration)
+    if isinstance(audios, bytes):
+        # 流式音频逐包到达，沿用同一条节拍时间线
+        await stream.enqueue([audios])
+    else:
+        # 文件型音频先快速发送预缓冲帧，其余按节拍播放
+        await stream.enqueue(audios, pre_buffer=PRE_BUFFER_FRAMES)
 
 
 async def send_tts_message(conn, state, text=None):
@@ -32,7 +32,12 @@ class SimpleHttpServer:
         else:
             return f"ws://{local_ip}:{port}/xiaozhi/v1/"
 
-    async def start(self):
+    async def start(self, sock=None):
+        """启动服务
+
+        Args:
+            sock: 已绑定的监听socket，多进程模式下由工作进程创建；为None时按配置的地址端口监听
+        """
         server_config = self.config["server"]
         read_config_from_api = self.config.get("read_config_from_api", False)
         host = server_config.get("ip", "0.0.0.0")
@@ -62,7 +67,10 @@ class SimpleHttpServer:
             # 运行服务
             runner = web.AppRunner(app)
             await runner.setup()
-            site = web.TCPSite(runner, host, port)
+            if sock is not None:
+                site = web.SockSite(runner, sock)
+            else:
+                site = web.TCPSite(runner, host, port)
             await site.start()
 
             # 保持服务运行
@@ -0,0 +1,302 @@
+"""
+多进程（预fork）服务模式
+主进程加载一次VAD/ASR/LLM等模块后fork出多个工作进程，模型权重通过写时复制共享；
+每个工作进程用SO_REUSEPORT各自监听同一端口，由内核把新连接分摊到各进程，突破单进程GIL的限制
+
+进程内状态的共享策略：
+- 设备每日输出字数（output_counter）：共享，主进程通过Manager进程托管一个计数器，工作进程访问代理，
+  否则同一设备的限额会按工作进程数放大
+- 全局缓存（cache_manager）、Opus编解码器池、下行音频调度器、TTS上游连接池、共享线程池：
+  进程本地，都可以在进程内重建，不需要跨进程一致
+- 设备会话缓存（session_cache）：进程本地，重连落到其他工作进程时按新连接处理
+- 共享LLM实例（llm_registry）：进程本地，fork前创建的实例由各工作进程继承
+- LLM回复缓存（response_cache）：进程本地，各工作进程分别积累，命中率随进程数略有下降
+"""
+
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import multiprocessing
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional
+
+from config.logger import setup_logging
+from core.utils import output_counter
+
+TAG = __name__
+logger = setup_logging()
+
+# 进程内状态的共享策略，见模块说明
+STATE_POLICY = {
+    "output_counter": "shared",
+    "cache_manager": "local",
+    "opus_codec_pool": "local",
+    "audio_scheduler": "local",
+    "ws_session_pool": "local",
+    "executors": "local",
+    "session_cache": "local",
+    "llm_registry": "local",
+    "response_cache": "local",
+}
+
+DEFAULT_HEARTBEAT_INTERVAL = 5
+DEFAULT_HEARTBEAT_TIMEOUT = 30
+DEFAULT_DRAIN_TIMEOUT = 30
+# 工作进程启动后存活不足该时长就退出，视为启动失败，重启间隔按指数退避
+MIN_HEALTHY_UPTIME = 10
+MAX_RESTART_BACKOFF = 30
+
+# 当前进程为工作进程时记录主进程pid
+_supervisor_pid: Optional[int] = None
+
+
+class _StateManager(BaseManager):
+    pass
+
+
+_StateManager.register("DeviceOutputCounter", output_counter.DeviceOutputCounter)
+
+
+def supports_prefork() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")
+
+
+def is_worker() -> bool:
+    return _supervisor_pid is not None
+
+
+def request_restart() -> bool:
+    """工作进程内请求重启整个服务，由主进程排空所有工作进程后重新执行
+
+    Returns:
+        bool: 当前为工作进程并已通知主进程时返回True，单进程模式返回False
+    """
+    if _supervisor_pid is None:
+        return False
+    os.kill(_supervisor_pid, signal.SIGHUP)
+    return True
+
+
+def create_listen_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+    return sock
+
+
+class _WorkerSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        # 工作进程定期写入的心跳时间戳
+        self.heartbeat = multiprocessing.Value("d", 0.0, lock=False)
+        self.started_at = 0.0
+        self.restarts = 0
+        self.backoff = 0.0
+        self.restart_at = 0.0
+
+
+class PreforkServer:
+    """预fork多进程服务的主进程
+
+    Args:
+        config: 服务配置
+        ws_server: 已加载好模块的WebSocketServer，fork后由各工作进程直接使用
+        http_server: SimpleHttpServer
+        workers: 工作进程数
+    """
+
+    def __init__(self, config: dict, ws_server, http_server, workers: int):
+        server_config = config.get("server", {})
+        self.ws_server = ws_server
+        self.http_server = http_server
+        self.workers = workers
+        self.host = server_config.get("ip", "0.0.0.0")
+        self.ws_port = int(server_config.get("port", 8000))
+        self.http_port = int(server_config.get("http_port", 8003) or 0)
+        self.heartbeat_interval = DEFAULT_HEARTBEAT_INTERVAL
+        self.heartbeat_timeout = int(
+            server_config.get("worker_heartbeat_timeout") or DEFAULT_HEARTBEAT_TIMEOUT
+        )
+        self.drain_timeout = int(
+            server_config.get("worker_drain_timeout") or DEFAULT_DRAIN_TIMEOUT
+        )
+        self.context = multiprocessing.get_context("fork")
+        self.slots: List[_WorkerSlot] = []
+        self.state_manager: Optional[_StateManager] = None
+        self.shared_counter = None
+        self._stop_signal: Optional[int] = None
+
+    def run(self):
+        """启动工作进程并监控，直到收到SIGTERM/SIGINT（退出）或SIGHUP（重启）"""
+        # 共享状态放在独立的Manager进程中，需在fork工作进程前启动
+        self.state_manager = _StateManager(ctx=self.context)
+        self.state_manager.start()
+        self.shared_counter = self.state_manager.DeviceOutputCounter()
+
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, self._on_signal)
+
+        # 模型加载完成后冻结现有对象，避免子进程里的GC扫描弄脏写时复制的内存页
+        gc.collect()
+        gc.freeze()
+
+        self.slots = [_WorkerSlot(i) for i in range(self.workers)]
+        for slot in self.slots:
+            self._spawn(slot)
+        logger.bind(tag=TAG).info(
+            f"多进程模式已启动，主进程pid: {os.getpid()}，工作进程数: {self.workers}"
+        )
+
+        while self._stop_signal is None:
+            self._check_workers()
+            time.sleep(1)
+
+        restart = self._stop_signal == signal.SIGHUP
+        self._drain_workers()
+        self.state_manager.shutdown()
+        if restart:
+            logger.bind(tag=TAG).info("所有工作进程已退出，重新启动服务...")
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        logger.bind(tag=TAG).info("所有工作进程已退出，程序退出。")
+
+    def _on_signal(self, signum, frame):
+        if self._stop_signal is None:
+            self._stop_signal = signum
+
+    def _spawn(self, slot: _WorkerSlot):
+        slot.heartbeat.value = time.time()
+        slot.started_at = time.monotonic()
+        slot.process = self.context.Process(
+            target=self._worker_entry,
+            args=(slot.index, slot.heartbeat),
+            name=f"xiaozhi-worker-{slot.index}",
+        )
+        slot.process.start()
+        logger.bind(tag=TAG).info(
+            f"工作进程{slot.index}已启动，pid: {slot.process.pid}"
+        )
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for slot in self.slots:
+            process = slot.process
+            if process is None:
+                if now >= slot.restart_at:
+                    slot.restarts += 1
+                    self._spawn(slot)
+                continue
+
+            if process.is_alive():
+                # 心跳超时说明工作进程的事件循环被长时间阻塞，强制结束后重启
+                if time.time() - slot.heartbeat.value > self.heartbeat_timeout:
+                    logger.bind(tag=TAG).error(
+                        f"工作进程{slot.index}心跳超时，强制重启，pid: {process.pid}"
+                    )
+                    process.kill()
+                    process.join(5)
+                else:
+                    continue
+
+            uptime = now - slot.started_at
+            if uptime < MIN_HEALTHY_UPTIME:
+                slot.backoff = min(max(1.0, slot.backoff * 2), MAX_RESTART_BACKOFF)
+            else:
+                slot.backoff = 0.0
+            logger.bind(tag=TAG).warning(
+                f"工作进程{slot.index}已退出，退出码: {process.exitcode}，"
+                f"运行{uptime:.0f}秒，{slot.backoff:.0f}秒后重启"
+            )
+            process.close()
+            slot.process = None
+            slot.restart_at = now + slot.backoff
+
+    def _drain_workers(self):
+        """通知所有工作进程停止接受新连接，等待已有连接结束，超时后强制结束"""
+        alive = [slot.process for slot in self.slots if slot.process is not None]
+        logger.bind(tag=TAG).info(
+            f"正在排空{len(alive)}个工作进程，最长等待{self.drain_timeout}秒"
+        )
+        for process in alive:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.drain_timeout + 5
+        for process in alive:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.bind(tag=TAG).warning(
+                    f"工作进程排空超时，强制结束，pid: {process.pid}"
+                )
+                process.kill()
+                process.join()
+
+    def _worker_entry(self, index: int, heartbeat):
+        """工作进程入口（fork后执行）"""
+        global _supervisor_pid
+        _supervisor_pid = os.getppid()
+        # Ctrl-C会发给整个进程组，工作进程只响应主进程转发的SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        output_counter.use_counter(self.shared_counter)
+
+        try:
+            asyncio.run(self._serve(index, heartbeat))
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"工作进程{index}异常退出: {e}")
+            sys.exit(1)
+
+    async def _serve(self, index: int, heartbeat):
+        loop = asyncio.get_running_loop()
+        stop_event = asyncio.Event()
+        loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+
+        # 每个工作进程各自创建监听socket，SO_REUSEPORT让内核在进程间分摊连接
+        ws_sock = create_listen_socket(self.host, self.ws_port, reuse_port=True)
+        tasks = [asyncio.create_task(self.ws_server.start(sock=ws_sock))]
+        if self.http_port:
+            http_sock = create_listen_socket(self.host, self.http_port, reuse_port=True)
+            tasks.append(asyncio.create_task(self.http_server.start(sock=http_sock)))
+        heartbeat_task = asyncio.create_task(self._heartbeat(heartbeat))
+        stop_task = asyncio.create_task(stop_event.wait())
+
+        done, _ = await asyncio.wait(
+            [stop_task, *tasks], return_when=asyncio.FIRST_COMPLETED
+        )
+        if stop_task not in done:
+            # 服务任务意外结束（如端口被占用），让主进程按退避策略重启
+            for task in done:
+                if task.exception():
+                    raise task.exception()
+            raise RuntimeError("服务任务意外结束")
+
+        remaining = await self.ws_server.drain(self.drain_timeout)
+        logger.bind(tag=TAG).info(
+            f"工作进程{index}排空完成，强制关闭剩余连接数: {remaining}"
+        )
+        for task in [*tasks, heartbeat_task]:
+            task.cancel()
+        await asyncio.wait(tasks, timeout=3.0)
+
+    async def _heartbeat(self, heartbeat):
+        while True:
+            heartbeat.value = time.time()
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "workers": self.workers,
+            "alive": sum(
+                1 for slot in self.slots if slot.process and slot.process.is_alive()
+            ),
+            "restarts": {slot.index: slot.restarts for slot in self.slots},
+        }
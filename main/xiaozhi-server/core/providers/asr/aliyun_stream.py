@@ -243,6 +243,7 @@ class ASRProvider(ASRProviderBase):
                         text = payload.get("result", "")
                         if text:
                             self.text = text
+                            self.on_partial_text(conn, text)
                     elif message_name == "SentenceEnd":
                         # 最终结果
                         text = payload.get("result", "")
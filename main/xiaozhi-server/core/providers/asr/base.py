@@ -4,18 +4,16 @@ import wave
 import uuid
 import json
 import time
-import queue
 import asyncio
 import traceback
-import threading
 import opuslib_next
-import concurrent.futures
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.opus_codec_pool import opus_codec_pool
 from core.handle.receiveAudioHandle import handleAudioMessage
 
 TAG = __name__
@@ -28,23 +26,18 @@ class ASRProviderBase(ABC):
 
     # 打开音频通道
     async def open_audio_channels(self, conn):
-        conn.asr_priority_thread = threading.Thread(
-            target=self.asr_text_priority_thread, args=(conn,), daemon=True
+        conn.asr_priority_task = conn.start_pipeline_task(
+            self.asr_text_priority_task(conn)
         )
-        conn.asr_priority_thread.start()
 
     # 有序处理ASR音频
-    def asr_text_priority_thread(self, conn):
+    async def asr_text_priority_task(self, conn):
         while not conn.stop_event.is_set():
             try:
-                message = conn.asr_audio_queue.get(timeout=1)
-                future = asyncio.run_coroutine_threadsafe(
-                    handleAudioMessage(conn, message),
-                    conn.loop,
-                )
-                future.result()
-            except queue.Empty:
-                continue
+                message = await conn.asr_audio_queue.get()
+                await handleAudioMessage(conn, message)
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.bind(tag=TAG).error(
                     f"处理ASR文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
@@ -129,23 +122,20 @@ class ASRProviderBase(ABC):
                     logger.bind(tag=TAG).error(f"声纹识别失败: {e}")
                     return None
             
-            # 使用线程池执行器并行运行
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as thread_executor:
-                asr_future = thread_executor.submit(run_asr)
-                
-                if conn.voiceprint_provider and wav_data:
-                    voiceprint_future = thread_executor.submit(run_voiceprint)
-                    
-                    # 等待两个线程都完成
-                    asr_result = asr_future.result(timeout=15)
-                    voiceprint_result = voiceprint_future.result(timeout=15)
-                    
-                    results = {"asr": asr_result, "voiceprint": voiceprint_result}
-                else:
-                    asr_result = asr_future.result(timeout=15)
-                    results = {"asr": asr_result, "voiceprint": None}
-            
-            
+            # ASR和声纹识别都是阻塞调用，在共享线程池中并行运行，不阻塞事件循环
+            loop = asyncio.get_running_loop()
+            asr_future = loop.run_in_executor(conn.executor, run_asr)
+            if conn.voiceprint_provider and wav_data:
+                voiceprint_future = loop.run_in_executor(conn.executor, run_voiceprint)
+                # 等待两个任务都完成
+                asr_result, voiceprint_result = await asyncio.wait_for(
+                    asyncio.gather(asr_future, voiceprint_future), timeout=15
+                )
+                results = {"asr": asr_result, "voiceprint": voiceprint_result}
+            else:
+                asr_result = await asyncio.wait_for(asr_future, timeout=15)
+                results = {"asr": asr_result, "voiceprint": None}
+
             # 处理结果
             raw_text, _ = results.get("asr", ("", None))
             speaker_name = results.get("voiceprint", None)
@@ -177,6 +167,11 @@ class ASRProviderBase(ABC):
             import traceback
             logger.bind(tag=TAG).debug(f"异常详情: {traceback.format_exc()}")
 
+    def on_partial_text(self, conn, text: str):
+        """流式ASR收到中间识别结果，开启投机请求时用于提前发起LLM请求"""
+        if text and conn.speculation is not None:
+            conn.speculation.on_partial(text)
+
     def _build_enhanced_text(self, text: str, speaker_name: Optional[str]) -> str:
         """构建包含说话人信息的文本"""
         if speaker_name and speaker_name.strip():
@@ -242,24 +237,25 @@ class ASRProviderBase(ABC):
     def decode_opus(opus_data: List[bytes]) -> List[bytes]:
         """将Opus音频数据解码为PCM数据"""
         try:
-            decoder = opuslib_next.Decoder(16000, 1)
             pcm_data = []
             buffer_size = 960  # 每次处理960个采样点 (60ms at 16kHz)
-            
-            for i, opus_packet in enumerate(opus_data):
-                try:
-                    if not opus_packet or len(opus_packet) == 0:
-                        continue
-                    
-                    pcm_frame = decoder.decode(opus_packet, buffer_size)
-                    if pcm_frame and len(pcm_frame) > 0:
-                        pcm_data.append(pcm_frame)
-                        
-                except opuslib_next.OpusError as e:
-                    logger.bind(tag=TAG).warning(f"Opus解码错误，跳过数据包 {i}: {e}")
-                except Exception as e:
-                    logger.bind(tag=TAG).error(f"音频处理错误，数据包 {i}: {e}")
-            
+
+            # 从进程级对象池借出解码器，借出时已重置状态
+            with opus_codec_pool.decoder(16000, 1) as decoder:
+                for i, opus_packet in enumerate(opus_data):
+                    try:
+                        if not opus_packet or len(opus_packet) == 0:
+                            continue
+
+                        pcm_frame = decoder.decode(opus_packet, buffer_size)
+                        if pcm_frame and len(pcm_frame) > 0:
+                            pcm_data.append(pcm_frame)
+
+                    except opuslib_next.OpusError as e:
+                        logger.bind(tag=TAG).warning(f"Opus解码错误，跳过数据包 {i}: {e}")
+                    except Exception as e:
+                        logger.bind(tag=TAG).error(f"音频处理错误，数据包 {i}: {e}")
+
             return pcm_data
             
         except Exception as e:
@@ -197,6 +197,11 @@ class ASRProvider(ASRProviderBase):
                                     if len(audio_data) > 15:  # 确保有足够音频数据
                                         await self.handle_voice_stop(conn, audio_data)
                                     break
+                            else:
+                                # 没有确定的分句时为中间结果
+                                self.on_partial_text(
+                                    conn, payload["result"].get("text", "")
+                                )
                         elif "error" in payload:
                             error_msg = payload.get("error", "未知错误")
                             logger.bind(tag=TAG).error(f"ASR服务返回错误: {error_msg}")
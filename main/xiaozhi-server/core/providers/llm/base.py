@@ -1,10 +1,106 @@
+import asyncio
+import weakref
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
+from core.utils.executors import INTERACTIVE, get_executor
 
 TAG = __name__
 logger = setup_logging()
 
+
+async def iterate_in_executor(generator):
+    """在共享线程池中逐个取同步生成器的结果，转换为异步生成器
+
+    只在等待下一个结果时占用线程，用于还没有原生异步实现的供应器
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor(INTERACTIVE)
+    done = object()
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, next, generator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        try:
+            await loop.run_in_executor(executor, generator.close)
+        except ValueError:
+            # 取消时生成器可能仍在其他线程中执行，由它自行结束
+            pass
+
+
+async def iterate_until_aborted(responses, abort, on_cancel=None):
+    """逐个读取流式输出，abort完成时不等下一个结果，立即取消读取
+
+    被取消的读取在生成器内部抛出CancelledError，供应器中的async with随之关闭上游请求
+
+    Args:
+        responses: LLM的异步生成器
+        abort: 打断时完成的future
+        on_cancel: 读取被取消时的回调
+    """
+    while True:
+        next_response = asyncio.ensure_future(responses.__anext__())
+        await asyncio.wait({next_response, abort}, return_when=asyncio.FIRST_COMPLETED)
+        if abort.done():
+            if not next_response.done():
+                next_response.cancel()
+                # 等生成器处理完取消，上游的流式请求随之关闭
+                await asyncio.wait({next_response})
+                if on_cancel is not None:
+                    on_cancel()
+            return
+        try:
+            response = next_response.result()
+        except StopAsyncIteration:
+            return
+        yield response
+
+
+class ThinkFilter:
+    """过滤流式输出中的<think></think>推理内容，处理标签跨多个chunk的情况"""
+
+    def __init__(self):
+        self.is_active = True
+        self.buffer = ""
+
+    def feed(self, content):
+        """输入一个chunk的文本，返回可以输出的文本，没有时返回空字符串"""
+        if not content:
+            return ""
+        # 将内容添加到缓冲区
+        self.buffer += content
+
+        # 处理缓冲区中的标签
+        while "<think>" in self.buffer and "</think>" in self.buffer:
+            # 找到完整的<think></think>标签并移除
+            pre = self.buffer.split("<think>", 1)[0]
+            post = self.buffer.split("</think>", 1)[1]
+            self.buffer = pre + post
+
+        # 处理只有开始标签的情况
+        if "<think>" in self.buffer:
+            self.is_active = False
+            self.buffer = self.buffer.split("<think>", 1)[0]
+
+        # 处理只有结束标签的情况
+        if "</think>" in self.buffer:
+            self.is_active = True
+            self.buffer = self.buffer.split("</think>", 1)[1]
+
+        # 如果当前处于活动状态且缓冲区有内容，则输出
+        if self.is_active and self.buffer:
+            content, self.buffer = self.buffer, ""
+            return content
+        return ""
+
+
 class LLMProviderBase(ABC):
+    # 每轮变化的上下文和记忆段落在请求中的位置，见core.utils.dialogue：
+    # user放在最新的用户消息开头；none不发送，用于只转发最后一条用户消息的智能体平台
+    volatile_context = "user"
+
     @abstractmethod
     def response(self, session_id, dialogue):
         """LLM response generator"""
@@ -25,7 +121,7 @@ class LLMProviderBase(ABC):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             return "【LLM服务响应异常】"
-    
+
     def response_with_functions(self, session_id, dialogue, functions=None):
         """
         Default implementation for function calling (streaming)
@@ -37,3 +133,34 @@ class LLMProviderBase(ABC):
         for token in self.response(session_id, dialogue):
             yield token, None
 
+    async def response_async(self, session_id, dialogue, **kwargs):
+        """
+        异步流式响应，产出的内容与response相同
+        默认在线程池中迭代同步实现，支持异步客户端的供应器应覆盖此方法，等待期间不占用线程
+        """
+        async for token in iterate_in_executor(
+            self.response(session_id, dialogue, **kwargs)
+        ):
+            yield token
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        """异步流式响应（支持function call），产出的内容与response_with_functions相同"""
+        async for item in iterate_in_executor(
+            self.response_with_functions(session_id, dialogue, functions=functions)
+        ):
+            yield item
+
+    def get_async_client(self, factory):
+        """获取当前事件循环的异步客户端，不存在时用factory创建
+
+        异步HTTP连接池绑定创建它的事件循环，同一个供应器实例在多进程的各个工作进程、
+        或记忆总结使用的临时事件循环中需要各自的客户端
+        """
+        loop = asyncio.get_running_loop()
+        clients = self.__dict__.get("_async_clients")
+        if clients is None:
+            clients = self.__dict__["_async_clients"] = weakref.WeakKeyDictionary()
+        client = clients.get(loop)
+        if client is None:
+            client = clients[loop] = factory()
+        return client
@@ -18,6 +18,9 @@ logger = setup_logging()
 
 
 class LLMProvider(LLMProviderBase):
+    # 只转发最后一条用户消息作为查询，不附带上下文和记忆段落
+    volatile_context = "none"
+
     def __init__(self, config):
         self.personal_access_token = config.get("personal_access_token")
         self.bot_id = str(config.get("bot_id"))
@@ -62,9 +65,14 @@ class LLMProvider(LLMProviderBase):
             modify_msg = get_system_prompt_for_function(function_str) + last_msg
             dialogue[-1]["content"] = modify_msg
 
-        # 如果最后一个是 role="tool"，附加到user上
-        if len(dialogue) > 1 and dialogue[-1]["role"] == "tool":
-            assistant_msg = "\ntool call result: " + dialogue[-1]["content"] + "\n\n"
+        # 如果最后是 role="tool"，把同一轮的所有函数结果附加到user上
+        results = []
+        while len(dialogue) > 1 and dialogue[-1]["role"] == "tool":
+            results.insert(0, dialogue.pop()["content"])
+        if results:
+            assistant_msg = "".join(
+                f"\ntool call result: {result}\n\n" for result in results
+            )
             while len(dialogue) > 1:
                 if dialogue[-1]["role"] == "user":
                     dialogue[-1]["content"] = assistant_msg + dialogue[-1]["content"]
@@ -0,0 +1,461 @@
+import re
+import time
+import asyncio
+import threading
+from collections import deque
+from config.logger import setup_logging
+from core.providers.llm.base import LLMProviderBase
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RECOVERY_SECONDS = 30
+DEFAULT_FIRST_TOKEN_TIMEOUT_MS = 10000
+DEFAULT_TTFT_WINDOW = 50
+# hedge_after_ms为auto时，主后端至少有这么多首token耗时样本才启用对冲
+AUTO_HEDGE_MIN_SAMPLES = 10
+
+# 供应器出错时不抛异常，而是输出形如【OpenAI服务响应异常: ...】的文本
+ERROR_PATTERN = re.compile(r"^【.*(异常|错误|失败).*】$", re.S)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _is_error_text(content):
+    return isinstance(content, str) and bool(ERROR_PATTERN.match(content.strip()))
+
+
+def _text_status(item):
+    """response输出的一项：返回(是否有内容, 是否为错误)"""
+    if not item:
+        return False, False
+    return True, _is_error_text(item)
+
+
+def _function_status(item):
+    """response_with_functions输出的一项(content, tool_calls)"""
+    content, tool_calls = item
+    if tool_calls:
+        return True, False
+    if not content:
+        return False, False
+    return True, _is_error_text(content)
+
+
+class _Backend:
+    """一个后端LLM及其熔断状态、首token耗时窗口
+
+    同一个failover实例由进程内的各连接共享，状态在线程间共用，用锁保护
+    """
+
+    def __init__(self, name, provider, failure_threshold, recovery_seconds, window):
+        self.name = name
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.ttft = deque(maxlen=window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        # 半开状态下只放行一个试探请求
+        self.probing = False
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "served": 0, "failures": 0, "circuit_opened": 0}
+
+    def allow_request(self):
+        """熔断打开时拒绝请求，超过恢复时间后转为半开，放行一个试探请求"""
+        with self.lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self.probing = False
+                logger.bind(tag=TAG).info(f"LLM后端 {self.name} 熔断半开，尝试恢复")
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    return False
+                self.probing = True
+            self.stats["requests"] += 1
+            return True
+
+    def force_request(self):
+        """所有后端都已熔断时仍然请求，不改变熔断状态"""
+        with self.lock:
+            self.stats["requests"] += 1
+
+    def record_success(self, ttft_ms):
+        with self.lock:
+            self.ttft.append(ttft_ms)
+            self.stats["served"] += 1
+            self.consecutive_failures = 0
+            self.probing = False
+            if self.state != CLOSED:
+                self.state = CLOSED
+                logger.bind(tag=TAG).info(f"LLM后端 {self.name} 已恢复，熔断关闭")
+
+    def record_failure(self, reason):
+        with self.lock:
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.stats["circuit_opened"] += 1
+                logger.bind(tag=TAG).warning(
+                    f"LLM后端 {self.name} 连续失败{self.consecutive_failures}次，"
+                    f"熔断{self.recovery_seconds}秒，最近一次: {reason}"
+                )
+            else:
+                logger.bind(tag=TAG).warning(f"LLM后端 {self.name} 请求失败: {reason}")
+
+    def release_probe(self):
+        """试探请求被取消（对冲落败、打断）时，不计成败，允许下一个请求继续试探"""
+        with self.lock:
+            self.probing = False
+
+    def percentile(self, p):
+        with self.lock:
+            samples = sorted(self.ttft)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+    def get_stats(self):
+        p50 = self.percentile(0.5)
+        p90 = self.percentile(0.9)
+        with self.lock:
+            return {
+                **self.stats,
+                "state": self.state,
+                "ttft_p50_ms": round(p50) if p50 is not None else None,
+                "ttft_p90_ms": round(p90) if p90 is not None else None,
+            }
+
+
+class _Attempt:
+    """对一个后端的一次请求，task读取到第一个有内容的输出为止"""
+
+    def __init__(self, backend, stream, status, hedge_after_ms):
+        self.backend = backend
+        self.stream = stream
+        self.started_at = time.monotonic()
+        self.hedge_at = (
+            self.started_at + hedge_after_ms / 1000 if hedge_after_ms else None
+        )
+        self.hedged = False
+        # 由对冲发起的请求
+        self.is_hedge = False
+        self.task = asyncio.ensure_future(self._read_first(status))
+
+    async def _read_first(self, status):
+        """返回(已读取的输出, 首个有内容的输出是否可用)，流结束仍无内容时视为失败"""
+        items = []
+        async for item in self.stream:
+            items.append(item)
+            meaningful, error = status(item)
+            if meaningful:
+                return items, not error
+        return items, False
+
+    @property
+    def elapsed_ms(self):
+        return (time.monotonic() - self.started_at) * 1000
+
+    async def close(self):
+        if not self.task.done():
+            self.task.cancel()
+        # 等task处理完取消再关闭生成器，生成器中的async with随之关闭上游请求
+        await asyncio.wait({self.task})
+        try:
+            await self.stream.aclose()
+        except Exception:
+            pass
+
+
+class LLMProvider(LLMProviderBase):
+    """按顺序组合多个LLM后端的故障转移供应器
+
+    - 每个后端记录最近的首token耗时，连续失败达到阈值后熔断，恢复时间后放行一个试探请求
+    - 首个输出为错误文本、流为空或抛出异常时视为失败，依次尝试下一个后端
+    - 首token超过first_token_timeout_ms时放弃该后端；超过hedge_after_ms时同时请求下一个后端，
+      先输出有效内容的一方胜出，另一方的请求被取消
+    一旦开始输出就不再切换后端。backends中的配置名由llm.resolve_config解析为backend_configs
+    """
+
+    def __init__(self, config):
+        backend_configs = config.get("backend_configs") or {}
+        if not backend_configs:
+            raise ValueError("failover类型的LLM需要在backends中配置至少一个LLM")
+        failure_threshold = int(
+            config.get("failure_threshold", DEFAULT_FAILURE_THRESHOLD)
+        )
+        recovery_seconds = float(
+            config.get("recovery_seconds", DEFAULT_RECOVERY_SECONDS)
+        )
+        window = int(config.get("ttft_window", DEFAULT_TTFT_WINDOW))
+        self.first_token_timeout_ms = float(
+            config.get("first_token_timeout_ms", DEFAULT_FIRST_TOKEN_TIMEOUT_MS) or 0
+        )
+        hedge_after_ms = config.get("hedge_after_ms", 0) or 0
+        self.hedge_auto = hedge_after_ms == "auto"
+        self.hedge_after_ms = 0 if self.hedge_auto else float(hedge_after_ms)
+
+        self.backends = []
+        for name, backend_config in backend_configs.items():
+            backend_type = backend_config.get("type", name)
+            self.backends.append(
+                _Backend(
+                    name,
+                    self._create_backend(backend_type, backend_config),
+                    failure_threshold,
+                    recovery_seconds,
+                    window,
+                )
+            )
+        self.model_name = f"failover[{', '.join(b.name for b in self.backends)}]"
+        # 同一份消息可能发给任一后端，有后端不接受上下文段落时都不发送
+        if any(b.provider.volatile_context == "none" for b in self.backends):
+            self.volatile_context = "none"
+        self.stats = {"failovers": 0, "hedges": 0, "hedge_wins": 0, "exhausted": 0}
+        self._stats_lock = threading.Lock()
+        logger.bind(tag=TAG).info(
+            f"LLM故障转移: {self.model_name}，首token超时{self.first_token_timeout_ms:.0f}ms，"
+            f"对冲: {'auto' if self.hedge_auto else f'{self.hedge_after_ms:.0f}ms'}"
+        )
+
+    def _create_backend(self, backend_type, backend_config):
+        # 避免循环导入
+        from core.utils.llm import create_instance
+
+        return create_instance(backend_type, backend_config)
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _hedge_after_ms(self, backend):
+        if not self.hedge_auto:
+            return self.hedge_after_ms
+        # auto：超过该后端首token耗时p90时对冲，样本不足时不对冲
+        if len(backend.ttft) < AUTO_HEDGE_MIN_SAMPLES:
+            return 0
+        return backend.percentile(0.9)
+
+    def _next_backend(self, start):
+        """从start开始找下一个熔断未打开的后端，返回其下标，没有时返回-1"""
+        for index in range(start, len(self.backends)):
+            if self.backends[index].allow_request():
+                return index
+        return -1
+
+    def response(self, session_id, dialogue, **kwargs):
+        yield from self._failover_sync(
+            lambda provider: provider.response(session_id, dialogue, **kwargs),
+            _text_status,
+        )
+
+    def response_with_functions(self, session_id, dialogue, functions=None):
+        yield from self._failover_sync(
+            lambda provider: provider.response_with_functions(
+                session_id, dialogue, functions=functions
+            ),
+            _function_status,
+        )
+
+    async def response_async(self, session_id, dialogue, **kwargs):
+        async for item in self._failover_async(
+            lambda provider: provider.response_async(session_id, dialogue, **kwargs),
+            _text_status,
+        ):
+            yield item
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        async for item in self._failover_async(
+            lambda provider: provider.response_with_functions_async(
+                session_id, dialogue, functions=functions
+            ),
+            _function_status,
+        ):
+            yield item
+
+    def _failover_sync(self, open_stream, status):
+        """同步调用（记忆总结、意图识别等）：依次尝试各后端，不做超时和对冲"""
+        index = self._next_backend(0)
+        if index < 0:
+            index = 0
+            self.backends[0].force_request()
+        last_error = None
+        while index >= 0:
+            backend = self.backends[index]
+            started_at = time.monotonic()
+            stream = open_stream(backend.provider)
+            items = []
+            usable = False
+            try:
+                for item in stream:
+                    items.append(item)
+                    meaningful, error = status(item)
+                    if meaningful:
+                        usable = not error
+                        break
+            except Exception as e:
+                stream.close()
+                backend.record_failure(e)
+            else:
+                if usable:
+                    backend.record_success((time.monotonic() - started_at) * 1000)
+                    try:
+                        yield from items
+                        yield from stream
+                    finally:
+                        stream.close()
+                    return
+                stream.close()
+                last_error = items[-1] if items else last_error
+                backend.record_failure(items[-1] if items else "无输出")
+            index = self._next_backend(index + 1)
+            if index >= 0:
+                self._count("failovers")
+        self._count("exhausted")
+        if last_error is not None:
+            yield last_error
+
+    async def _failover_async(self, open_stream, status):
+        running = []
+        last_error = None
+        winner = None
+        next_index = 0
+
+        def start_next():
+            nonlocal next_index
+            index = self._next_backend(next_index)
+            if index < 0:
+                if next_index > 0:
+                    return None
+                # 所有后端都已熔断时仍请求第一个，而不是直接失败
+                index = 0
+                self.backends[0].force_request()
+            next_index = index + 1
+            backend = self.backends[index]
+            attempt = _Attempt(
+                backend,
+                open_stream(backend.provider),
+                status,
+                self._hedge_after_ms(backend),
+            )
+            running.append(attempt)
+            return attempt
+
+        start_next()
+        try:
+            while running and winner is None:
+                now = time.monotonic()
+                deadlines = []
+                for attempt in running:
+                    if self.first_token_timeout_ms:
+                        deadlines.append(
+                            attempt.started_at + self.first_token_timeout_ms / 1000
+                        )
+                    if attempt.hedge_at and not attempt.hedged:
+                        deadlines.append(attempt.hedge_at)
+                timeout = max(0, min(deadlines) - now) if deadlines else None
+                await asyncio.wait(
+                    {attempt.task for attempt in running},
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                failed = False
+                for attempt in list(running):
+                    if not attempt.task.done():
+                        continue
+                    running.remove(attempt)
+                    try:
+                        items, usable = attempt.task.result()
+                    except Exception as e:
+                        items, usable = [], False
+                        attempt.backend.record_failure(e)
+                    else:
+                        if not usable:
+                            last_error = items[-1] if items else last_error
+                            attempt.backend.record_failure(
+                                items[-1] if items else "无输出"
+                            )
+                        elif winner is not None:
+                            # 同时完成的对冲请求，只保留先胜出的一方
+                            attempt.backend.release_probe()
+                    if usable and winner is None:
+                        winner = attempt
+                        winner_items = items
+                        continue
+                    await attempt.close()
+                    failed = failed or not usable
+                if winner is not None:
+                    break
+
+                now = time.monotonic()
+                for attempt in list(running):
+                    if (
+                        self.first_token_timeout_ms
+                        and attempt.elapsed_ms >= self.first_token_timeout_ms
+                    ):
+                        running.remove(attempt)
+                        await attempt.close()
+                        attempt.backend.record_failure(
+                            f"首token超过{self.first_token_timeout_ms:.0f}ms"
+                        )
+                        failed = True
+                    elif attempt.hedge_at and not attempt.hedged and now >= attempt.hedge_at:
+                        attempt.hedged = True
+                        hedge = start_next()
+                        if hedge is not None:
+                            hedge.is_hedge = True
+                            self._count("hedges")
+                            logger.bind(tag=TAG).info(
+                                f"LLM后端 {attempt.backend.name} "
+                                f"{attempt.elapsed_ms:.0f}ms未输出首token，"
+                                f"同时请求 {running[-1].backend.name}"
+                            )
+                if failed and not running and start_next() is not None:
+                    self._count("failovers")
+
+            if winner is None:
+                self._count("exhausted")
+                if last_error is not None:
+                    yield last_error
+                return
+
+            winner.backend.record_success(winner.elapsed_ms)
+            if winner.is_hedge:
+                self._count("hedge_wins")
+            for attempt in running:
+                await attempt.close()
+                if attempt.started_at < winner.started_at:
+                    # 先发起却被对冲请求赶超，计为失败，持续无响应的后端也能熔断
+                    attempt.backend.record_failure("首token慢于对冲请求")
+                else:
+                    # 落败的对冲请求直接取消，不计为失败
+                    attempt.backend.release_probe()
+            running = [winner]
+            for item in winner_items:
+                yield item
+            async for item in winner.stream:
+                yield item
+        finally:
+            for attempt in running:
+                await attempt.close()
+                if attempt is not winner:
+                    attempt.backend.release_probe()
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["backends"] = {b.name: b.get_stats() for b in self.backends}
+        return stats
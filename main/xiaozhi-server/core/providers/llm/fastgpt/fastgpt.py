@@ -1,5 +1,6 @@
 import json
 from config.logger import setup_logging
+import httpx
 import requests
 from core.providers.llm.base import LLMProviderBase
 from core.utils.util import check_model_key
@@ -9,6 +10,9 @@ logger = setup_logging()
 
 
 class LLMProvider(LLMProviderBase):
+    # 只转发最后一条用户消息作为查询，不附带上下文和记忆段落
+    volatile_context = "none"
+
     def __init__(self, config):
         self.api_key = config["api_key"]
         self.base_url = config.get("base_url")
@@ -18,50 +22,87 @@ class LLMProvider(LLMProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    def response(self, session_id, dialogue, **kwargs):
+    def _create_async_client(self):
+        return httpx.AsyncClient(timeout=httpx.Timeout(None, connect=10))
+
+    def _build_request(self, session_id, dialogue):
+        # 取最后一条用户消息
+        last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
+        return {
+            "stream": True,
+            "chatId": session_id,
+            "detail": self.detail,
+            "variables": self.variables,
+            "messages": [{"role": "user", "content": last_msg["content"]}],
+        }
+
+    @staticmethod
+    def _parse_line(line):
+        """解析一行SSE数据，返回(是否结束, 需要输出的文本)"""
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data: "):
+            return False, None
+        if line[6:] == "[DONE]":
+            return True, None
         try:
-            # 取最后一条用户消息
-            last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
+            data = json.loads(line[6:])
+        except json.JSONDecodeError:
+            return False, None
+        if "choices" in data and len(data["choices"]) > 0:
+            delta = data["choices"][0].get("delta", {})
+            if delta and "content" in delta and delta["content"] is not None:
+                content = delta["content"]
+                if "<think>" in content or "</think>" in content:
+                    return False, None
+                return False, content
+        return False, None
 
+    def response(self, session_id, dialogue, **kwargs):
+        try:
             # 发起流式请求
             with requests.post(
                 f"{self.base_url}/chat/completions",
                 headers={"Authorization": f"Bearer {self.api_key}"},
-                json={
-                    "stream": True,
-                    "chatId": session_id,
-                    "detail": self.detail,
-                    "variables": self.variables,
-                    "messages": [{"role": "user", "content": last_msg["content"]}],
-                },
+                json=self._build_request(session_id, dialogue),
                 stream=True,
             ) as r:
                 for line in r.iter_lines():
-                    if line:
-                        try:
-                            if line.startswith(b"data: "):
-                                if line[6:].decode("utf-8") == "[DONE]":
-                                    break
+                    if not line:
+                        continue
+                    try:
+                        finished, content = self._parse_line(line)
+                    except Exception:
+                        continue
+                    if finished:
+                        break
+                    if content:
+                        yield content
 
-                                data = json.loads(line[6:])
-                                if "choices" in data and len(data["choices"]) > 0:
-                                    delta = data["choices"][0].get("delta", {})
-                                    if (
-                                        delta
-                                        and "content" in delta
-                                        and delta["content"] is not None
-                                    ):
-                                        content = delta["content"]
-                                        if "<think>" in content:
-                                            continue
-                                        if "</think>" in content:
-                                            continue
-                                        yield content
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            yield "【服务响应异常】"
 
-                        except json.JSONDecodeError as e:
-                            continue
-                        except Exception as e:
-                            continue
+    async def response_async(self, session_id, dialogue, **kwargs):
+        try:
+            client = self.get_async_client(self._create_async_client)
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=self._build_request(session_id, dialogue),
+            ) as r:
+                async for line in r.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        finished, content = self._parse_line(line)
+                    except Exception:
+                        continue
+                    if finished:
+                        break
+                    if content:
+                        yield content
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
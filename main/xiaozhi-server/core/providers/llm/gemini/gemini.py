@@ -125,48 +125,100 @@ class LLMProvider(LLMProviderBase):
     def response_with_functions(self, session_id, dialogue, functions=None):
         yield from self._generate(dialogue, self._build_tools(functions))
 
-    def _generate(self, dialogue, tools):
+    async def response_async(self, session_id, dialogue, **kwargs):
+        async for item in self._generate_async(dialogue, None):
+            yield item
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        async for item in self._generate_async(dialogue, self._build_tools(functions)):
+            yield item
+
+    @staticmethod
+    def _build_contents(dialogue):
         role_map = {"assistant": "model", "user": "user"}
         contents: list = []
+        # 函数调用id到函数名，函数结果需要带上对应的函数名
+        call_names: Dict[str, str] = {}
+        # 正在合并的函数结果消息
+        tool_results = None
         # 拼接对话
         for m in dialogue:
             r = m["role"]
 
             if r == "assistant" and "tool_calls" in m:
-                tc = m["tool_calls"][0]
-                contents.append(
-                    {
-                        "role": "model",
-                        "parts": [
-                            {
-                                "function_call": {
-                                    "name": tc["function"]["name"],
-                                    "args": json.loads(tc["function"]["arguments"]),
-                                }
+                # 同一轮的多个函数调用放在一条model消息中，每个调用一个part
+                parts = []
+                for tc in m["tool_calls"]:
+                    call_names[tc.get("id")] = tc["function"]["name"]
+                    parts.append(
+                        {
+                            "function_call": {
+                                "name": tc["function"]["name"],
+                                "args": json.loads(
+                                    tc["function"]["arguments"] or "{}"
+                                ),
                             }
-                        ],
-                    }
-                )
+                        }
+                    )
+                contents.append({"role": "model", "parts": parts})
+                tool_results = None
                 continue
 
             if r == "tool":
-                contents.append(
-                    {
-                        "role": "model",
-                        "parts": [{"text": str(m.get("content", ""))}],
+                # 连续的函数结果合并为一条消息，与函数调用一一对应
+                part = {
+                    "function_response": {
+                        "name": call_names.get(m.get("tool_call_id"), ""),
+                        "response": {"result": str(m.get("content", ""))},
                     }
-                )
+                }
+                if tool_results is None:
+                    tool_results = {"role": "user", "parts": []}
+                    contents.append(tool_results)
+                tool_results["parts"].append(part)
                 continue
 
+            tool_results = None
+
             contents.append(
                 {
                     "role": role_map.get(r, "user"),
                     "parts": [{"text": str(m.get("content", ""))}],
                 }
             )
+        return contents
+
+    @staticmethod
+    def _parse_chunk(chunk, tools):
+        """解析一个chunk，返回(输出列表, 是否为函数调用)，函数调用后流结束"""
+        items = []
+        cand = chunk.candidates[0]
+        calls = []
+        for part in cand.content.parts:
+            # a) 函数调用-通常在最后，一次可能返回多个
+            if getattr(part, "function_call", None):
+                fc = part.function_call
+                calls.append(
+                    SimpleNamespace(
+                        id=uuid.uuid4().hex,
+                        type="function",
+                        function=SimpleNamespace(
+                            name=fc.name,
+                            arguments=json.dumps(dict(fc.args), ensure_ascii=False),
+                        ),
+                    )
+                )
+                continue
+            # b) 普通文本
+            if getattr(part, "text", None):
+                items.append(part.text if tools is None else (part.text, None))
+        if calls:
+            items.append((None, calls))
+        return items, bool(calls)
 
+    def _generate(self, dialogue, tools):
         stream: GenerateContentResponse = self.model.generate_content(
-            contents=contents,
+            contents=self._build_contents(dialogue),
             generation_config=self.gen_cfg,
             tools=tools,
             stream=True,
@@ -175,32 +227,35 @@ class LLMProvider(LLMProviderBase):
 
         try:
             for chunk in stream:
-                cand = chunk.candidates[0]
-                for part in cand.content.parts:
-                    # a) 函数调用-通常是最后一段话才是函数调用
-                    if getattr(part, "function_call", None):
-                        fc = part.function_call
-                        yield None, [
-                            SimpleNamespace(
-                                id=uuid.uuid4().hex,
-                                type="function",
-                                function=SimpleNamespace(
-                                    name=fc.name,
-                                    arguments=json.dumps(
-                                        dict(fc.args), ensure_ascii=False
-                                    ),
-                                ),
-                            )
-                        ]
-                        return
-                    # b) 普通文本
-                    if getattr(part, "text", None):
-                        yield part.text if tools is None else (part.text, None)
+                items, is_function_call = self._parse_chunk(chunk, tools)
+                yield from items
+                if is_function_call:
+                    return
 
         finally:
             if tools is not None:
                 yield None, None  # function‑mode 结束，返回哑包
 
+    async def _generate_async(self, dialogue, tools):
+        stream = await self.model.generate_content_async(
+            contents=self._build_contents(dialogue),
+            generation_config=self.gen_cfg,
+            tools=tools,
+            stream=True,
+            timeout=self.timeout,
+        )
+
+        async for chunk in stream:
+            items, is_function_call = self._parse_chunk(chunk, tools)
+            for item in items:
+                yield item
+            if is_function_call:
+                break
+
+        # 不在finally中产出：被打断时aclose()要求生成器直接结束
+        if tools is not None:
+            yield None, None  # function‑mode 结束，返回哑包
+
     # 关闭stream，预留后续打断对话功能的功能方法，官方文档推荐打断对话要关闭上一个流，可以有效减少配额计费和资源占用
     @staticmethod
     def _safe_finish_stream(stream: GenerateContentResponse):
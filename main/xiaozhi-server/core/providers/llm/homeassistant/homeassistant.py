@@ -8,6 +8,9 @@ logger = setup_logging()
 
 
 class LLMProvider(LLMProviderBase):
+    # 只转发最后一条用户消息作为查询，不附带上下文和记忆段落
+    volatile_context = "none"
+
     def __init__(self, config):
         self.agent_id = config.get("agent_id")  # 对应 agent_id
         self.api_key = config.get("api_key")
@@ -1,7 +1,7 @@
 from config.logger import setup_logging
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import json
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, ThinkFilter
 
 TAG = __name__
 logger = setup_logging()
@@ -24,68 +24,63 @@ class LLMProvider(LLMProviderBase):
         # 检查是否是qwen3模型
         self.is_qwen3 = self.model_name and self.model_name.lower().startswith("qwen3")
 
+    def _create_async_client(self):
+        return AsyncOpenAI(base_url=self.base_url, api_key="ollama")
+
+    def _prepare_dialogue(self, dialogue):
+        # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
+        if not self.is_qwen3:
+            return dialogue
+        # 复制对话列表，避免修改原始对话
+        dialogue_copy = dialogue.copy()
+
+        # 找到最后一条用户消息
+        for i in range(len(dialogue_copy) - 1, -1, -1):
+            if dialogue_copy[i]["role"] == "user":
+                # 在用户消息前添加/no_think指令
+                dialogue_copy[i]["content"] = "/no_think " + dialogue_copy[i]["content"]
+                logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
+                break
+
+        # 使用修改后的对话
+        return dialogue_copy
+
+    @staticmethod
+    def _delta(chunk):
+        return chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+
+    def _function_chunk(self, chunk, think_filter):
+        """解析function call流式响应的chunk，返回(content, tool_calls)，无内容时返回None"""
+        delta = self._delta(chunk)
+        content = delta.content if hasattr(delta, "content") else None
+        tool_calls = delta.tool_calls if hasattr(delta, "tool_calls") else None
+
+        # 如果是工具调用，直接传递
+        if tool_calls:
+            return None, tool_calls
+        # 处理文本内容
+        content = think_filter.feed(content)
+        if content:
+            return content, None
+        return None
+
     def response(self, session_id, dialogue, **kwargs):
         try:
-            # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
-            if self.is_qwen3:
-                # 复制对话列表，避免修改原始对话
-                dialogue_copy = dialogue.copy()
-
-                # 找到最后一条用户消息
-                for i in range(len(dialogue_copy) - 1, -1, -1):
-                    if dialogue_copy[i]["role"] == "user":
-                        # 在用户消息前添加/no_think指令
-                        dialogue_copy[i]["content"] = (
-                            "/no_think " + dialogue_copy[i]["content"]
-                        )
-                        logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
-                        break
-
-                # 使用修改后的对话
-                dialogue = dialogue_copy
-
             responses = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
             )
-            is_active = True
             # 用于处理跨chunk的标签
-            buffer = ""
+            think_filter = ThinkFilter()
 
             for chunk in responses:
                 try:
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
+                    delta = self._delta(chunk)
                     content = delta.content if hasattr(delta, "content") else ""
-
+                    content = think_filter.feed(content)
                     if content:
-                        # 将内容添加到缓冲区
-                        buffer += content
-
-                        # 处理缓冲区中的标签
-                        while "<think>" in buffer and "</think>" in buffer:
-                            # 找到完整的<think></think>标签并移除
-                            pre = buffer.split("<think>", 1)[0]
-                            post = buffer.split("</think>", 1)[1]
-                            buffer = pre + post
-
-                        # 处理只有开始标签的情况
-                        if "<think>" in buffer:
-                            is_active = False
-                            buffer = buffer.split("<think>", 1)[0]
-
-                        # 处理只有结束标签的情况
-                        if "</think>" in buffer:
-                            is_active = True
-                            buffer = buffer.split("</think>", 1)[1]
-
-                        # 如果当前处于活动状态且缓冲区有内容，则输出
-                        if is_active and buffer:
-                            yield buffer
-                            buffer = ""  # 清空缓冲区
-
+                        yield content
                 except Exception as e:
                     logger.bind(tag=TAG).error(f"Error processing chunk: {e}")
 
@@ -93,79 +88,47 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             yield "【Ollama服务响应异常】"
 
-    def response_with_functions(self, session_id, dialogue, functions=None):
+    async def response_async(self, session_id, dialogue, **kwargs):
         try:
-            # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
-            if self.is_qwen3:
-                # 复制对话列表，避免修改原始对话
-                dialogue_copy = dialogue.copy()
-
-                # 找到最后一条用户消息
-                for i in range(len(dialogue_copy) - 1, -1, -1):
-                    if dialogue_copy[i]["role"] == "user":
-                        # 在用户消息前添加/no_think指令
-                        dialogue_copy[i]["content"] = (
-                            "/no_think " + dialogue_copy[i]["content"]
-                        )
-                        logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
-                        break
+            client = self.get_async_client(self._create_async_client)
+            responses = await client.chat.completions.create(
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
+            )
+            # 用于处理跨chunk的标签
+            think_filter = ThinkFilter()
+
+            async with responses:
+                async for chunk in responses:
+                    try:
+                        delta = self._delta(chunk)
+                        content = delta.content if hasattr(delta, "content") else ""
+                        content = think_filter.feed(content)
+                        if content:
+                            yield content
+                    except Exception as e:
+                        logger.bind(tag=TAG).error(f"Error processing chunk: {e}")
 
-                # 使用修改后的对话
-                dialogue = dialogue_copy
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
+            yield "【Ollama服务响应异常】"
 
+    def response_with_functions(self, session_id, dialogue, functions=None):
+        try:
             stream = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=dialogue,
+                messages=self._prepare_dialogue(dialogue),
                 stream=True,
                 tools=functions,
             )
-
-            is_active = True
-            buffer = ""
+            think_filter = ThinkFilter()
 
             for chunk in stream:
                 try:
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
-                    content = delta.content if hasattr(delta, "content") else None
-                    tool_calls = (
-                        delta.tool_calls if hasattr(delta, "tool_calls") else None
-                    )
-
-                    # 如果是工具调用，直接传递
-                    if tool_calls:
-                        yield None, tool_calls
-                        continue
-
-                    # 处理文本内容
-                    if content:
-                        # 将内容添加到缓冲区
-                        buffer += content
-
-                        # 处理缓冲区中的标签
-                        while "<think>" in buffer and "</think>" in buffer:
-                            # 找到完整的<think></think>标签并移除
-                            pre = buffer.split("<think>", 1)[0]
-                            post = buffer.split("</think>", 1)[1]
-                            buffer = pre + post
-
-                        # 处理只有开始标签的情况
-                        if "<think>" in buffer:
-                            is_active = False
-                            buffer = buffer.split("<think>", 1)[0]
-
-                        # 处理只有结束标签的情况
-                        if "</think>" in buffer:
-                            is_active = True
-                            buffer = buffer.split("</think>", 1)[1]
-
-                        # 如果当前处于活动状态且缓冲区有内容，则输出
-                        if is_active and buffer:
-                            yield buffer, None
-                            buffer = ""  # 清空缓冲区
+                    item = self._function_chunk(chunk, think_filter)
+                    if item is not None:
+                        yield item
                 except Exception as e:
                     logger.bind(tag=TAG).error(f"Error processing function chunk: {e}")
                     continue
@@ -173,3 +136,30 @@ class LLMProvider(LLMProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
             yield f"【Ollama服务响应异常: {str(e)}】", None
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        try:
+            client = self.get_async_client(self._create_async_client)
+            stream = await client.chat.completions.create(
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
+                tools=functions,
+            )
+            think_filter = ThinkFilter()
+
+            async with stream:
+                async for chunk in stream:
+                    try:
+                        item = self._function_chunk(chunk, think_filter)
+                        if item is not None:
+                            yield item
+                    except Exception as e:
+                        logger.bind(tag=TAG).error(
+                            f"Error processing function chunk: {e}"
+                        )
+                        continue
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
+            yield f"【Ollama服务响应异常: {str(e)}】", None
@@ -3,7 +3,7 @@ import openai
 from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
-from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.base import LLMProviderBase, ThinkFilter
 
 TAG = __name__
 logger = setup_logging()
@@ -48,41 +48,76 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).error(model_key_msg)
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
 
+    def _create_async_client(self):
+        return openai.AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+        )
+
+    def _request_params(self, dialogue, **kwargs):
+        return dict(
+            model=self.model_name,
+            messages=dialogue,
+            stream=True,
+            max_tokens=kwargs.get("max_tokens", self.max_tokens),
+            temperature=kwargs.get("temperature", self.temperature),
+            top_p=kwargs.get("top_p", self.top_p),
+            frequency_penalty=kwargs.get("frequency_penalty", self.frequency_penalty),
+        )
+
+    @staticmethod
+    def _chunk_content(chunk):
+        try:
+            # 检查是否存在有效的choice且content不为空
+            delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+            return delta.content if hasattr(delta, "content") else ""
+        except IndexError:
+            return ""
+
+    @staticmethod
+    def _function_chunk(chunk):
+        """解析function call流式响应的chunk，返回(content, tool_calls)，无内容时返回None"""
+        # 检查是否存在有效的choice且content不为空
+        if getattr(chunk, "choices", None):
+            return chunk.choices[0].delta.content, chunk.choices[0].delta.tool_calls
+        # 存在 CompletionUsage 消息时，生成 Token 消耗 log
+        if isinstance(getattr(chunk, "usage", None), CompletionUsage):
+            usage_info = getattr(chunk, "usage", None)
+            logger.bind(tag=TAG).info(
+                f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
+                f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+                f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+            )
+        return None
+
     def response(self, session_id, dialogue, **kwargs):
         try:
             responses = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                max_tokens=kwargs.get("max_tokens", self.max_tokens),
-                temperature=kwargs.get("temperature", self.temperature),
-                top_p=kwargs.get("top_p", self.top_p),
-                frequency_penalty=kwargs.get(
-                    "frequency_penalty", self.frequency_penalty
-                ),
+                **self._request_params(dialogue, **kwargs)
             )
 
-            is_active = True
+            think_filter = ThinkFilter()
             for chunk in responses:
-                try:
-                    # 检查是否存在有效的choice且content不为空
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
-                    content = delta.content if hasattr(delta, "content") else ""
-                except IndexError:
-                    content = ""
+                content = think_filter.feed(self._chunk_content(chunk))
                 if content:
-                    # 处理标签跨多个chunk的情况
-                    if "<think>" in content:
-                        is_active = False
-                        content = content.split("<think>")[0]
-                    if "</think>" in content:
-                        is_active = True
-                        content = content.split("</think>")[-1]
-                    if is_active:
+                    yield content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+
+    async def response_async(self, session_id, dialogue, **kwargs):
+        try:
+            client = self.get_async_client(self._create_async_client)
+            responses = await client.chat.completions.create(
+                **self._request_params(dialogue, **kwargs)
+            )
+
+            think_filter = ThinkFilter()
+            async with responses:
+                async for chunk in responses:
+                    content = think_filter.feed(self._chunk_content(chunk))
+                    if content:
                         yield content
 
         except Exception as e:
@@ -95,19 +130,26 @@ class LLMProvider(LLMProviderBase):
             )
 
             for chunk in stream:
-                # 检查是否存在有效的choice且content不为空
-                if getattr(chunk, "choices", None):
-                    yield chunk.choices[0].delta.content, chunk.choices[
-                        0
-                    ].delta.tool_calls
-                # 存在 CompletionUsage 消息时，生成 Token 消耗 log
-                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                item = self._function_chunk(chunk)
+                if item is not None:
+                    yield item
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
+            yield f"【OpenAI服务响应异常: {e}】", None
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        try:
+            client = self.get_async_client(self._create_async_client)
+            stream = await client.chat.completions.create(
+                model=self.model_name, messages=dialogue, stream=True, tools=functions
+            )
+
+            async with stream:
+                async for chunk in stream:
+                    item = self._function_chunk(chunk)
+                    if item is not None:
+                        yield item
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
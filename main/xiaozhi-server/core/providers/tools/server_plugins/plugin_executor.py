@@ -1,5 +1,6 @@
 """服务端插件工具执行器"""
 
+import functools
 from typing import Dict, Any
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import all_function_registry, Action, ActionResponse
@@ -27,17 +28,20 @@ class ServerPluginExecutor(ToolExecutor):
             if hasattr(func_item, "type"):
                 func_type = func_item.type
                 if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
-                    result = func_item.func(conn, **arguments)
+                    call = functools.partial(func_item.func, conn, **arguments)
                 elif func_type.code == 2:  # WAIT
-                    result = func_item.func(**arguments)
+                    call = functools.partial(func_item.func, **arguments)
                 elif func_type.code == 3:  # CHANGE_SYS_PROMPT
-                    result = func_item.func(conn, **arguments)
+                    call = functools.partial(func_item.func, conn, **arguments)
                 else:
-                    result = func_item.func(**arguments)
+                    call = functools.partial(func_item.func, **arguments)
             else:
                 # 默认不传conn参数
-                result = func_item.func(**arguments)
+                call = functools.partial(func_item.func, **arguments)
 
+            # 插件函数是同步实现，多数包含阻塞的HTTP请求，放到线程池执行，
+            # 不阻塞事件循环，同一轮的多个插件调用也能真正并行
+            result = await conn.loop.run_in_executor(conn.executor, call)
             return result
 
         except Exception as e:
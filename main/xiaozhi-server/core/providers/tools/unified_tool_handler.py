@@ -1,6 +1,7 @@
 """统一工具处理器"""
 
 import json
+import asyncio
 from typing import Dict, List, Any, Optional
 from config.logger import setup_logging
 from plugins_func.loadplugins import auto_import_modules
@@ -140,15 +141,17 @@ class UnifiedToolHandler:
     ) -> Optional[ActionResponse]:
         """处理LLM函数调用"""
         try:
-            # 处理多函数调用
+            # 处理多函数调用，各调用互不依赖，并行执行
             if "function_calls" in function_call_data:
-                responses = []
-                for call in function_call_data["function_calls"]:
-                    result = await self.tool_manager.execute_tool(
-                        call["name"], call.get("arguments", {})
+                responses = await asyncio.gather(
+                    *(
+                        self.tool_manager.execute_tool(
+                            call["name"], call.get("arguments", {})
+                        )
+                        for call in function_call_data["function_calls"]
                     )
-                    responses.append(result)
-                return self._combine_responses(responses)
+                )
+                return self._combine_responses(list(responses))
 
             # 处理单函数调用
             function_name = function_call_data["name"]
@@ -218,6 +221,28 @@ class UnifiedToolHandler:
         """获取工具统计信息"""
         return self.tool_manager.get_tool_statistics()
 
+    def rebind(self, conn):
+        """设备重连恢复会话时，把工具处理器转移到新连接
+
+        服务端插件、服务端MCP和MCP接入点沿用已初始化的连接，
+        设备端IoT/MCP工具由设备在新连接上重新上报
+        """
+        old_conn = self.conn
+        self.conn = conn
+        self.config = conn.config
+        self.tool_manager.conn = conn
+        for executor in self.tool_manager.executors.values():
+            executor.conn = conn
+        if self.server_mcp_executor.mcp_manager is not None:
+            self.server_mcp_executor.mcp_manager.conn = conn
+        mcp_endpoint_client = getattr(old_conn, "mcp_endpoint_client", None)
+        if mcp_endpoint_client is not None:
+            mcp_endpoint_client.conn = conn
+            conn.mcp_endpoint_client = mcp_endpoint_client
+            old_conn.mcp_endpoint_client = None
+        self.device_iot_executor.iot_tools.clear()
+        self.tool_manager.refresh_tools()
+
     async def cleanup(self):
         """清理资源"""
         try:
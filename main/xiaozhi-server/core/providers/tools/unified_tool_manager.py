@@ -1,10 +1,14 @@
 """统一工具管理器"""
 
+import asyncio
 from typing import Dict, List, Optional, Any
 from config.logger import setup_logging
 from plugins_func.register import Action, ActionResponse
 from .base import ToolType, ToolDefinition, ToolExecutor
 
+# 单个工具的默认执行超时(秒)
+DEFAULT_TOOL_TIMEOUT = 10
+
 
 class ToolManager:
     """统一工具管理器，管理所有类型的工具"""
@@ -53,8 +57,10 @@ class ToolManager:
 
         descriptions = []
         tools = self.get_all_tools()
-        for tool_definition in tools.values():
-            descriptions.append(tool_definition.description)
+        # 按名称排序：工具注册顺序受MCP等异步初始化的先后影响，
+        # 顺序固定后请求中的工具定义保持一致，便于命中上游的前缀缓存
+        for name in sorted(tools):
+            descriptions.append(tools[name].description)
 
         self._cached_function_descriptions = descriptions
         return descriptions
@@ -70,10 +76,18 @@ class ToolManager:
         tool_def = tools.get(tool_name)
         return tool_def.tool_type if tool_def else None
 
+    def get_tool_timeout(self, tool_name: str) -> float:
+        """工具的执行超时，可在tool_call配置中按工具名单独设置"""
+        tool_call_config = self.conn.config.get("tool_call") or {}
+        timeout = (tool_call_config.get("timeouts") or {}).get(tool_name)
+        if timeout is None:
+            timeout = tool_call_config.get("timeout") or DEFAULT_TOOL_TIMEOUT
+        return float(timeout)
+
     async def execute_tool(
         self, tool_name: str, arguments: Dict[str, Any]
     ) -> ActionResponse:
-        """执行工具调用"""
+        """执行工具调用，超时按执行失败返回"""
         try:
             # 查找工具类型
             tool_type = self.get_tool_type(tool_name)
@@ -93,7 +107,18 @@ class ToolManager:
 
             # 执行工具
             self.logger.info(f"执行工具: {tool_name}，参数: {arguments}")
-            result = await executor.execute(self.conn, tool_name, arguments)
+            timeout = self.get_tool_timeout(tool_name)
+            try:
+                result = await asyncio.wait_for(
+                    executor.execute(self.conn, tool_name, arguments), timeout
+                )
+            except asyncio.TimeoutError:
+                self.logger.warning(f"执行工具 {tool_name} 超时({timeout}秒)")
+                return ActionResponse(
+                    action=Action.ERROR,
+                    result=f"工具 {tool_name} 执行超时，未获取到结果",
+                    response="请求超时了，请稍后再试",
+                )
             self.logger.debug(f"工具执行结果: {result}")
             return result
 
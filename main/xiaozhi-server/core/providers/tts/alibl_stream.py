@@ -1,15 +1,15 @@
 import os
 import uuid
 import json
-import time
-import queue
 import asyncio
+import functools
 import traceback
 import websockets
 from asyncio import Task
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.tts import MarkdownCleaner
+from core.utils.ws_session_pool import get_session_pool
 from core.providers.tts.base import TTSProviderBase
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
@@ -17,6 +17,27 @@ TAG = __name__
 logger = setup_logging()
 
 
+def route_session_message(msg):
+    """从下行消息中解析task_id，供连接池路由；音频帧无法解析时返回None"""
+    if not isinstance(msg, str):
+        return None
+    try:
+        return json.loads(msg).get("header", {}).get("task_id")
+    except json.JSONDecodeError:
+        return None
+
+
+async def connect_upstream(ws_url, header):
+    """建立一条百炼流式TTS上游连接"""
+    return await websockets.connect(
+        ws_url,
+        additional_headers=header,
+        ping_interval=30,
+        ping_timeout=10,
+        close_timeout=10,
+    )
+
+
 class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
@@ -31,7 +52,6 @@ class TTSProvider(TTSProviderBase):
         self.ws_url = "wss://dashscope.aliyuncs.com/api-ws/v1/inference/"
         self.ws = None
         self._monitor_task = None
-        self.last_active_time = None
 
         # 模型和音色配置
         self.model = config.get("model", "cosyvoice-v2")
@@ -65,115 +85,97 @@ class TTSProvider(TTSProviderBase):
             sample_rate=self.sample_rate, channels=1, frame_size_ms=60
         )
 
-    async def _ensure_connection(self):
-        """确保WebSocket连接可用，支持60秒内连接复用"""
-        try:
-            current_time = time.time()
-            if self.ws and current_time - self.last_active_time < 60:
-                # 一分钟内才可以复用链接进行连续对话
-                logger.bind(tag=TAG).info(f"使用已有链接...")
-                return self.ws
-            logger.bind(tag=TAG).info("开始建立新连接...")
-
-            self.ws = await websockets.connect(
-                self.ws_url,
-                additional_headers=self.header,
-                ping_interval=30,
-                ping_timeout=10,
-                close_timeout=10,
-            )
+        # 上游长连接池配置，音频帧不带task_id，因此每条连接同时只承载一个会话
+        self.pool_min_idle = int(config.get("pool_min_idle", 1))
+        self.pool_idle_timeout = float(config.get("pool_idle_timeout", 60))
+
+    def _get_session_pool(self):
+        return get_session_pool(
+            ("alibl_stream", self.ws_url, self.api_key),
+            name="alibl_stream",
+            connect=functools.partial(connect_upstream, self.ws_url, self.header),
+            route=route_session_message,
+            max_sessions_per_connection=1,
+            min_idle=self.pool_min_idle,
+            idle_timeout=self.pool_idle_timeout,
+        )
+
+    async def prewarm(self):
+        await self._get_session_pool().prewarm()
 
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
-            self.last_active_time = current_time
+    async def _ensure_connection(self, session_id):
+        """从连接池获取承载本会话的上游连接"""
+        try:
+            self.ws = await self._get_session_pool().acquire(session_id)
             return self.ws
         except Exception as e:
             logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
             self.ws = None
-            self.last_active_time = None
             raise
 
-    def tts_text_priority_thread(self):
-        """流式TTS文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                logger.bind(tag=TAG).debug(
-                    f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
-                )
+    async def handle_tts_text_message(self, message):
+        """流式TTS文本处理"""
+        logger.bind(tag=TAG).debug(
+            f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+        )
 
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
 
-                if self.conn.client_abort:
-                    try:
-                        logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                        continue
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
-                        continue
+        if self.conn.client_abort:
+            logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理")
+            return
 
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化会话
-                    try:
-                        if not getattr(self.conn, "sentence_id", None): 
-                            self.conn.sentence_id = uuid.uuid4().hex
-                            logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
-
-                        logger.bind(tag=TAG).info("开始启动TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.start_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                        self.before_stop_play_files.clear()
-                        logger.bind(tag=TAG).info("TTS会话启动成功")
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
-                        continue
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化会话
+            try:
+                if not getattr(self.conn, "sentence_id", None): 
+                    self.conn.sentence_id = uuid.uuid4().hex
+                    logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
+
+                logger.bind(tag=TAG).info("开始启动TTS会话...")
+                await self.start_session(self.conn.sentence_id)
+                self.before_stop_play_files.clear()
+                logger.bind(tag=TAG).info("TTS会话启动成功")
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
+                return
 
-                elif ContentType.TEXT == message.content_type:
-                    if message.content_detail:
-                        try:
-                            logger.bind(tag=TAG).debug(
-                                f"开始发送TTS文本: {message.content_detail}"
-                            )
-                            future = asyncio.run_coroutine_threadsafe(
-                                self.text_to_speak(message.content_detail, None),
-                                loop=self.conn.loop,
-                            )
-                            future.result()
-                            logger.bind(tag=TAG).debug("TTS文本发送成功")
-                        except Exception as e:
-                            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-                            continue
-
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
+        elif ContentType.TEXT == message.content_type:
+            if message.content_detail:
+                try:
+                    logger.bind(tag=TAG).debug(
+                        f"开始发送TTS文本: {message.content_detail}"
                     )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+                    await self.text_to_speak(message.content_detail, None)
+                    logger.bind(tag=TAG).debug("TTS文本发送成功")
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
+                    return
 
-                if message.sentence_type == SentenceType.LAST:
-                    try:
-                        logger.bind(tag=TAG).info("开始结束TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.finish_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
-                        continue
+        elif ContentType.FILE == message.content_type:
+            logger.bind(tag=TAG).info(
+                f"添加音频文件到待播放列表: {message.content_file}"
+            )
+            if message.content_file and os.path.exists(message.content_file):
+                # 先处理文件音频数据，解码转码是阻塞操作，放到共享线程池
+                await asyncio.get_running_loop().run_in_executor(
+                    self.conn.executor,
+                    lambda: self._process_audio_file_stream(
+                        message.content_file,
+                        callback=lambda audio_data: self.handle_audio_file(
+                            audio_data, message.content_detail
+                        ),
+                    ),
+                )
 
-            except queue.Empty:
-                continue
+        if message.sentence_type == SentenceType.LAST:
+            try:
+                logger.bind(tag=TAG).info("开始结束TTS会话...")
+                await self.finish_session(self.conn.sentence_id)
             except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
-                )
-                continue
+                logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
+                return
 
     async def text_to_speak(self, text, _):
         """发送文本到TTS服务进行合成"""
@@ -196,7 +198,6 @@ class TTSProvider(TTSProviderBase):
             }
 
             await self.ws.send(json.dumps(continue_task_message))
-            self.last_active_time = time.time()
             logger.bind(tag=TAG).debug(f"已发送文本: {filtered_text}")
 
         except Exception as e:
@@ -222,11 +223,13 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).info("检测到未完成的上个会话，关闭监听任务...")
                 await self.close()
 
-            # 确保连接可用
-            await self._ensure_connection()
+            # 从连接池获取上游连接
+            await self._ensure_connection(session_id)
 
             # 启动监听任务
-            self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
+            self._monitor_task = asyncio.create_task(
+                self._start_monitor_tts_response(self.ws)
+            )
 
             # 发送run-task消息启动会话
             run_task_message = {
@@ -254,7 +257,6 @@ class TTSProvider(TTSProviderBase):
             }
 
             await self.ws.send(json.dumps(run_task_message))
-            self.last_active_time = time.time()
             logger.bind(tag=TAG).info("会话启动请求已发送")
         except Exception as e:
             logger.bind(tag=TAG).error(f"启动会话失败: {str(e)}")
@@ -279,12 +281,12 @@ class TTSProvider(TTSProviderBase):
                 }
 
                 await self.ws.send(json.dumps(finish_task_message))
-                self.last_active_time = time.time()
                 logger.bind(tag=TAG).info("会话结束请求已发送")
                 # 等待监听任务完成
                 if self._monitor_task:
                     try:
-                        await self._monitor_task
+                        # 打断时监听任务会被取消，用wait等待其结束，取消不会传到本协程
+                        await asyncio.wait({self._monitor_task})
                     except Exception as e:
                         logger.bind(tag=TAG).error(
                             f"等待监听任务完成时发生错误: {str(e)}"
@@ -297,6 +299,13 @@ class TTSProvider(TTSProviderBase):
             await self.close()
             raise
 
+    async def cancel_synthesis(self):
+        """打断时立即结束监听任务，不等下一条响应；会话按异常归还，上游连接关闭后停止合成"""
+        await super().cancel_synthesis()
+        if self._monitor_task is not None and not self._monitor_task.done():
+            self._monitor_task.cancel()
+        return 0
+
     async def close(self):
         """清理资源"""
         # 取消监听任务
@@ -317,16 +326,14 @@ class TTSProvider(TTSProviderBase):
             except:
                 pass
             self.ws = None
-            self.last_active_time = None
 
-    async def _start_monitor_tts_response(self):
+    async def _start_monitor_tts_response(self, session):
         """监听TTS响应"""
+        session_finished = False
         try:
-            session_finished = False
             while not self.conn.stop_event.is_set():
                 try:
-                    msg = await self.ws.recv()
-                    self.last_active_time = time.time()
+                    msg = await session.recv()
 
                     # 检查客户端是否中止
                     if self.conn.client_abort:
@@ -378,15 +385,11 @@ class TTSProvider(TTSProviderBase):
                     )
                     break
 
-            # 仅在连接异常且非正常结束时才关闭连接
-            if not session_finished and self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
-        # 监听任务退出时清理引用
+        # 监听任务退出时归还会话，仅在会话异常时才关闭上游连接
         finally:
+            if self.ws is session:
+                self.ws = None
+            await session.release(reusable=session_finished)
             self._monitor_task = None
 
     def to_tts(self, text: str) -> list:
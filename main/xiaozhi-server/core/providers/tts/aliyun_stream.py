@@ -4,8 +4,8 @@ import hmac
 import hashlib
 import base64
 import time
-import queue
 import asyncio
+import functools
 import traceback
 from asyncio import Task
 import websockets
@@ -16,6 +16,7 @@ from core.providers.tts.base import TTSProviderBase
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from core.utils.tts import MarkdownCleaner
 from core.utils import opus_encoder_utils, textUtils
+from core.utils.ws_session_pool import get_session_pool
 from config.logger import setup_logging
 
 TAG = __name__
@@ -84,6 +85,27 @@ class AccessToken:
         return None, None
 
 
+def route_session_message(msg):
+    """从下行消息中解析task_id，供连接池路由；音频帧无法解析时返回None"""
+    if not isinstance(msg, str):
+        return None
+    try:
+        return json.loads(msg).get("header", {}).get("task_id")
+    except json.JSONDecodeError:
+        return None
+
+
+async def connect_upstream(ws_url, token):
+    """建立一条阿里云流式TTS上游连接"""
+    return await websockets.connect(
+        ws_url,
+        additional_headers={"X-NLS-Token": token},
+        ping_interval=30,
+        ping_timeout=10,
+        close_timeout=10,
+    )
+
+
 class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
@@ -128,7 +150,11 @@ class TTSProvider(TTSProviderBase):
             self.ws_url = f"wss://{self.host}/ws/v1"
         self.ws = None
         self._monitor_task = None
-        self.last_active_time = None
+
+        # 上游长连接池配置，音频帧不带task_id，因此每条连接同时只承载一个会话
+        # 服务端会关闭约10秒无交互的连接，空闲连接超过该时间不再复用
+        self.pool_min_idle = int(config.get("pool_min_idle", 0))
+        self.pool_idle_timeout = float(config.get("pool_idle_timeout", 10))
 
         # 专属tts设置
         self.message_id = ""
@@ -176,117 +202,101 @@ class TTSProvider(TTSProviderBase):
             return False
         return time.time() > self.expire_time
 
-    async def _ensure_connection(self):
-        """确保WebSocket连接可用"""
+    def _get_session_pool(self):
+        return get_session_pool(
+            ("aliyun_stream", self.ws_url, self.appkey, self.token),
+            name=f"aliyun_stream@{self.host}",
+            connect=functools.partial(connect_upstream, self.ws_url, self.token),
+            route=route_session_message,
+            max_sessions_per_connection=1,
+            min_idle=self.pool_min_idle,
+            idle_timeout=self.pool_idle_timeout,
+        )
+
+    async def prewarm(self):
+        await self._get_session_pool().prewarm()
+
+    async def _ensure_connection(self, session_id):
+        """从连接池获取承载本会话的上游连接"""
         try:
             if self._is_token_expired():
                 logger.bind(tag=TAG).warning("Token已过期，正在自动刷新...")
                 self._refresh_token()
-            current_time = time.time()
-            if self.ws and current_time - self.last_active_time < 10:
-                # 10秒内才可以复用链接进行连续对话
-                logger.bind(tag=TAG).info(f"使用已有链接...")
-                return self.ws
-            logger.bind(tag=TAG).info("开始建立新连接...")
-
-            self.ws = await websockets.connect(
-                self.ws_url,
-                additional_headers={"X-NLS-Token": self.token},
-                ping_interval=30,
-                ping_timeout=10,
-                close_timeout=10,
-            )
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
-            self.last_active_time = time.time()
+            self.ws = await self._get_session_pool().acquire(session_id)
             return self.ws
         except Exception as e:
             logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
             self.ws = None
-            self.last_active_time = None
             raise
 
-    def tts_text_priority_thread(self):
-        """流式文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                logger.bind(tag=TAG).debug(
-                    f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
-                )
-
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
+    async def handle_tts_text_message(self, message):
+        """流式文本处理"""
+        logger.bind(tag=TAG).debug(
+            f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+        )
 
-                if self.conn.client_abort:
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                    continue
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
 
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    try:
-                        if not getattr(self.conn, "sentence_id", None):
-                            self.conn.sentence_id = uuid.uuid4().hex
-                            logger.bind(tag=TAG).info(
-                                f"自动生成新的 会话ID: {self.conn.sentence_id}"
-                            )
+        if self.conn.client_abort:
+            logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理")
+            return
 
-                        # aliyunStream独有的参数生成
-                        self.message_id = str(uuid.uuid4().hex)
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            try:
+                if not getattr(self.conn, "sentence_id", None):
+                    self.conn.sentence_id = uuid.uuid4().hex
+                    logger.bind(tag=TAG).info(
+                        f"自动生成新的 会话ID: {self.conn.sentence_id}"
+                    )
 
-                        logger.bind(tag=TAG).info("开始启动TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.start_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                        self.before_stop_play_files.clear()
-                        logger.bind(tag=TAG).info("TTS会话启动成功")
+                # aliyunStream独有的参数生成
+                self.message_id = str(uuid.uuid4().hex)
 
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
-                        continue
+                logger.bind(tag=TAG).info("开始启动TTS会话...")
+                await self.start_session(self.conn.sentence_id)
+                self.before_stop_play_files.clear()
+                logger.bind(tag=TAG).info("TTS会话启动成功")
 
-                elif ContentType.TEXT == message.content_type:
-                    if message.content_detail:
-                        try:
-                            logger.bind(tag=TAG).debug(
-                                f"开始发送TTS文本: {message.content_detail}"
-                            )
-                            future = asyncio.run_coroutine_threadsafe(
-                                self.text_to_speak(message.content_detail, None),
-                                loop=self.conn.loop,
-                            )
-                            future.result()
-                            logger.bind(tag=TAG).debug("TTS文本发送成功")
-                        except Exception as e:
-                            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-                            continue
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
+                return
 
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
+        elif ContentType.TEXT == message.content_type:
+            if message.content_detail:
+                try:
+                    logger.bind(tag=TAG).debug(
+                        f"开始发送TTS文本: {message.content_detail}"
                     )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
-                if message.sentence_type == SentenceType.LAST:
-                    try:
-                        logger.bind(tag=TAG).info("开始结束TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.finish_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
-                        continue
+                    await self.text_to_speak(message.content_detail, None)
+                    logger.bind(tag=TAG).debug("TTS文本发送成功")
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
+                    return
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+        elif ContentType.FILE == message.content_type:
+            logger.bind(tag=TAG).info(
+                f"添加音频文件到待播放列表: {message.content_file}"
+            )
+            if message.content_file and os.path.exists(message.content_file):
+                # 先处理文件音频数据，解码转码是阻塞操作，放到共享线程池
+                await asyncio.get_running_loop().run_in_executor(
+                    self.conn.executor,
+                    lambda: self._process_audio_file_stream(
+                        message.content_file,
+                        callback=lambda audio_data: self.handle_audio_file(
+                            audio_data, message.content_detail
+                        ),
+                    ),
                 )
+        if message.sentence_type == SentenceType.LAST:
+            try:
+                logger.bind(tag=TAG).info("开始结束TTS会话...")
+                await self.finish_session(self.conn.sentence_id)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
+                return
 
     async def text_to_speak(self, text, _):
         try:
@@ -305,7 +315,6 @@ class TTSProvider(TTSProviderBase):
                 "payload": {"text": filtered_text},
             }
             await self.ws.send(json.dumps(run_request))
-            self.last_active_time = time.time()
             return
 
         except Exception as e:
@@ -332,11 +341,13 @@ class TTSProvider(TTSProviderBase):
                 )
                 await self.close()
 
-            # 建立新连接
-            await self._ensure_connection()
+            # 从连接池获取上游连接
+            await self._ensure_connection(self.conn.sentence_id)
 
             # 启动监听任务
-            self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
+            self._monitor_task = asyncio.create_task(
+                self._start_monitor_tts_response(self.ws)
+            )
 
             start_request = {
                 "header": {
@@ -357,7 +368,6 @@ class TTSProvider(TTSProviderBase):
                 },
             }
             await self.ws.send(json.dumps(start_request))
-            self.last_active_time = time.time()
             logger.bind(tag=TAG).info("会话启动请求已发送")
         except Exception as e:
             logger.bind(tag=TAG).error(f"启动会话失败: {str(e)}")
@@ -380,10 +390,10 @@ class TTSProvider(TTSProviderBase):
                 }
                 await self.ws.send(json.dumps(stop_request))
                 logger.bind(tag=TAG).info("会话结束请求已发送")
-                self.last_active_time = time.time()
                 if self._monitor_task:
                     try:
-                        await self._monitor_task
+                        # 打断时监听任务会被取消，用wait等待其结束，取消不会传到本协程
+                        await asyncio.wait({self._monitor_task})
                     except Exception as e:
                         logger.bind(tag=TAG).error(
                             f"等待监听任务完成时发生错误: {str(e)}"
@@ -396,6 +406,13 @@ class TTSProvider(TTSProviderBase):
             await self.close()
             raise
 
+    async def cancel_synthesis(self):
+        """打断时立即结束监听任务，不等下一条响应；会话按异常归还，上游连接关闭后停止合成"""
+        await super().cancel_synthesis()
+        if self._monitor_task is not None and not self._monitor_task.done():
+            self._monitor_task.cancel()
+        return 0
+
     async def close(self):
         """资源清理"""
         if self._monitor_task:
@@ -414,16 +431,14 @@ class TTSProvider(TTSProviderBase):
             except:
                 pass
             self.ws = None
-            self.last_active_time = None
 
-    async def _start_monitor_tts_response(self):
+    async def _start_monitor_tts_response(self, session):
         """监听TTS响应"""
+        session_finished = False  # 标记会话是否正常结束
         try:
-            session_finished = False  # 标记会话是否正常结束
             while not self.conn.stop_event.is_set():
                 try:
-                    msg = await self.ws.recv()
-                    self.last_active_time = time.time()
+                    msg = await session.recv()
                     # 检查客户端是否中止
                     if self.conn.client_abort:
                         logger.bind(tag=TAG).info("收到打断信息，终止监听TTS响应")
@@ -466,15 +481,11 @@ class TTSProvider(TTSProviderBase):
                         f"处理TTS响应时出错: {e}\n{traceback.format_exc()}"
                     )
                     break
-            # 仅在连接异常时才关闭
-            if not session_finished and self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
-        # 监听任务退出时清理引用
+        # 监听任务退出时归还会话，仅在会话异常时才关闭上游连接
         finally:
+            if self.ws is session:
+                self.ws = None
+            await session.release(reusable=session_finished)
             self._monitor_task = None
 
     def to_tts(self, text: str) -> list:
@@ -2,7 +2,6 @@ import os
 import re
 import time
 import uuid
-import queue
 import asyncio
 import threading
 import traceback
@@ -17,6 +16,7 @@ from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
 from core.utils.util import audio_bytes_to_data_stream, audio_to_data_stream
+from core.utils.loop_queue import LoopQueue
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -28,6 +28,10 @@ TAG = __name__
 logger = setup_logging()
 
 
+class SynthesisCancelled(Exception):
+    """合成期间发生了打断，结果已丢弃"""
+
+
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
         self.interface_type = InterfaceType.NON_STREAM
@@ -35,8 +39,8 @@ class TTSProviderBase(ABC):
         self.delete_audio_file = delete_audio_file
         self.audio_file_type = "wav"
         self.output_file = config.get("output_dir", "tmp/")
-        self.tts_text_queue = queue.Queue()
-        self.tts_audio_queue = queue.Queue()
+        self.tts_text_queue = LoopQueue()
+        self.tts_audio_queue = LoopQueue()
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
@@ -68,6 +72,11 @@ class TTSProviderBase(ABC):
         self.tts_stop_request = False
         self.processed_chars = 0
         self.is_first_sentence = True
+        # 线程池中进行中的合成：(事件循环, 任务, 文本)，打断时从连接的事件循环取消
+        self._synthesis_tasks = set()
+        self._synthesis_lock = threading.Lock()
+        # 每次打断加一，合成返回时与开始时不一致说明期间发生过打断
+        self._synthesis_generation = 0
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -89,7 +98,9 @@ class TTSProviderBase(ABC):
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = self.run_synthesis(
+                        self.text_to_speak(text, None), text
+                    )
                     if audio_bytes:
                         self.tts_audio_queue.put((SentenceType.FIRST, None, text))
                         audio_bytes_to_data_stream(
@@ -101,6 +112,9 @@ class TTSProviderBase(ABC):
                         break
                     else:
                         max_repeat_time -= 1
+                except SynthesisCancelled:
+                    logger.bind(tag=TAG).info(f"语音合成已取消: {text}")
+                    return None
                 except Exception as e:
                     logger.bind(tag=TAG).warning(
                         f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -120,7 +134,12 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        self.run_synthesis(self.text_to_speak(text, tmp_file), text)
+                    except SynthesisCancelled:
+                        logger.bind(tag=TAG).info(f"语音合成已取消: {text}")
+                        if os.path.exists(tmp_file):
+                            os.remove(tmp_file)
+                        return None
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -143,7 +162,49 @@ class TTSProviderBase(ABC):
             except Exception as e:
                 logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
                 return None
-    
+
+    def run_synthesis(self, coro, text=""):
+        """在线程池的当前线程中执行一次合成协程，可被cancel_synthesis取消
+
+        等待网络响应的合成请求会被立即取消；内部使用阻塞请求的实现无法中途取消，
+        请求返回后丢弃结果。期间发生过打断时抛出SynthesisCancelled，调用方不再转码和重试
+        """
+        generation = self._synthesis_generation
+
+        async def _run():
+            entry = (asyncio.get_running_loop(), asyncio.current_task(), text)
+            with self._synthesis_lock:
+                self._synthesis_tasks.add(entry)
+            try:
+                return await coro
+            except asyncio.CancelledError:
+                return None
+            finally:
+                with self._synthesis_lock:
+                    self._synthesis_tasks.discard(entry)
+
+        result = asyncio.run(_run())
+        if generation != self._synthesis_generation:
+            raise SynthesisCancelled()
+        return result
+
+    async def cancel_synthesis(self) -> int:
+        """打断时取消进行中的合成，返回被取消的文本字数
+
+        非流式合成在线程池中执行，从连接的事件循环线程安全地取消；
+        流式TTS在子类中结束上游会话
+        """
+        self._synthesis_generation += 1
+        with self._synthesis_lock:
+            running = list(self._synthesis_tasks)
+        for loop, task, _ in running:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # 合成刚好结束，事件循环已关闭
+                pass
+        return sum(len(text) for _, _, text in running)
+
     def to_tts(self, text):
         text = MarkdownCleaner.clean_markdown(text)
         max_repeat_time = 5
@@ -252,77 +313,78 @@ class TTSProviderBase(ABC):
 
     async def open_audio_channels(self, conn):
         self.conn = conn
-        # tts 消化线程
-        self.tts_priority_thread = threading.Thread(
-            target=self.tts_text_priority_thread, daemon=True
+        self.tts_text_queue.bind(conn.loop)
+        self.tts_audio_queue.bind(conn.loop)
+        # tts 消化任务
+        self.tts_priority_task = conn.start_pipeline_task(self._tts_text_priority_task())
+        # 音频播放 消化任务
+        self.audio_play_priority_task = conn.start_pipeline_task(
+            self._audio_play_priority_task()
         )
-        self.tts_priority_thread.start()
 
-        # 音频播放 消化线程
-        self.audio_play_priority_thread = threading.Thread(
-            target=self._audio_play_priority_thread, daemon=True
-        )
-        self.audio_play_priority_thread.start()
+    async def _tts_text_priority_task(self):
+        """按顺序处理TTS文本消息
 
-    # 这里默认是非流式的处理方式
-    # 流式处理方式请在子类中重写
-    def tts_text_priority_thread(self):
+        协程实现的handle_tts_text_message直接在事件循环上运行；
+        同步实现（内部有阻塞的合成或转码）提交到共享线程池，处理完再取下一条
+        """
+        loop = asyncio.get_running_loop()
+        is_async = asyncio.iscoroutinefunction(self.handle_tts_text_message)
         while not self.conn.stop_event.is_set():
             try:
-                message = self.tts_text_queue.get(timeout=1)
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
-                if self.conn.client_abort:
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                    continue
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
-                    self.tts_audio_first_sentence = True
-                elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
-                elif ContentType.FILE == message.content_type:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    tts_file = message.content_file
-                    if tts_file and os.path.exists(tts_file):
-                        self._process_audio_file_stream(
-                            tts_file, callback=self.handle_opus
-                        )
-                if message.sentence_type == SentenceType.LAST:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail)
+                message = await self.tts_text_queue.get()
+                if is_async:
+                    await self.handle_tts_text_message(message)
+                else:
+                    await loop.run_in_executor(
+                        self.conn.executor, self.handle_tts_text_message, message
                     )
-
-            except queue.Empty:
-                continue
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.bind(tag=TAG).error(
                     f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
                 )
-                continue
 
-    def _audio_play_priority_thread(self):
+    # 这里默认是非流式的处理方式
+    # 流式处理方式请在子类中重写
+    def handle_tts_text_message(self, message):
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
+        if self.conn.client_abort:
+            logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理")
+            return
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            self.tts_stop_request = False
+            self.processed_chars = 0
+            self.tts_text_buff = []
+            self.is_first_sentence = True
+            self.tts_audio_first_sentence = True
+        elif ContentType.TEXT == message.content_type:
+            self.tts_text_buff.append(message.content_detail)
+            segment_text = self._get_segment_text()
+            if segment_text:
+                self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
+        elif ContentType.FILE == message.content_type:
+            self._process_remaining_text_stream(opus_handler=self.handle_opus)
+            tts_file = message.content_file
+            if tts_file and os.path.exists(tts_file):
+                self._process_audio_file_stream(tts_file, callback=self.handle_opus)
+        if message.sentence_type == SentenceType.LAST:
+            self._process_remaining_text_stream(opus_handler=self.handle_opus)
+            self.tts_audio_queue.put(
+                (message.sentence_type, [], message.content_detail)
+            )
+
+    async def _audio_play_priority_task(self):
         # 需要上报的文本和音频列表
         enqueue_text = None
         enqueue_audio = None
         while not self.conn.stop_event.is_set():
             text = None
             try:
-                try:
-                    sentence_type, audio_datas, text = self.tts_audio_queue.get(
-                        timeout=0.1
-                    )
-                except queue.Empty:
-                    if self.conn.stop_event.is_set():
-                        break
-                    continue
+                sentence_type, audio_datas, text = await self.tts_audio_queue.get()
 
                 if self.conn.client_abort:
                     logger.bind(tag=TAG).debug("收到打断信号，跳过当前音频数据")
@@ -342,18 +404,22 @@ class TTSProviderBase(ABC):
                     enqueue_audio.append(audio_datas)
 
                 # 发送音频
-                future = asyncio.run_coroutine_threadsafe(
-                    sendAudioMessage(self.conn, sentence_type, audio_datas, text),
-                    self.conn.loop,
-                )
-                future.result()
+                await sendAudioMessage(self.conn, sentence_type, audio_datas, text)
 
-                # 记录输出和报告
+                # 记录输出和报告，多进程模式下计数器是跨进程代理，在后台线程池中调用，不阻塞事件循环
                 if self.conn.max_output_size > 0 and text:
-                    add_device_output(self.conn.headers.get("device-id"), len(text))
+                    self.conn.background_executor.submit(
+                        add_device_output, self.conn.headers.get("device-id"), len(text)
+                    )
 
+            except asyncio.CancelledError:
+                break
             except Exception as e:
-                logger.bind(tag=TAG).error(f"audio_play_priority_thread: {text} {e}")
+                logger.bind(tag=TAG).error(f"audio_play_priority_task: {text} {e}")
+
+    async def prewarm(self):
+        """预热上游连接，服务启动时调用，默认无需预热"""
+        pass
 
     async def start_session(self, session_id):
         pass
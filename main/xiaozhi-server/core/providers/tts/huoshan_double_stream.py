@@ -1,8 +1,8 @@
 import os
 import uuid
 import json
-import queue
 import asyncio
+import functools
 import traceback
 from typing import Callable, Any
 import websockets
@@ -10,6 +10,7 @@ from core.utils.tts import MarkdownCleaner
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
+from core.utils.ws_session_pool import get_session_pool
 from core.providers.tts.base import TTSProviderBase
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from asyncio import Task
@@ -139,6 +140,57 @@ class Response:
         return super().__str__()
 
 
+def route_session_message(msg):
+    """从下行帧中解析session id，供连接池路由；连接级事件返回None"""
+    if isinstance(msg, str) or len(msg) < 12:
+        return None
+    if (msg[1] & 0x0F) != MsgTypeFlagWithEvent:
+        return None
+    event = int.from_bytes(msg[4:8], "big", signed=True)
+    if event in (
+        EVENT_NONE,
+        EVENT_ConnectionStarted,
+        EVENT_ConnectionFailed,
+        EVENT_ConnectionFinished,
+    ):
+        return None
+    size = int.from_bytes(msg[8:12], "big", signed=True)
+    return msg[12 : 12 + size].decode("utf-8", errors="ignore")
+
+
+async def cancel_upstream_session(session):
+    """连接池放弃会话时只取消该会话，同一连接上其他设备的会话不受影响"""
+    header = Header(
+        message_type=FULL_CLIENT_REQUEST,
+        message_type_specific_flags=MsgTypeFlagWithEvent,
+        serial_method=JSON,
+    ).as_bytes()
+    optional = Optional(
+        event=EVENT_CancelSession, sessionId=session.session_id
+    ).as_bytes()
+    payload = str.encode("{}")
+    await session.connection.send(
+        header + optional + len(payload).to_bytes(4, "big", signed=True) + payload
+    )
+
+
+async def connect_upstream(ws_url, app_id, access_token, resource_id):
+    """建立一条火山双流式TTS上游连接"""
+    ws_header = {
+        "X-Api-App-Key": app_id,
+        "X-Api-Access-Key": access_token,
+        "X-Api-Resource-Id": resource_id,
+        "X-Api-Connect-Id": str(uuid.uuid4()),
+    }
+    return await websockets.connect(
+        ws_url,
+        additional_headers=ws_header,
+        max_size=1000000000,
+        ping_interval=20,
+        ping_timeout=10,
+    )
+
+
 class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
@@ -167,6 +219,12 @@ class TTSProvider(TTSProviderBase):
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
             sample_rate=16000, channels=1, frame_size_ms=60
         )
+        # 上游长连接池配置，同一份配置的所有设备共享
+        self.pool_min_idle = int(config.get("pool_min_idle", 1))
+        self.pool_idle_timeout = float(config.get("pool_idle_timeout", 60))
+        self.pool_sessions_per_connection = int(
+            config.get("pool_sessions_per_connection", 1)
+        )
         model_key_msg = check_model_key("TTS", self.access_token)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
@@ -179,114 +237,110 @@ class TTSProvider(TTSProviderBase):
             self.ws = None
             raise
 
-    async def _ensure_connection(self):
-        """建立新的WebSocket连接"""
+    def _get_session_pool(self):
+        return get_session_pool(
+            (
+                "huoshan_double_stream",
+                self.ws_url,
+                self.appId,
+                self.resource_id,
+                self.access_token,
+            ),
+            name=f"huoshan_double_stream@{self.ws_url}",
+            connect=functools.partial(
+                connect_upstream,
+                self.ws_url,
+                self.appId,
+                self.access_token,
+                self.resource_id,
+            ),
+            route=route_session_message,
+            cancel=cancel_upstream_session,
+            max_sessions_per_connection=self.pool_sessions_per_connection,
+            min_idle=self.pool_min_idle,
+            idle_timeout=self.pool_idle_timeout,
+        )
+
+    async def prewarm(self):
+        await self._get_session_pool().prewarm()
+
+    async def _ensure_connection(self, session_id):
+        """从连接池获取承载本会话的上游连接"""
         try:
-            if self.ws:
-                logger.bind(tag=TAG).info(f"使用已有链接...")
-                return self.ws
-            logger.bind(tag=TAG).info("开始建立新连接...")
-            ws_header = {
-                "X-Api-App-Key": self.appId,
-                "X-Api-Access-Key": self.access_token,
-                "X-Api-Resource-Id": self.resource_id,
-                "X-Api-Connect-Id": uuid.uuid4(),
-            }
-            self.ws = await websockets.connect(
-                self.ws_url, additional_headers=ws_header, max_size=1000000000
-            )
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
+            self.ws = await self._get_session_pool().acquire(session_id)
             return self.ws
         except Exception as e:
             logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
             self.ws = None
             raise
 
-    def tts_text_priority_thread(self):
-        """火山引擎双流式TTS的文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                logger.bind(tag=TAG).debug(
-                    f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
-                )
+    async def handle_tts_text_message(self, message):
+        """火山引擎双流式TTS的文本处理"""
+        logger.bind(tag=TAG).debug(
+            f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+        )
 
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
 
-                if self.conn.client_abort:
-                    try:
-                        logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                        asyncio.run_coroutine_threadsafe(
-                            self.cancel_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        continue
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
-                        continue
+        if self.conn.client_abort:
+            try:
+                logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理")
+                await self.cancel_session(self.conn.sentence_id)
+                return
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
+                return
 
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    try:
-                        if not getattr(self.conn, "sentence_id", None): 
-                            self.conn.sentence_id = uuid.uuid4().hex
-                            logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
-
-                        logger.bind(tag=TAG).info("开始启动TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.start_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                        self.before_stop_play_files.clear()
-                        logger.bind(tag=TAG).info("TTS会话启动成功")
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
-                        continue
-
-                elif ContentType.TEXT == message.content_type:
-                    if message.content_detail:
-                        try:
-                            logger.bind(tag=TAG).debug(
-                                f"开始发送TTS文本: {message.content_detail}"
-                            )
-                            future = asyncio.run_coroutine_threadsafe(
-                                self.text_to_speak(message.content_detail, None),
-                                loop=self.conn.loop,
-                            )
-                            future.result()
-                            logger.bind(tag=TAG).debug("TTS文本发送成功")
-                        except Exception as e:
-                            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-                            continue
-
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            try:
+                if not getattr(self.conn, "sentence_id", None): 
+                    self.conn.sentence_id = uuid.uuid4().hex
+                    logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
+
+                logger.bind(tag=TAG).info("开始启动TTS会话...")
+                await self.start_session(self.conn.sentence_id)
+                self.before_stop_play_files.clear()
+                logger.bind(tag=TAG).info("TTS会话启动成功")
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
+                return
+
+        elif ContentType.TEXT == message.content_type:
+            if message.content_detail:
+                try:
+                    logger.bind(tag=TAG).debug(
+                        f"开始发送TTS文本: {message.content_detail}"
                     )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
-                if message.sentence_type == SentenceType.LAST:
-                    try:
-                        logger.bind(tag=TAG).info("开始结束TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.finish_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
-                        continue
+                    await self.text_to_speak(message.content_detail, None)
+                    logger.bind(tag=TAG).debug("TTS文本发送成功")
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
+                    return
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+        elif ContentType.FILE == message.content_type:
+            logger.bind(tag=TAG).info(
+                f"添加音频文件到待播放列表: {message.content_file}"
+            )
+            if message.content_file and os.path.exists(message.content_file):
+                # 先处理文件音频数据，解码转码是阻塞操作，放到共享线程池
+                await asyncio.get_running_loop().run_in_executor(
+                    self.conn.executor,
+                    lambda: self._process_audio_file_stream(
+                        message.content_file,
+                        callback=lambda audio_data: self.handle_audio_file(
+                            audio_data, message.content_detail
+                        ),
+                    ),
                 )
-                continue
+        if message.sentence_type == SentenceType.LAST:
+            try:
+                logger.bind(tag=TAG).info("开始结束TTS会话...")
+                await self.finish_session(self.conn.sentence_id)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
+                return
 
     async def text_to_speak(self, text, _):
         """发送文本到TTS服务"""
@@ -324,11 +378,13 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).info("检测到未完成的上个会话，关闭监听任务和连接...")
                 await self.close()
 
-            # 建立新连接
-            await self._ensure_connection()
+            # 从连接池获取上游连接
+            await self._ensure_connection(session_id)
 
             # 启动监听任务
-            self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
+            self._monitor_task = asyncio.create_task(
+                self._start_monitor_tts_response(self.ws)
+            )
 
             header = Header(
                 message_type=FULL_CLIENT_REQUEST,
@@ -382,6 +438,18 @@ class TTSProvider(TTSProviderBase):
             await self.close()
             raise
 
+    async def cancel_synthesis(self):
+        """打断时立即通知服务端取消当前会话，监听任务收到SessionCanceled后归还上游连接"""
+        await super().cancel_synthesis()
+        if self._monitor_task is None or self._monitor_task.done():
+            return 0
+        try:
+            await self.cancel_session(self.conn.sentence_id)
+        except Exception:
+            # cancel_session已记录错误并关闭连接
+            pass
+        return 0
+
     async def cancel_session(self,session_id):
         logger.bind(tag=TAG).info(f"取消会话，释放服务端资源～～{session_id}")
         try:
@@ -423,14 +491,14 @@ class TTSProvider(TTSProviderBase):
                 pass
             self.ws = None
 
-    async def _start_monitor_tts_response(self):
+    async def _start_monitor_tts_response(self, session):
         """监听TTS响应"""
+        session_finished = False  # 标记会话是否正常结束
         try:
-            session_finished = False  # 标记会话是否正常结束
             while not self.conn.stop_event.is_set():
                 try:
                     # 确保 `recv()` 运行在同一个 event loop
-                    msg = await self.ws.recv()
+                    msg = await session.recv()
                     res = self.parser_response(msg)
                     self.print_response(res, "send_text res:")
 
@@ -466,15 +534,11 @@ class TTSProvider(TTSProviderBase):
                     )
                     traceback.print_exc()
                     break
-            # 仅在连接异常时才关闭
-            if not session_finished and self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
-        # 监听任务退出时清理引用
+        # 监听任务退出时归还会话，仅在会话异常时才关闭上游连接
         finally:
+            if self.ws is session:
+                self.ws = None
+            await session.release(reusable=session_finished)
             self._monitor_task = None
 
     async def send_event(
@@ -513,7 +577,7 @@ class TTSProvider(TTSProviderBase):
     def read_res_content(self, res: bytes, offset: int):
         content_size = int.from_bytes(res[offset : offset + 4], "big", signed=True)
         offset += 4
-        content = str(res[offset : offset + content_size])
+        content = res[offset : offset + content_size].decode("utf-8", errors="ignore")
         offset += content_size
         return content, offset
 
@@ -1,13 +1,10 @@
 import os
 import time
-import queue
 import aiohttp
-import asyncio
 import requests
-import traceback
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
-from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.base import TTSProviderBase, SynthesisCancelled
 from core.utils import opus_encoder_utils, textUtils
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
@@ -36,41 +33,31 @@ class TTSProvider(TTSProviderBase):
         # PCM缓冲区
         self.pcm_buffer = bytearray()
 
-    def tts_text_priority_thread(self):
-        """流式文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.before_stop_play_files.clear()
-                elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        self.to_tts_single_stream(segment_text)
-
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
-                    )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+    def handle_tts_text_message(self, message):
+        """流式文本处理"""
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            self.tts_stop_request = False
+            self.processed_chars = 0
+            self.tts_text_buff = []
+            self.before_stop_play_files.clear()
+        elif ContentType.TEXT == message.content_type:
+            self.tts_text_buff.append(message.content_detail)
+            segment_text = self._get_segment_text()
+            if segment_text:
+                self.to_tts_single_stream(segment_text)
 
-                if message.sentence_type == SentenceType.LAST:
-                    # 处理剩余的文本
-                    self._process_remaining_text_stream(True)
+        elif ContentType.FILE == message.content_type:
+            logger.bind(tag=TAG).info(
+                f"添加音频文件到待播放列表: {message.content_file}"
+            )
+            if message.content_file and os.path.exists(message.content_file):
+                # 先处理文件音频数据
+                self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
-                )
+        if message.sentence_type == SentenceType.LAST:
+            # 处理剩余的文本
+            self._process_remaining_text_stream(True)
 
     def _process_remaining_text_stream(self, is_last=False):
         """处理剩余的文本并生成语音
@@ -94,7 +81,10 @@ class TTSProvider(TTSProviderBase):
             max_repeat_time = 5
             text = MarkdownCleaner.clean_markdown(text)
             try:
-                asyncio.run(self.text_to_speak(text, is_last))
+                self.run_synthesis(self.text_to_speak(text, is_last), text)
+            except SynthesisCancelled:
+                logger.bind(tag=TAG).info(f"语音合成已取消: {text}")
+                return None
             except Exception as e:
                 logger.bind(tag=TAG).warning(
                     f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -0,0 +1,158 @@
+"""
+新连接准入控制
+服务过载时继续接入新设备会拖慢所有正在进行的对话，这里在创建ConnectionHandler之前检查负载，
+超过阈值时先短暂等待负载回落，仍然过载则回复busy消息和建议的重试间隔后关闭连接
+"""
+
+import time
+import random
+import asyncio
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.logger import setup_logging
+from core.utils.executors import INTERACTIVE, get_executor_pool
+from core.utils.ws_session_pool import get_recent_session_start_ms
+
+TAG = __name__
+logger = setup_logging()
+
+# 拒绝/等待原因
+REASON_CONNECTIONS = "connections"
+REASON_LOOP_LAG = "loop_lag"
+REASON_EXECUTOR_QUEUE = "executor_queue"
+REASON_PROVIDER = "provider_saturation"
+
+# 等待期间重新检查负载的间隔（秒）
+RECHECK_INTERVAL = 0.1
+
+
+class AdmissionController:
+    """新连接准入控制器
+
+    检查的信号：
+    - 连接数：超过max_connections直接拒绝，已有连接不会很快释放，等待没有意义
+    - 事件循环延迟：定时任务实际唤醒时间比预期晚多少，平滑后超过max_loop_lag_ms
+    - 共享线程池interactive等级的排队任务数超过max_executor_queue
+    - 上游TTS连接池最近provider_window_seconds内建立会话的平均耗时超过max_provider_session_start_ms，
+      只看最近的样本，上游恢复后不会因为旧样本持续拒绝
+    后三项是瞬时负载，先等待最多defer_timeout_ms，期间恢复则放行
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.max_connections = int(config.get("max_connections") or 0)
+        self.max_loop_lag_ms = float(config.get("max_loop_lag_ms") or 200)
+        self.max_executor_queue = int(config.get("max_executor_queue") or 32)
+        self.max_provider_session_start_ms = float(
+            config.get("max_provider_session_start_ms") or 3000
+        )
+        self.provider_window = float(config.get("provider_window_seconds") or 30)
+        self.defer_timeout = float(config.get("defer_timeout_ms") or 1500) / 1000
+        self.max_deferred = int(config.get("max_deferred") or 50)
+        self.retry_after = int(config.get("retry_after_seconds") or 5)
+        self.lag_check_interval = float(config.get("lag_check_interval_ms") or 250) / 1000
+
+        self.loop_lag_ms = 0.0
+        self.deferred = 0
+        self._lag_task: Optional[asyncio.Task] = None
+        self.stats = {"admitted": 0, "deferred": 0, "rejected": 0}
+        self.rejected_reasons = Counter()
+        self.deferred_reasons = Counter()
+
+    def start(self):
+        """在事件循环中启动延迟监测任务"""
+        if self.enabled and (self._lag_task is None or self._lag_task.done()):
+            self._lag_task = asyncio.create_task(self._monitor_loop_lag())
+
+    async def _monitor_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            begin = loop.time()
+            await asyncio.sleep(self.lag_check_interval)
+            lag_ms = max(0.0, (loop.time() - begin - self.lag_check_interval) * 1000)
+            # 上升立即生效，回落做平滑，避免单次抖动反复放行/拒绝
+            if lag_ms >= self.loop_lag_ms:
+                self.loop_lag_ms = lag_ms
+            else:
+                self.loop_lag_ms = self.loop_lag_ms * 0.7 + lag_ms * 0.3
+
+    def _provider_session_start_ms(self) -> float:
+        return get_recent_session_start_ms(self.provider_window)
+
+    def evaluate(self, active_connections: int) -> List[str]:
+        """返回当前超过阈值的原因列表，为空表示可以接入"""
+        reasons = []
+        if self.max_connections and active_connections >= self.max_connections:
+            reasons.append(REASON_CONNECTIONS)
+        if self.loop_lag_ms > self.max_loop_lag_ms:
+            reasons.append(REASON_LOOP_LAG)
+        if get_executor_pool().queue_depth(INTERACTIVE) > self.max_executor_queue:
+            reasons.append(REASON_EXECUTOR_QUEUE)
+        if self._provider_session_start_ms() > self.max_provider_session_start_ms:
+            reasons.append(REASON_PROVIDER)
+        return reasons
+
+    async def admit(self, active_connections: Callable[[], int]) -> Tuple[bool, List[str]]:
+        """判断是否接入新连接，瞬时过载时最多等待defer_timeout
+
+        Args:
+            active_connections: 返回当前活动连接数的函数，等待期间会重复调用
+
+        Returns:
+            (是否接入, 拒绝或曾经等待的原因)
+        """
+        if not self.enabled:
+            return True, []
+        reasons = self.evaluate(active_connections())
+        if not reasons:
+            self.stats["admitted"] += 1
+            return True, []
+
+        if REASON_CONNECTIONS not in reasons and self.deferred < self.max_deferred:
+            self.deferred += 1
+            self.stats["deferred"] += 1
+            self.deferred_reasons.update(reasons)
+            try:
+                deadline = time.monotonic() + self.defer_timeout
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(RECHECK_INTERVAL)
+                    current = self.evaluate(active_connections())
+                    if not current:
+                        self.stats["admitted"] += 1
+                        return True, reasons
+                    reasons = current
+                    if REASON_CONNECTIONS in current:
+                        break
+            finally:
+                self.deferred -= 1
+
+        self.stats["rejected"] += 1
+        self.rejected_reasons.update(reasons)
+        return False, reasons
+
+    def busy_message(self, reasons: List[str]) -> Dict[str, Any]:
+        """拒绝接入时回复设备的消息，重试间隔加入随机抖动，避免设备同时重连"""
+        retry_after = self.retry_after + random.randint(0, self.retry_after)
+        return {
+            "type": "server",
+            "status": "busy",
+            "message": "服务器繁忙，请稍后重试",
+            "content": {
+                "action": "busy",
+                "reasons": reasons,
+                "retry_after": retry_after,
+            },
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "deferred_reasons": dict(self.deferred_reasons),
+            "rejected_reasons": dict(self.rejected_reasons),
+            "deferring": self.deferred,
+            "loop_lag_ms": round(self.loop_lag_ms, 1),
+            "executor_queue": get_executor_pool().queue_depth(INTERACTIVE),
+            "provider_session_start_ms": round(self._provider_session_start_ms(), 1),
+        }
@@ -0,0 +1,407 @@
+"""
+下行音频节拍调度器
+进程内只有一个调度任务，用时间轮管理所有连接的下行音频流，按帧时长统一发送到期的音频帧
+"""
+
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 时间轮每格时长（毫秒）与格数，默认可覆盖约2.5秒的调度范围，超出范围的按轮次计算
+DEFAULT_TICK_MS = 5
+DEFAULT_WHEEL_SIZE = 512
+
+
+class AudioStream:
+    """一个连接的下行音频流
+
+    Args:
+        scheduler: 所属调度器
+        send_frame: 发送单帧的协程函数，参数为(frame, timestamp, sequence)
+        frame_duration: 帧时长（毫秒）
+        should_drop: 返回True时丢弃未发送的音频（如客户端打断）
+        name: 日志中显示的流名称
+        send_frames: 把多帧合并为一条消息发送的协程函数，参数为(frames, timestamp, sequence)，
+            预缓冲和追帧时一次到期多帧会合并发送
+        max_frames_per_message: 每条消息最多合并的帧数
+    """
+
+    def __init__(
+        self,
+        scheduler: "PacedAudioScheduler",
+        send_frame: Callable[[bytes, int, int], Awaitable[Any]],
+        frame_duration: int = 60,
+        should_drop: Optional[Callable[[], bool]] = None,
+        name: str = "",
+        send_frames: Optional[Callable[[list, int, int], Awaitable[Any]]] = None,
+        max_frames_per_message: int = 1,
+    ):
+        self.scheduler = scheduler
+        self.send_frame = send_frame
+        self.send_frames = send_frames
+        self.max_frames_per_message = max_frames_per_message
+        self.frame_duration = frame_duration / 1000
+        self.should_drop = should_drop
+        self.name = name
+        # 待发送帧：(frame, 是否预缓冲帧, 该批次的完成future或None)
+        self.frames = deque()
+        # 下一个节拍帧的预期发送时间
+        self.next_due = 0.0
+        # 媒体时间轴，用于计算MQTT网关时间戳
+        self.media_time = 0.0
+        self.sequence = 0
+        self.due_tick = None
+        # 本流常驻的发送任务，以及交给它、尚未发完的一批帧
+        self.sender: Optional[asyncio.Task] = None
+        self.outbox: Optional[list] = None
+        self._sender_wakeup: Optional[asyncio.Future] = None
+        self._sent_waiters = []
+        self.closed = False
+        self.stats = {
+            "frames_sent": 0,
+            "messages_sent": 0,
+            "frames_dropped": 0,
+            "late_frames": 0,
+            "lateness_total_ms": 0.0,
+            "lateness_max_ms": 0.0,
+            "underruns": 0,
+        }
+
+    def enqueue(self, frames, pre_buffer: int = 0) -> asyncio.Future:
+        """加入一批音频帧，前pre_buffer帧立即发送，其余按帧时长节拍发送
+
+        Returns:
+            该批次最后一帧发送完成（或被丢弃）时完成的future
+        """
+        waiter = self.scheduler.loop.create_future()
+        if self.closed or not frames:
+            waiter.set_result(False)
+            return waiter
+
+        now = time.perf_counter()
+        if not self.frames and self.next_due < now:
+            # 流空闲后重新开始，节拍和媒体时间都从当前时刻起算
+            self.next_due = now
+            self.media_time = max(self.media_time, now)
+
+        last = len(frames) - 1
+        for i, frame in enumerate(frames):
+            self.frames.append((frame, i < pre_buffer, waiter if i == last else None))
+
+        if self.due_tick is None:
+            due = now if self.frames[0][1] else self.next_due
+            self.scheduler.schedule(self, due)
+        return waiter
+
+    def _on_due(self, now: float):
+        """调度器回调：取出所有到期帧交给发送任务"""
+        if self.outbox is not None:
+            # 上一批尚未发完（客户端网络拥塞），下一格再试
+            self.scheduler.schedule(self, now + self.scheduler.tick)
+            return
+        if not self.frames:
+            return
+
+        # 落后超过一帧说明生产端供不上（流式TTS欠载），不追帧，直接重新对齐节拍
+        if self.next_due < now - self.frame_duration and not self.frames[0][1]:
+            self.next_due = now
+            self.stats["underruns"] += 1
+
+        batch = []
+        while self.frames:
+            frame, burst, waiter = self.frames[0]
+            if not burst:
+                if self.next_due > now + self.scheduler.tick / 2:
+                    break
+                self._record_lateness(now - self.next_due)
+                self.next_due += self.frame_duration
+            self.frames.popleft()
+            batch.append((frame, waiter))
+
+        if self.frames:
+            self.scheduler.schedule(self, self.next_due)
+        if batch:
+            self._start_send(batch)
+
+    def _start_send(self, batch):
+        """把到期帧交给本流的发送任务
+
+        调度任务只负责计时，不执行socket发送：发送中的超时、取消只影响本流的发送任务。
+        发送任务常驻，不为每帧创建任务
+        """
+        self.outbox = batch
+        if self.sender is None or self.sender.done():
+            self.sender = self.scheduler.loop.create_task(self._sender_loop())
+        else:
+            self._wake_sender()
+
+    def _wake_sender(self):
+        if self._sender_wakeup is not None and not self._sender_wakeup.done():
+            self._sender_wakeup.set_result(None)
+
+    async def _sender_loop(self):
+        """逐批发送调度任务交来的帧，流关闭后退出"""
+        while not self.closed:
+            batch = self.outbox
+            if batch is None:
+                self._sender_wakeup = self.scheduler.loop.create_future()
+                try:
+                    await self._sender_wakeup
+                finally:
+                    self._sender_wakeup = None
+                continue
+            try:
+                await self._send_batch(batch)
+            except asyncio.CancelledError:
+                self._resolve(batch, False)
+                raise
+            finally:
+                self.outbox = None
+                waiters, self._sent_waiters = self._sent_waiters, []
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    async def wait_sent(self):
+        """等待已交给发送任务的一批帧发完（或被丢弃）"""
+        if self.outbox is None:
+            return
+        waiter = self.scheduler.loop.create_future()
+        self._sent_waiters.append(waiter)
+        await waiter
+
+    def _record_lateness(self, lateness: float):
+        lateness_ms = lateness * 1000
+        self.stats["lateness_total_ms"] += lateness_ms
+        if lateness_ms > self.stats["lateness_max_ms"]:
+            self.stats["lateness_max_ms"] = lateness_ms
+        if lateness > self.scheduler.tick * 2:
+            self.stats["late_frames"] += 1
+
+    async def _send_batch(self, batch):
+        index = 0
+        while index < len(batch):
+            if self.closed or (self.should_drop and self.should_drop()):
+                self.stats["frames_dropped"] += len(batch) - index
+                self._resolve(batch[index:], False)
+                self.clear()
+                return
+            count = 1
+            if self.send_frames is not None and self.max_frames_per_message > 1:
+                count = min(self.max_frames_per_message, len(batch) - index)
+            chunk = batch[index : index + count]
+            try:
+                timestamp = int(self.media_time * 1000) % (2**32)
+                if count > 1:
+                    await self.send_frames(
+                        [frame for frame, _ in chunk], timestamp, self.sequence
+                    )
+                else:
+                    await self.send_frame(chunk[0][0], timestamp, self.sequence)
+            except Exception as e:
+                # 发送失败（通常是连接已断开），本批和队列中剩余的等待方都收到异常
+                self._resolve(batch[index:], e)
+                self._resolve(self.frames, e)
+                self.frames.clear()
+                self.scheduler.unschedule(self)
+                return
+            self.media_time += self.frame_duration * count
+            self.sequence += count
+            self.stats["frames_sent"] += count
+            self.stats["messages_sent"] += 1
+            self.scheduler.stats["frames_sent"] += count
+            for _, waiter in chunk:
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(True)
+            index += count
+
+    @staticmethod
+    def _resolve(items, result):
+        for item in items:
+            waiter = item[-1]
+            if waiter is None or waiter.done():
+                continue
+            if isinstance(result, BaseException):
+                waiter.set_exception(result)
+            else:
+                waiter.set_result(result)
+
+    def clear(self):
+        """丢弃尚未发送的音频帧，等待方立即返回"""
+        self.stats["frames_dropped"] += len(self.frames)
+        self._resolve(self.frames, False)
+        self.frames.clear()
+        self.scheduler.unschedule(self)
+
+    def close(self):
+        self.clear()
+        self.closed = True
+        self._wake_sender()
+        self.scheduler.streams.discard(self)
+
+    def get_stats(self) -> Dict[str, Any]:
+        count = max(1, self.stats["frames_sent"])
+        return {
+            **self.stats,
+            "lateness_avg_ms": self.stats["lateness_total_ms"] / count,
+            "queued_frames": len(self.frames),
+        }
+
+
+class PacedAudioScheduler:
+    """全局下行音频调度器
+
+    所有音频流挂在同一个时间轮上，调度任务只在最近一个非空格到期时醒来，
+    每次醒来处理所有已到期的格子，替代每个连接每帧一次的asyncio.sleep
+    """
+
+    def __init__(self, tick_ms: int = DEFAULT_TICK_MS, wheel_size: int = DEFAULT_WHEEL_SIZE):
+        self.tick = tick_ms / 1000
+        self.wheel_size = wheel_size
+        self.slots = [[] for _ in range(wheel_size)]
+        self.epoch = time.perf_counter()
+        self.current_tick = 0
+        self.scheduled = 0
+        self.streams = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sleeper: Optional[asyncio.Future] = None
+        self._sleep_until = None
+        self.stats = {"wakeups": 0, "ticks_processed": 0, "frames_sent": 0}
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop or self._task is None or self._task.done():
+            self.loop = loop
+            self.epoch = time.perf_counter()
+            self.current_tick = 0
+            self.slots = [[] for _ in range(self.wheel_size)]
+            self.scheduled = 0
+            for stream in self.streams:
+                stream.due_tick = None
+            self._task = loop.create_task(self._run())
+
+    def create_stream(
+        self,
+        send_frame,
+        frame_duration=60,
+        should_drop=None,
+        name="",
+        send_frames=None,
+        max_frames_per_message=1,
+    ):
+        self._ensure_running()
+        stream = AudioStream(
+            self,
+            send_frame,
+            frame_duration,
+            should_drop,
+            name,
+            send_frames,
+            max_frames_per_message,
+        )
+        self.streams.add(stream)
+        return stream
+
+    def schedule(self, stream: AudioStream, due: float):
+        """把流挂到due时刻对应的格子上"""
+        # 四舍五入到最近的格子，到期帧最多提前或推迟半格发送
+        tick = max(round((due - self.epoch) / self.tick), self.current_tick + 1)
+        if stream.due_tick is not None:
+            if stream.due_tick <= tick:
+                return
+            self.unschedule(stream)
+        stream.due_tick = tick
+        self.slots[tick % self.wheel_size].append(stream)
+        self.scheduled += 1
+        # 新的到期时间早于调度任务当前的睡眠目标时提前唤醒
+        if self._sleeper is not None and not self._sleeper.done():
+            if self._sleep_until is None or tick < self._sleep_until:
+                self._sleeper.set_result(None)
+
+    def unschedule(self, stream: AudioStream):
+        if stream.due_tick is None:
+            return
+        slot = self.slots[stream.due_tick % self.wheel_size]
+        try:
+            slot.remove(stream)
+            self.scheduled -= 1
+        except ValueError:
+            pass
+        stream.due_tick = None
+
+    def _next_tick(self) -> int:
+        for offset in range(1, self.wheel_size + 1):
+            if self.slots[(self.current_tick + offset) % self.wheel_size]:
+                return self.current_tick + offset
+        return self.current_tick + self.wheel_size
+
+    async def _sleep(self, target_tick: Optional[int]):
+        self._sleeper = self.loop.create_future()
+        self._sleep_until = target_tick
+        handle = None
+        if target_tick is not None:
+            delay = self.epoch + target_tick * self.tick - time.perf_counter()
+            if delay <= 0:
+                self._sleeper = None
+                return
+            handle = self.loop.call_later(delay, self._wake)
+        try:
+            await self._sleeper
+        finally:
+            if handle is not None:
+                handle.cancel()
+            self._sleeper = None
+            self._sleep_until = None
+
+    def _wake(self):
+        if self._sleeper is not None and not self._sleeper.done():
+            self._sleeper.set_result(None)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._sleep(self._next_tick() if self.scheduled else None)
+                self.stats["wakeups"] += 1
+                now = time.perf_counter()
+                now_tick = int((now - self.epoch) / self.tick)
+                # 事件循环长时间阻塞时，最多回扫一整圈即可覆盖所有格子
+                start = max(self.current_tick + 1, now_tick - self.wheel_size + 1)
+                due = []
+                for tick in range(start, now_tick + 1):
+                    slot = self.slots[tick % self.wheel_size]
+                    if not slot:
+                        continue
+                    ready = [s for s in slot if s.due_tick <= tick]
+                    if not ready:
+                        continue
+                    slot[:] = [s for s in slot if s.due_tick > tick]
+                    self.scheduled -= len(ready)
+                    for stream in ready:
+                        stream.due_tick = None
+                    due.extend(ready)
+                    self.stats["ticks_processed"] += 1
+                self.current_tick = max(self.current_tick, now_tick)
+                for stream in due:
+                    stream._on_due(now)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"音频调度异常: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "streams": len(self.streams),
+            "scheduled": self.scheduled,
+        }
+
+
+# 进程级共享实例
+audio_scheduler = PacedAudioScheduler()
@@ -19,6 +19,7 @@ class CacheType(Enum):
     CONFIG = "config"
     DEVICE_PROMPT = "device_prompt"
     VOICEPRINT_HEALTH = "voiceprint_health"  # 声纹识别健康检查
+    LLM_RESPONSE = "llm_response"  # 无状态问题的LLM回复
 
 
 @dataclass
@@ -58,5 +59,8 @@ class CacheConfig:
             CacheType.VOICEPRINT_HEALTH: cls(
                 strategy=CacheStrategy.TTL, ttl=600, max_size=100  # 10分钟过期
             ),
+            CacheType.LLM_RESPONSE: cls(
+                strategy=CacheStrategy.TTL_LRU, ttl=600, max_size=2000  # 10分钟
+            ),
         }
         return configs.get(cache_type, cls())
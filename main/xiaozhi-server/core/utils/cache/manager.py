@@ -59,10 +59,13 @@ class GlobalCacheManager:
         value: Any,
         ttl: Optional[float] = None,
         namespace: str = "",
+        config: Optional[CacheConfig] = None,
     ) -> None:
-        """设置缓存值"""
+        """设置缓存值，config为首次创建该缓存空间时使用的配置，默认按缓存类型"""
         cache_name = self._get_cache_name(cache_type, namespace)
-        config = self._configs.get(cache_name) or CacheConfig.for_type(cache_type)
+        config = (
+            self._configs.get(cache_name) or config or CacheConfig.for_type(cache_type)
+        )
         cache = self._get_or_create_cache(cache_name, config)
 
         # 使用配置的TTL或传入的TTL
@@ -161,6 +164,14 @@ class GlobalCacheManager:
         with self._locks[cache_name]:
             self._caches[cache_name].clear()
 
+    def remove(self, cache_type: CacheType, namespace: str = "") -> None:
+        """删除整个缓存空间，用于按命名空间动态创建的缓存"""
+        cache_name = self._get_cache_name(cache_type, namespace)
+        with self._global_lock:
+            self._caches.pop(cache_name, None)
+            self._configs.pop(cache_name, None)
+            self._locks.pop(cache_name, None)
+
     def invalidate_pattern(
         self, cache_type: CacheType, pattern: str, namespace: str = ""
     ) -> int:
@@ -0,0 +1,136 @@
+"""
+连接组件的并发初始化
+TTS、ASR、记忆、意图、工具、声纹等组件的初始化大多是互不依赖的网络请求或CPU计算，
+按依赖关系并发执行，并记录每个组件的就绪状态和耗时，调用方可以只等待自己需要的组件
+"""
+
+import time
+import asyncio
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config.logger import setup_logging
+
+TAG = __name__
+
+
+class _Step:
+    __slots__ = ("name", "func", "depends", "future", "started_at", "elapsed_ms", "error")
+
+    def __init__(self, name: str, func: Callable, depends: Iterable[str]):
+        self.name = name
+        self.func = func
+        self.depends = tuple(depends)
+        self.future: Optional[asyncio.Future] = None
+        self.started_at = 0.0
+        self.elapsed_ms: Optional[float] = None
+        self.error: Optional[BaseException] = None
+
+
+class ComponentInitializer:
+    """按依赖关系并发执行初始化步骤
+
+    协程函数直接在事件循环上执行，普通函数提交到executor执行；
+    某一步失败时记录错误，依赖它的步骤不再执行，其余步骤不受影响
+
+    Args:
+        executor: 执行同步步骤的线程池
+        logger: 日志对象，默认使用模块日志
+    """
+
+    def __init__(self, executor, logger=None):
+        self.executor = executor
+        self.logger = logger if logger is not None else setup_logging()
+        self.steps: Dict[str, _Step] = {}
+        self.started_at = 0.0
+        self.total_ms: Optional[float] = None
+
+    def add(self, name: str, func: Callable, depends: Iterable[str] = ()):
+        """添加初始化步骤，依赖的步骤需先添加"""
+        for dep in depends:
+            if dep not in self.steps:
+                raise ValueError(f"初始化步骤{name}依赖的{dep}不存在")
+        self.steps[name] = _Step(name, func, depends)
+
+    async def run(self) -> Dict[str, Any]:
+        """执行全部步骤，全部结束（成功或失败）后返回耗时统计"""
+        loop = asyncio.get_running_loop()
+        self.started_at = time.monotonic()
+        for step in self.steps.values():
+            step.future = loop.create_future()
+        await asyncio.gather(
+            *(self._run_step(loop, step) for step in self.steps.values())
+        )
+        self.total_ms = (time.monotonic() - self.started_at) * 1000
+        return self.get_stats()
+
+    async def _run_step(self, loop, step: _Step):
+        try:
+            for dep in step.depends:
+                if not await self.steps[dep].future:
+                    raise RuntimeError(f"依赖的{dep}初始化失败")
+            step.started_at = time.monotonic()
+            if asyncio.iscoroutinefunction(step.func):
+                await step.func()
+            else:
+                await loop.run_in_executor(self.executor, step.func)
+            step.elapsed_ms = (time.monotonic() - step.started_at) * 1000
+            step.future.set_result(True)
+        except asyncio.CancelledError:
+            # 初始化被取消（连接关闭），等待方按失败处理
+            step.future.set_result(False)
+            raise
+        except Exception as e:
+            step.error = e
+            self.logger.bind(tag=TAG).error(f"初始化{step.name}失败: {e}")
+            step.future.set_result(False)
+
+    def is_ready(self, name: str) -> bool:
+        step = self.steps.get(name)
+        return (
+            step is not None
+            and step.future is not None
+            and step.future.done()
+            and step.future.result()
+        )
+
+    async def wait(self, names: Iterable[str], timeout: Optional[float] = None) -> bool:
+        """等待指定步骤结束，全部成功返回True；有失败或超时返回False
+
+        未添加的步骤视为已就绪；初始化器尚未开始运行时直接返回False
+        """
+        steps = [self.steps[name] for name in names if name in self.steps]
+        if any(step.future is None for step in steps):
+            return False
+        futures = [step.future for step in steps]
+        if not futures:
+            return True
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(asyncio.shield(f) for f in futures)), timeout
+            )
+        except asyncio.TimeoutError:
+            return False
+        return all(results)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """每个组件的耗时（毫秒），未完成为None"""
+        return {
+            "total_ms": None if self.total_ms is None else round(self.total_ms, 1),
+            "components": {
+                name: None if step.elapsed_ms is None else round(step.elapsed_ms, 1)
+                for name, step in self.steps.items()
+            },
+            "ready_at_ms": {
+                name: round((step.started_at - self.started_at) * 1000 + step.elapsed_ms, 1)
+                for name, step in self.steps.items()
+                if step.elapsed_ms is not None
+            },
+            "failed": [name for name, step in self.steps.items() if step.error is not None],
+        }
+
+    def pending(self) -> List[str]:
+        return [
+            name
+            for name, step in self.steps.items()
+            if step.future is None or not step.future.done()
+        ]
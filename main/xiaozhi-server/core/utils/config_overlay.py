@@ -0,0 +1,69 @@
+"""
+连接级配置覆盖层
+服务配置包含所有供应器的配置段，每个连接深拷贝一份既耗CPU又占内存。
+连接只持有差异化配置覆盖的顶层配置段，其余配置直接读共享的基础配置
+"""
+
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator
+
+_DELETED = object()
+
+
+class ConfigOverlay(MutableMapping):
+    """共享基础配置之上的写时覆盖层
+
+    读取时优先返回覆盖层中的值，否则读基础配置；写入和删除只影响覆盖层。
+    基础配置按约定只读：取出的嵌套配置段是共享对象，需要修改时整段替换，例如
+    config["selected_module"] = {**config["selected_module"], "TTS": "xxx"}
+
+    Args:
+        base: 共享的基础配置
+    """
+
+    __slots__ = ("base", "overrides")
+
+    def __init__(self, base: Mapping):
+        self.base = base
+        self.overrides: Dict[str, Any] = {}
+
+    def __getitem__(self, key):
+        value = self.overrides.get(key, self.base.get(key, _DELETED))
+        if value is _DELETED:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.overrides[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.overrides[key] = _DELETED
+
+    def __contains__(self, key) -> bool:
+        value = self.overrides.get(key, self.base.get(key, _DELETED))
+        return value is not _DELETED
+
+    def __iter__(self) -> Iterator:
+        for key in self.base:
+            if self.overrides.get(key) is not _DELETED:
+                yield key
+        for key, value in self.overrides.items():
+            if key not in self.base and value is not _DELETED:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """合并为普通dict（浅拷贝），用于序列化等需要真正dict的场景"""
+        return {key: self[key] for key in self}
+
+    def __deepcopy__(self, memo):
+        import copy
+
+        return copy.deepcopy(self.to_dict(), memo)
+
+    def __repr__(self) -> str:
+        return f"ConfigOverlay(overrides={list(self.overrides)})"
@@ -1,8 +1,54 @@
 import uuid
 import re
-from typing import List, Dict
+import json
+from typing import List, Dict, Tuple
 from datetime import datetime
 
+# 系统提示词中每轮都可能变化的段落：时间天气等上下文、记忆
+# 这些段落不放在系统提示词里，而是放在最新一条用户消息内容的开头，
+# 让系统提示词和历史对话组成的前缀在各轮之间保持不变，命中上游的前缀缓存；
+# 不另加system消息，要求角色严格交替的模型模板（Gemma、Mistral等）也能接受
+# 只转发最后一条用户消息的智能体平台（Dify、Coze等）由供应器声明不发送这些段落
+VOLATILE_IN_USER = "user"
+VOLATILE_NONE = "none"
+VOLATILE_BLOCK_PATTERN = re.compile(r"<(context|memory)>.*?</\1>", re.DOTALL)
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_TOKEN_OVERHEAD = 4
+# 超出预算后裁剪到预算的比例，留出余量避免每轮都裁剪、改变前缀
+DEFAULT_LOW_WATERMARK = 0.75
+# 模型总结失败时，兜底摘要保留的最大字符数
+DEFAULT_SUMMARY_MAX_CHARS = 600
+
+SUMMARY_SYSTEM_PROMPT = (
+    "你是对话总结助手。请把【已有总结】和【新增对话】合并为一段简洁的中文总结，"
+    "保留用户的身份信息、偏好、提出的问题和尚未完成的事项，以及助手给出的关键结论。"
+    "只输出总结内容，不超过{max_chars}字。"
+)
+
+
+def estimate_tokens(text) -> int:
+    """本地估算文本的token数，不依赖具体模型的分词器
+
+    中文等宽字符约1个token，英文、数字和符号约4个字符1个token
+    """
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = json.dumps(text, ensure_ascii=False)
+    wide = sum(1 for ch in text if ord(ch) > 0x2E7F)
+    return wide + (len(text) - wide + 3) // 4
+
+
+def estimate_messages_tokens(messages: List[Dict]) -> int:
+    """估算渲染后发送给LLM的消息列表的token数"""
+    return sum(
+        MESSAGE_TOKEN_OVERHEAD
+        + estimate_tokens(m.get("content"))
+        + estimate_tokens(m.get("tool_calls"))
+        for m in messages
+    )
+
 
 class Message:
     def __init__(
@@ -18,6 +64,20 @@ class Message:
         self.content = content
         self.tool_calls = tool_calls
         self.tool_call_id = tool_call_id
+        # 渲染后的消息，历史消息不再变化，每轮只渲染新增的消息
+        self.rendered = None
+        self._tokens = None
+
+    @property
+    def tokens(self) -> int:
+        """估算的token数，消息内容不再变化，只计算一次"""
+        if self._tokens is None:
+            self._tokens = (
+                MESSAGE_TOKEN_OVERHEAD
+                + estimate_tokens(self.content)
+                + estimate_tokens(self.tool_calls)
+            )
+        return self._tokens
 
 
 class Dialogue:
@@ -25,30 +85,152 @@ class Dialogue:
         self.dialogue: List[Message] = []
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 系统提示词拆分结果的缓存，提示词或说话人配置变化时重新拆分
+        self._system_key = None
+        self._stable_system = None
+        self._volatile_blocks: List[str] = []
+        # 上一次请求的消息指纹，用于统计前缀稳定率
+        self._last_fingerprints: List[int] = []
+        self._last_stable_len = 0
+        self.prefix_stats = {
+            "requests": 0,
+            "prefix_hits": 0,
+            "reused_messages": 0,
+            "total_messages": 0,
+        }
+        # 对话窗口的token预算，None表示不限制
+        self.token_budget = None
+        self.low_watermark = DEFAULT_LOW_WATERMARK
+        # 被移出窗口的早期对话的滚动总结，以及尚未并入总结的消息
+        self.summary = ""
+        self.pending_evicted: List[Message] = []
+        self.window_stats = {"trims": 0, "evicted_messages": 0, "summaries": 0}
 
     def put(self, message: Message):
         self.dialogue.append(message)
 
     def getMessages(self, m, dialogue):
-        if m.tool_calls is not None:
-            dialogue.append({"role": m.role, "tool_calls": m.tool_calls})
-        elif m.role == "tool":
-            dialogue.append(
-                {
+        if m.rendered is None:
+            if m.tool_calls is not None:
+                m.rendered = {"role": m.role, "tool_calls": m.tool_calls}
+            elif m.role == "tool":
+                # 缺少tool_call_id时只生成一次，保证每轮请求中的内容一致
+                if m.tool_call_id is None:
+                    m.tool_call_id = str(uuid.uuid4())
+                m.rendered = {
                     "role": m.role,
-                    "tool_call_id": (
-                        str(uuid.uuid4()) if m.tool_call_id is None else m.tool_call_id
-                    ),
+                    "tool_call_id": m.tool_call_id,
                     "content": m.content,
                 }
+            else:
+                m.rendered = {"role": m.role, "content": m.content}
+        # 返回副本，部分供应器会直接修改传入的消息
+        dialogue.append(dict(m.rendered))
+
+    def set_token_budget(self, token_budget, low_watermark=DEFAULT_LOW_WATERMARK):
+        """设置对话窗口的token预算，token_budget为空或不大于0时不限制"""
+        self.token_budget = int(token_budget) if token_budget else None
+        if self.token_budget is not None and self.token_budget <= 0:
+            self.token_budget = None
+        self.low_watermark = low_watermark
+
+    def estimate_tokens(self) -> int:
+        """估算当前窗口（系统提示词、总结和对话历史）的token数"""
+        total = sum(m.tokens for m in self.dialogue if m.role != "system")
+        system_message = next(
+            (msg for msg in self.dialogue if msg.role == "system"), None
+        )
+        if system_message:
+            total += MESSAGE_TOKEN_OVERHEAD + estimate_tokens(system_message.content)
+        return total + estimate_tokens(self.summary)
+
+    def trim_to_budget(self) -> List[Message]:
+        """超出token预算时按轮次移出最早的对话，返回被移出的消息
+
+        每轮从用户消息开始，包含该轮中的工具调用和工具结果，整轮移出保证
+        tool_calls和对应的tool消息不被拆开；最新一轮始终保留。
+        一次裁剪到预算的low_watermark比例，避免之后每轮都裁剪、改变提示词前缀。
+        被移出的消息同时累积到pending_evicted，等待并入滚动总结
+        """
+        if self.token_budget is None:
+            return []
+        total = self.estimate_tokens()
+        if total <= self.token_budget:
+            return []
+        target = self.token_budget * self.low_watermark
+        evicted = []
+        while total > target:
+            start = next(
+                (i for i, m in enumerate(self.dialogue) if m.role != "system"), None
             )
-        else:
-            dialogue.append({"role": m.role, "content": m.content})
+            if start is None:
+                break
+            end = next(
+                (
+                    i
+                    for i in range(start + 1, len(self.dialogue))
+                    if self.dialogue[i].role == "user"
+                ),
+                None,
+            )
+            if end is None:
+                break
+            turn = self.dialogue[start:end]
+            del self.dialogue[start:end]
+            evicted.extend(turn)
+            total -= sum(m.tokens for m in turn)
+        if evicted:
+            self.pending_evicted.extend(evicted)
+            self.window_stats["trims"] += 1
+            self.window_stats["evicted_messages"] += len(evicted)
+        return evicted
+
+    def build_summary_prompt(
+        self, messages: List[Message], max_chars=DEFAULT_SUMMARY_MAX_CHARS
+    ):
+        """构造把被移出的消息并入滚动总结的请求，返回(system_prompt, user_prompt)"""
+        lines = []
+        for m in messages:
+            if m.role == "user":
+                lines.append(f"用户：{m.content}")
+            elif m.role == "assistant" and m.content:
+                lines.append(f"助手：{m.content}")
+            elif m.role == "tool":
+                lines.append(f"工具结果：{m.content}")
+        user_prompt = (
+            f"【已有总结】\n{self.summary or '无'}\n\n【新增对话】\n" + "\n".join(lines)
+        )
+        return SUMMARY_SYSTEM_PROMPT.format(max_chars=max_chars), user_prompt
+
+    def fallback_summary(
+        self, messages: List[Message], max_chars=DEFAULT_SUMMARY_MAX_CHARS
+    ) -> str:
+        """模型总结失败时的兜底：保留用户说过的话，超出长度时丢弃最早的内容"""
+        said = [m.content for m in messages if m.role == "user" and m.content]
+        summary = "；".join(filter(None, [self.summary] + said))
+        return summary[-max_chars:]
+
+    def update_summary(self, summary: str):
+        self.summary = (summary or "").strip()
+        self.window_stats["summaries"] += 1
+
+    def has_history(self) -> bool:
+        """最新的用户消息之前是否还有对话，包括已移出窗口的早期对话"""
+        if self.summary or self.pending_evicted:
+            return True
+        return sum(1 for m in self.dialogue if m.role != "system") > 1
+
+    def get_window_stats(self) -> Dict[str, int]:
+        return {
+            **self.window_stats,
+            "messages": len(self.dialogue),
+            "tokens": self.estimate_tokens(),
+            "token_budget": self.token_budget,
+        }
 
     def get_llm_dialogue(self) -> List[Dict[str, str]]:
-        # 直接调用get_llm_dialogue_with_memory，传入None作为memory_str
-        # 这样确保说话人功能在所有调用路径下都生效
-        return self.get_llm_dialogue_with_memory(None, None)
+        # 传入None作为memory_str，这样确保说话人功能在所有调用路径下都生效
+        return self._render(None, None, record=False)
 
     def update_system_message(self, new_content: str):
         """更新或添加系统消息"""
@@ -60,59 +242,169 @@ class Dialogue:
             self.put(Message(role="system", content=new_content))
 
     def get_llm_dialogue_with_memory(
-        self, memory_str: str = None, voiceprint_config: dict = None
+        self,
+        memory_str: str = None,
+        voiceprint_config: dict = None,
+        volatile_context: str = VOLATILE_IN_USER,
+        record: bool = True,
     ) -> List[Dict[str, str]]:
+        """渲染发送给LLM的消息列表
+
+        Args:
+            volatile_context: 上下文和记忆段落的位置，取自供应器的volatile_context属性
+            record: 是否计入前缀复用统计；请求不一定发出（如投机请求）时传False，
+                渲染后用prefix_snapshot记下，确定采用时再调用record_prefix
+        """
+        return self._render(
+            memory_str, voiceprint_config, record=record, volatile_context=volatile_context
+        )
+
+    @staticmethod
+    def _build_speakers_info(speakers) -> str:
+        # 添加说话人个性化描述
+        if not speakers:
+            return ""
+        speakers_info = "\n\n<speakers_info>"
+        for speaker_str in speakers:
+            try:
+                parts = speaker_str.split(",", 2)
+                if len(parts) >= 2:
+                    name = parts[1].strip()
+                    # 如果描述为空，则为""
+                    description = parts[2].strip() if len(parts) >= 3 else ""
+                    speakers_info += f"\n- {name}：{description}"
+            except:
+                pass
+        return speakers_info + "\n\n</speakers_info>"
+
+    def _split_system_prompt(self, content: str, voiceprint_config: dict):
+        """把系统提示词拆为稳定部分和易变段落，结果按提示词内容缓存"""
+        try:
+            speakers = tuple(voiceprint_config.get("speakers", []))
+        except:
+            # 配置读取失败时忽略错误，不影响其他功能
+            speakers = ()
+        key = (content, speakers)
+        if key != self._system_key:
+            self._volatile_blocks = [
+                m.group(0) for m in VOLATILE_BLOCK_PATTERN.finditer(content)
+            ]
+            stable = VOLATILE_BLOCK_PATTERN.sub("", content).rstrip()
+            self._stable_system = stable + self._build_speakers_info(speakers)
+            self._system_key = key
+        return self._stable_system, self._volatile_blocks
+
+    def _render(
+        self, memory_str, voiceprint_config, record: bool, volatile_context=VOLATILE_IN_USER
+    ):
         # 构建对话
         dialogue = []
+        volatile_content = None
 
         # 添加系统提示和记忆
         system_message = next(
             (msg for msg in self.dialogue if msg.role == "system"), None
         )
-
         if system_message:
-            # 基础系统提示
-            enhanced_system_prompt = system_message.content
-            # 替换时间占位符
-            enhanced_system_prompt = enhanced_system_prompt.replace(
-                "{{current_time}}", datetime.now().strftime("%H:%M")
+            stable, blocks = self._split_system_prompt(
+                system_message.content, voiceprint_config
             )
-
-            # 添加说话人个性化描述
-            try:
-                speakers = voiceprint_config.get("speakers", [])
-                if speakers:
-                    enhanced_system_prompt += "\n\n<speakers_info>"
-                    for speaker_str in speakers:
-                        try:
-                            parts = speaker_str.split(",", 2)
-                            if len(parts) >= 2:
-                                name = parts[1].strip()
-                                # 如果描述为空，则为""
-                                description = (
-                                    parts[2].strip() if len(parts) >= 3 else ""
-                                )
-                                enhanced_system_prompt += f"\n- {name}：{description}"
-                        except:
-                            pass
-                    enhanced_system_prompt += "\n\n</speakers_info>"
-            except:
-                # 配置读取失败时忽略错误，不影响其他功能
-                pass
-
-            # 使用正则表达式匹配 <memory> 标签，不管中间有什么内容
-            if memory_str is not None:
-                enhanced_system_prompt = re.sub(
-                    r"<memory>.*?</memory>",
-                    f"<memory>\n{memory_str}\n</memory>",
-                    enhanced_system_prompt,
-                    flags=re.DOTALL,
-                )
-            dialogue.append({"role": "system", "content": enhanced_system_prompt})
+            now = datetime.now().strftime("%H:%M")
+            # 没有上下文段落的提示词仍在原位置替换时间占位符
+            content = stable.replace("{{current_time}}", now)
+            # 滚动总结只在裁剪窗口时变化，放在系统提示词末尾，与历史对话一起作为稳定前缀
+            if self.summary:
+                content += f"\n\n<history_summary>\n{self.summary}\n</history_summary>"
+            dialogue.append({"role": "system", "content": content})
+            volatile = []
+            for block in blocks:
+                if block.startswith("<memory>") and memory_str is not None:
+                    block = f"<memory>\n{memory_str}\n</memory>"
+                volatile.append(block.replace("{{current_time}}", now))
+            if volatile and volatile_context != VOLATILE_NONE:
+                volatile_content = "\n\n".join(volatile)
 
         # 添加用户和助手的对话
+        history_start = len(dialogue)
         for m in self.dialogue:
             if m.role != "system":  # 跳过原始的系统消息
                 self.getMessages(m, dialogue)
 
+        # 易变段落放在最新的用户消息开头，之前的内容各轮保持不变
+        stable_len = len(dialogue)
+        for i in range(len(dialogue) - 1, history_start - 1, -1):
+            if dialogue[i]["role"] == "user":
+                stable_len = i
+                break
+        if volatile_content is not None:
+            if stable_len < len(dialogue):
+                # 渲染结果按消息缓存，复制一份再修改，下一轮该消息作为历史时不带易变段落
+                user_message = dict(dialogue[stable_len])
+                user_message["content"] = self._prepend_text(
+                    volatile_content, user_message.get("content")
+                )
+                dialogue[stable_len] = user_message
+            else:
+                dialogue.append({"role": "user", "content": volatile_content})
+
+        if record:
+            self.record_prefix(self._snapshot(dialogue, stable_len))
         return dialogue
+
+    @staticmethod
+    def _prepend_text(text: str, content):
+        """在消息内容开头加入文本，内容为多模态列表时加在第一个文本片段之前"""
+        if isinstance(content, list):
+            return [{"type": "text", "text": text}] + content
+        if not content:
+            return text
+        return f"{text}\n\n{content}"
+
+    def prefix_snapshot(self, dialogue: List[Dict]) -> Tuple[List[int], int]:
+        """记下渲染结果的消息指纹，供应器可能修改传入的消息，需要在发出请求前调用"""
+        stable_len = next(
+            (i for i in range(len(dialogue) - 1, -1, -1) if dialogue[i]["role"] == "user"),
+            len(dialogue),
+        )
+        return self._snapshot(dialogue, stable_len)
+
+    @staticmethod
+    def _snapshot(dialogue: List[Dict], stable_len: int) -> Tuple[List[int], int]:
+        fingerprints = [
+            hash((m.get("role"), m.get("content"), str(m.get("tool_calls"))))
+            for m in dialogue
+        ]
+        return fingerprints, stable_len
+
+    def record_prefix(self, snapshot: Tuple[List[int], int]):
+        """统计与上一次请求相同的消息前缀，上游的前缀缓存只能复用这一部分
+
+        上一次请求中最新用户消息之前的部分（系统提示词和历史对话）全部被复用时记为命中
+        """
+        fingerprints, stable_len = snapshot
+        previous = self._last_fingerprints
+        if previous:
+            common = 0
+            for a, b in zip(previous, fingerprints):
+                if a != b:
+                    break
+                common += 1
+            self.prefix_stats["requests"] += 1
+            self.prefix_stats["reused_messages"] += common
+            self.prefix_stats["total_messages"] += len(fingerprints)
+            if common >= self._last_stable_len:
+                self.prefix_stats["prefix_hits"] += 1
+        self._last_fingerprints = fingerprints
+        self._last_stable_len = stable_len
+
+    def get_prefix_stats(self) -> Dict[str, float]:
+        stats = self.prefix_stats
+        requests = stats["requests"]
+        total = stats["total_messages"]
+        return {
+            **stats,
+            "prefix_hit_rate": (
+                round(stats["prefix_hits"] / requests, 3) if requests else 0.0
+            ),
+            "reused_ratio": round(stats["reused_messages"] / total, 3) if total else 0.0,
+        }
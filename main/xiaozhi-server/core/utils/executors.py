@@ -0,0 +1,289 @@
+"""
+进程级共享线程池，按QoS等级调度
+连接内的流水线都运行在事件循环上，只有真正阻塞的调用提交到这里：
+- interactive：影响当前对话轮次的调用（LLM流式对话、TTS合成、ASR识别、工具调用等）
+- background：不影响当前轮次的调用（记忆总结、聊天记录上报、归档等）
+
+所有等级共用一组工作线程，每个等级有独立的并发上限和等待队列。空闲线程优先执行interactive任务，
+过载时background任务在队列中等待而不是与实时对话争抢线程；background任务等待超过
+starvation_timeout后会被提升一次，避免一直饿死
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Optional
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+# 调度优先级，靠前的等级优先执行
+QOS_CLASSES = (INTERACTIVE, BACKGROUND)
+
+DEFAULT_MAX_WORKERS = 64
+DEFAULT_CLASS_LIMITS = {INTERACTIVE: 64, BACKGROUND: 8}
+DEFAULT_STARVATION_TIMEOUT_MS = 5000
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "args", "kwargs", "qos", "enqueued_at")
+
+    def __init__(self, future, fn, args, kwargs, qos):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.qos = qos
+        self.enqueued_at = time.monotonic()
+
+
+class QoSExecutor:
+    """按QoS等级调度的共享线程池
+
+    Args:
+        max_workers: 工作线程总数，线程按需创建
+        class_limits: 每个等级同时运行的最大任务数
+        starvation_timeout_ms: 低优先级任务等待超过该时长后优先调度一次
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        class_limits: Optional[Dict[str, int]] = None,
+        starvation_timeout_ms: int = DEFAULT_STARVATION_TIMEOUT_MS,
+    ):
+        self.max_workers = max_workers
+        limits = {**DEFAULT_CLASS_LIMITS, **(class_limits or {})}
+        self.class_limits = {
+            qos: max(1, min(int(limits[qos]), max_workers)) for qos in QOS_CLASSES
+        }
+        self.starvation_timeout = starvation_timeout_ms / 1000
+        self._cond = threading.Condition()
+        self._pending = {qos: deque() for qos in QOS_CLASSES}
+        self._running = {qos: 0 for qos in QOS_CLASSES}
+        self._threads = set()
+        self._idle_workers = 0
+        self._waking_workers = 0
+        self._shutdown = False
+        self._views = {qos: QoSClassExecutor(self, qos) for qos in QOS_CLASSES}
+        self.stats = {
+            qos: {
+                "submitted": 0,
+                "completed": 0,
+                "failed": 0,
+                "max_queued": 0,
+                "wait_total_ms": 0.0,
+                "wait_max_ms": 0.0,
+                "starvation_promotions": 0,
+            }
+            for qos in QOS_CLASSES
+        }
+
+    def executor(self, qos: str = INTERACTIVE) -> "QoSClassExecutor":
+        """获取某个等级的执行器视图，可直接用于loop.run_in_executor"""
+        if qos not in self._views:
+            raise ValueError(f"未知的QoS等级: {qos}")
+        return self._views[qos]
+
+    def submit(self, qos: str, fn: Callable, *args, **kwargs) -> Future:
+        if qos not in self._pending:
+            raise ValueError(f"未知的QoS等级: {qos}")
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("线程池已关闭，不能再提交任务")
+            queue = self._pending[qos]
+            queue.append(_WorkItem(future, fn, args, kwargs, qos))
+            stats = self.stats[qos]
+            stats["submitted"] += 1
+            if len(queue) > stats["max_queued"]:
+                stats["max_queued"] = len(queue)
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        """有可运行任务时唤醒空闲线程，没有空闲线程且未达上限则新建线程，需持有锁调用"""
+        if not self._has_runnable():
+            return
+        # 已被唤醒但还没拿到锁的线程不算空闲，否则连续提交时会少建线程
+        if self._idle_workers > self._waking_workers:
+            self._waking_workers += 1
+            self._cond.notify()
+        elif len(self._threads) < self.max_workers:
+            thread = threading.Thread(
+                target=self._worker,
+                name=f"shared-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.add(thread)
+            thread.start()
+
+    def _has_runnable(self) -> bool:
+        return any(
+            self._pending[qos] and self._running[qos] < self.class_limits[qos]
+            for qos in QOS_CLASSES
+        )
+
+    def _next_item(self) -> Optional[_WorkItem]:
+        """选出下一个任务，需持有锁调用"""
+        now = time.monotonic()
+        # 饥饿保护：低优先级等级的队首任务等待过久时先执行它
+        for qos in QOS_CLASSES[1:]:
+            queue = self._pending[qos]
+            if (
+                queue
+                and self._running[qos] < self.class_limits[qos]
+                and now - queue[0].enqueued_at >= self.starvation_timeout
+            ):
+                self.stats[qos]["starvation_promotions"] += 1
+                return queue.popleft()
+        for qos in QOS_CLASSES:
+            queue = self._pending[qos]
+            if queue and self._running[qos] < self.class_limits[qos]:
+                return queue.popleft()
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                item = self._next_item()
+                while item is None:
+                    if self._shutdown:
+                        self._threads.discard(threading.current_thread())
+                        return
+                    self._idle_workers += 1
+                    self._cond.wait()
+                    self._idle_workers -= 1
+                    if self._waking_workers > 0:
+                        self._waking_workers -= 1
+                    item = self._next_item()
+                self._running[item.qos] += 1
+                wait_ms = (time.monotonic() - item.enqueued_at) * 1000
+                stats = self.stats[item.qos]
+                stats["wait_total_ms"] += wait_ms
+                if wait_ms > stats["wait_max_ms"]:
+                    stats["wait_max_ms"] = wait_ms
+
+            failed = False
+            if item.future.set_running_or_notify_cancel():
+                try:
+                    result = item.fn(*item.args, **item.kwargs)
+                except BaseException as e:
+                    failed = True
+                    item.future.set_exception(e)
+                else:
+                    item.future.set_result(result)
+            self._finish(item.qos, failed)
+            item = None
+
+    def _finish(self, qos: str, failed: bool):
+        with self._cond:
+            self._running[qos] -= 1
+            self.stats[qos]["failed" if failed else "completed"] += 1
+            # 该等级腾出了并发名额，可能有因上限而等待的任务可以执行了
+            self._dispatch()
+
+    def queue_depth(self, qos: Optional[str] = None) -> int:
+        with self._cond:
+            if qos is not None:
+                return len(self._pending[qos])
+            return sum(len(queue) for queue in self._pending.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            classes = {}
+            for qos in QOS_CLASSES:
+                stats = self.stats[qos]
+                started = stats["completed"] + stats["failed"] + self._running[qos]
+                classes[qos] = {
+                    **stats,
+                    "limit": self.class_limits[qos],
+                    "running": self._running[qos],
+                    "queued": len(self._pending[qos]),
+                    "wait_avg_ms": stats["wait_total_ms"] / max(1, started),
+                }
+            return {
+                "max_workers": self.max_workers,
+                "threads": len(self._threads),
+                "idle_threads": self._idle_workers,
+                "classes": classes,
+            }
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._pending.values():
+                    while queue:
+                        queue.popleft().future.cancel()
+            threads = list(self._threads)
+            self._cond.notify_all()
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+class QoSClassExecutor(Executor):
+    """QoSExecutor中某个等级的视图，兼容concurrent.futures.Executor接口"""
+
+    def __init__(self, pool: QoSExecutor, qos: str):
+        self.pool = pool
+        self.qos = qos
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self.pool.submit(self.qos, fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        # 共享线程池由进程统一管理，单个使用方不能关闭
+        pass
+
+    def queue_depth(self) -> int:
+        return self.pool.queue_depth(self.qos)
+
+
+_pool: Optional[QoSExecutor] = None
+_pool_config: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def configure_executors(config: Optional[Dict[str, Any]] = None):
+    """按配置文件的executors段设置共享线程池，需在第一次使用前调用"""
+    global _pool_config
+    _pool_config = dict(config or {})
+
+
+def get_executor_pool() -> QoSExecutor:
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                limits = {
+                    qos: _pool_config[qos]
+                    for qos in QOS_CLASSES
+                    if _pool_config.get(qos)
+                }
+                _pool = QoSExecutor(
+                    max_workers=int(
+                        _pool_config.get("max_workers") or DEFAULT_MAX_WORKERS
+                    ),
+                    class_limits=limits,
+                    starvation_timeout_ms=int(
+                        _pool_config.get("starvation_timeout_ms")
+                        or DEFAULT_STARVATION_TIMEOUT_MS
+                    ),
+                )
+                logger.bind(tag=TAG).info(
+                    f"共享线程池已创建，最大线程数: {_pool.max_workers}，"
+                    f"各等级并发上限: {_pool.class_limits}"
+                )
+    return _pool
+
+
+def get_executor(qos: str = INTERACTIVE) -> QoSClassExecutor:
+    """获取指定QoS等级的共享执行器"""
+    return get_executor_pool().executor(qos)
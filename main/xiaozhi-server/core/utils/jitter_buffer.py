@@ -0,0 +1,151 @@
+"""
+上行音频抖动缓冲
+MQTT网关转发的音频包可能乱序、重复或丢失，按序列号用最小堆重排后再交给ASR
+"""
+
+import heapq
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+# 序列号跳变超过该值视为发送端重新开始计数，而不是迟到或丢包
+SEQUENCE_RESET_THRESHOLD = 100
+# 记住最近输出过的序列号，用于区分重复包和迟到包
+PLAYED_HISTORY_SIZE = 64
+
+
+class JitterBuffer:
+    """按序列号重排的抖动缓冲
+
+    连续到达的包立即输出，不增加延迟；出现序号空洞时最多等待playout_delay_ms，
+    超时仍未补齐则判定丢包，调用on_lost获取补偿帧后继续输出后续包
+
+    Args:
+        playout_delay_ms: 出现空洞时等待乱序包的最长时间（毫秒）
+        max_packets: 缓冲区最多暂存的包数，超出时立即判定空洞丢失
+        on_lost: 丢包补偿钩子，参数为丢失的序列号，返回补偿帧或None
+    """
+
+    def __init__(
+        self,
+        playout_delay_ms: int = 120,
+        max_packets: int = 50,
+        on_lost: Optional[Callable[[int], Optional[Any]]] = None,
+    ):
+        self.playout_delay = playout_delay_ms / 1000
+        self.max_packets = max_packets
+        self.on_lost = on_lost
+        self.heap = []
+        self.pending = set()
+        self.expected_seq = None
+        self.played_history = deque(maxlen=PLAYED_HISTORY_SIZE)
+        self.played_seqs = set()
+        self.stats = {
+            "received": 0,
+            "played": 0,
+            "reordered": 0,
+            "late": 0,
+            "lost": 0,
+            "duplicated": 0,
+            "concealed": 0,
+            "resets": 0,
+            "max_depth": 0,
+        }
+
+    def reset(self):
+        self.heap.clear()
+        self.pending.clear()
+        self.played_history.clear()
+        self.played_seqs.clear()
+        self.expected_seq = None
+
+    def push(self, seq: int, data: Any, now: Optional[float] = None) -> List[Any]:
+        """放入一个音频包，返回可以按序输出的帧列表"""
+        now = time.monotonic() if now is None else now
+        self.stats["received"] += 1
+
+        if self.expected_seq is not None and seq < self.expected_seq:
+            if self.expected_seq - seq > SEQUENCE_RESET_THRESHOLD:
+                # 序号大幅回退，说明发送端重新计数，先输出缓冲中的包再从新序号开始
+                ready = self._flush_all()
+                self.stats["resets"] += 1
+                self.reset()
+                return ready + self.push(seq, data, now)
+            if seq in self.played_seqs:
+                self.stats["duplicated"] += 1
+            else:
+                # 空洞已判定丢失后才到达的包
+                self.stats["late"] += 1
+            return []
+        if seq in self.pending:
+            self.stats["duplicated"] += 1
+            return []
+
+        if self.expected_seq is None:
+            self.expected_seq = seq
+        if seq != self.expected_seq:
+            self.stats["reordered"] += 1
+
+        heapq.heappush(self.heap, (seq, now, data))
+        self.pending.add(seq)
+        if len(self.heap) > self.stats["max_depth"]:
+            self.stats["max_depth"] = len(self.heap)
+        return self.pop_ready(now)
+
+    def pop_ready(self, now: Optional[float] = None) -> List[Any]:
+        """输出所有按序可播放的帧，空洞等待超时的判定为丢包"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        while self.heap:
+            seq, arrival, data = self.heap[0]
+            if seq != self.expected_seq:
+                waited_enough = now - arrival >= self.playout_delay
+                if not waited_enough and len(self.heap) <= self.max_packets:
+                    break
+                self._conceal(self.expected_seq, seq, ready)
+            heapq.heappop(self.heap)
+            self.pending.discard(seq)
+            self._mark_played(seq)
+            ready.append(data)
+            self.stats["played"] += 1
+            self.expected_seq = seq + 1
+        return ready
+
+    def _mark_played(self, seq: int):
+        if len(self.played_history) == self.played_history.maxlen:
+            self.played_seqs.discard(self.played_history[0])
+        self.played_history.append(seq)
+        self.played_seqs.add(seq)
+
+    def next_deadline(self, now: Optional[float] = None) -> Optional[float]:
+        """距离队首空洞超时还有多少秒，没有等待中的空洞时返回None"""
+        if not self.heap or self.heap[0][0] == self.expected_seq:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.heap[0][1] + self.playout_delay - now)
+
+    def _conceal(self, first_missing: int, next_seq: int, ready: List[Any]):
+        if next_seq - first_missing > SEQUENCE_RESET_THRESHOLD:
+            # 序号大幅前跳，按发送端重新计数处理，不做丢包补偿
+            self.stats["resets"] += 1
+            return
+        for missing in range(first_missing, next_seq):
+            self.stats["lost"] += 1
+            if self.on_lost is None:
+                continue
+            frame = self.on_lost(missing)
+            if frame is not None:
+                ready.append(frame)
+                self.stats["concealed"] += 1
+
+    def _flush_all(self) -> List[Any]:
+        ready = []
+        while self.heap:
+            _, _, data = heapq.heappop(self.heap)
+            ready.append(data)
+            self.stats["played"] += 1
+        self.pending.clear()
+        return ready
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "depth": len(self.heap)}
@@ -6,11 +6,18 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, "..", ".."))
 sys.path.insert(0, project_root)
 
+import json
+import time
+import threading
 from config.logger import setup_logging
 import importlib
 
+TAG = __name__
 logger = setup_logging()
 
+# 引用计数归零后仍保留的实例数，超出时释放最久未使用的
+DEFAULT_MAX_IDLE = 32
+
 
 def create_instance(class_name, *args, **kwargs):
     # 创建LLM实例
@@ -21,3 +28,164 @@ def create_instance(class_name, *args, **kwargs):
         return sys.modules[lib_name].LLMProvider(*args, **kwargs)
 
     raise ValueError(f"不支持的LLM类型: {class_name}，请检查该配置的type是否设置正确")
+
+
+def resolve_config(llm_name, llm_section):
+    """返回LLM配置名对应的(type, 配置)
+
+    failover类型在backends中按名称引用其他LLM配置，解析后以backend_configs附带在配置中，
+    后端配置变化时实例注册表的键随之变化
+    """
+    config = llm_section[llm_name]
+    llm_type = config.get("type", llm_name)
+    if llm_type != "failover":
+        return llm_type, config
+    backend_configs = {}
+    for name in config.get("backends") or []:
+        if name not in llm_section:
+            raise ValueError(f"LLM配置{llm_name}的backends中引用了不存在的LLM: {name}")
+        if llm_section[name].get("type", name) == "failover":
+            raise ValueError(f"LLM配置{llm_name}的backends不能再引用failover类型: {name}")
+        backend_configs[name] = llm_section[name]
+    return llm_type, {**config, "backend_configs": backend_configs}
+
+
+class _Entry:
+    __slots__ = ("instance", "refs", "generation", "last_used", "lock")
+
+    def __init__(self, generation):
+        self.instance = None
+        self.refs = 0
+        self.generation = generation
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class LLMInstanceRegistry:
+    """进程内共享的LLM实例注册表
+
+    相同配置的LLM（意图识别、记忆总结、差异化配置的主LLM）只创建一个供应器实例，
+    各连接共用其中的HTTP连接池，避免每个连接都新建客户端、重新握手。
+    实例按引用计数管理，计数归零后保留一部分空闲实例供后续连接复用；
+    配置重载后旧实例不再分配，引用全部释放后丢弃
+
+    Args:
+        max_idle: 引用计数为0时最多保留的实例数
+    """
+
+    def __init__(self, max_idle: int = DEFAULT_MAX_IDLE):
+        self.max_idle = max_idle
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        # id(实例) -> 键，用于按实例释放
+        self._keys = {}
+        self.stats = {"created": 0, "reused": 0, "released": 0, "dropped": 0}
+
+    @staticmethod
+    def make_key(class_name, config):
+        """以类型、地址、模型、密钥区分实例，其余参数（温度、max_tokens等）也参与比较"""
+        base_url = config.get("base_url") or config.get("url")
+        return (
+            class_name,
+            base_url,
+            config.get("model_name"),
+            config.get("api_key"),
+            json.dumps(config, sort_keys=True, ensure_ascii=False, default=str),
+        )
+
+    def acquire(self, class_name, config):
+        """获取配置对应的LLM实例，引用计数加1，不再使用时调用release"""
+        key = (self.generation,) + self.make_key(class_name, config)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(self.generation)
+            entry.refs += 1
+        try:
+            # 同一配置并发获取时只创建一次，不同配置互不阻塞
+            with entry.lock:
+                if entry.instance is None:
+                    entry.instance = create_instance(class_name, config)
+                    with self._lock:
+                        self._keys[id(entry.instance)] = key
+                        self.stats["created"] += 1
+                else:
+                    with self._lock:
+                        self.stats["reused"] += 1
+        except Exception:
+            with self._lock:
+                entry.refs -= 1
+                if entry.refs == 0 and entry.instance is None:
+                    self._entries.pop(key, None)
+            raise
+        return entry.instance
+
+    def release(self, instance):
+        """释放一次引用，不是由注册表创建的实例直接忽略"""
+        with self._lock:
+            key = self._keys.get(id(instance))
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry.instance is not instance or entry.refs <= 0:
+                return
+            entry.refs -= 1
+            entry.last_used = time.monotonic()
+            self.stats["released"] += 1
+            if entry.refs == 0:
+                if entry.generation != self.generation:
+                    self._drop(key)
+                else:
+                    self._trim_idle()
+
+    def invalidate(self):
+        """配置重载后调用：之后按新配置创建实例，旧实例在引用全部释放后丢弃"""
+        with self._lock:
+            self.generation += 1
+            for key, entry in list(self._entries.items()):
+                if entry.refs == 0:
+                    self._drop(key)
+        logger.bind(tag=TAG).info("LLM实例注册表已失效，后续连接将按新配置创建实例")
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        if entry.instance is not None:
+            self._keys.pop(id(entry.instance), None)
+        self.stats["dropped"] += 1
+
+    def _trim_idle(self):
+        idle = [(e.last_used, k) for k, e in self._entries.items() if e.refs == 0]
+        if len(idle) <= self.max_idle:
+            return
+        idle.sort()
+        for _, key in idle[: len(idle) - self.max_idle]:
+            self._drop(key)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "instances": len(self._entries),
+                "in_use": sum(1 for e in self._entries.values() if e.refs > 0),
+                "references": sum(e.refs for e in self._entries.values()),
+                "generation": self.generation,
+            }
+
+
+_registry = LLMInstanceRegistry()
+
+
+def acquire_instance(class_name, config):
+    """从进程内注册表获取共享的LLM实例"""
+    return _registry.acquire(class_name, config)
+
+
+def release_instance(instance):
+    _registry.release(instance)
+
+
+def invalidate_instances():
+    _registry.invalidate()
+
+
+def get_registry_stats():
+    return _registry.get_stats()
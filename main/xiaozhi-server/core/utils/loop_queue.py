@@ -0,0 +1,52 @@
+"""
+事件循环任务队列
+连接内的流水线以asyncio任务消费队列，生产者可以在事件循环上，也可以在线程池线程中
+"""
+
+import queue
+import asyncio
+import threading
+from typing import Any, Optional
+
+
+class LoopQueue:
+    """绑定到事件循环的队列
+
+    消费方在事件循环上await get()；put()可在任意线程调用，非事件循环线程会通过
+    call_soon_threadsafe投递。get_nowait()在队列为空时抛出queue.Empty，与queue.Queue保持一致
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._queue = asyncio.Queue()
+        self._loop = None
+        self._loop_thread_id = None
+        if loop is not None:
+            self.bind(loop)
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """绑定消费方所在的事件循环，需在该事件循环线程中调用"""
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+
+    def put(self, item: Any):
+        if self._loop is None or threading.get_ident() == self._loop_thread_id:
+            self._queue.put_nowait(item)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    put_nowait = put
+
+    async def get(self) -> Any:
+        return await self._queue.get()
+
+    def get_nowait(self) -> Any:
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            raise queue.Empty
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
@@ -36,15 +36,9 @@ def initialize_modules(
     # 初始化LLM模块
     if init_llm:
         select_llm_module = config["selected_module"]["LLM"]
-        llm_type = (
-            select_llm_module
-            if "type" not in config["LLM"][select_llm_module]
-            else config["LLM"][select_llm_module]["type"]
-        )
-        modules["llm"] = llm.create_instance(
-            llm_type,
-            config["LLM"][select_llm_module],
-        )
+        llm_type, llm_config = llm.resolve_config(select_llm_module, config["LLM"])
+        # 相同配置的LLM实例在进程内共享
+        modules["llm"] = llm.acquire_instance(llm_type, llm_config)
         logger.bind(tag=TAG).info(f"初始化组件: llm成功 {select_llm_module}")
 
     # 初始化Intent模块
@@ -0,0 +1,84 @@
+"""
+MQTT网关音频包的二进制帧格式
+16字节头部：[0]类型 [1]保留 [2:4]负载长度 [4:8]序列号 [8:12]时间戳 [12:16]opus长度，均为大端
+"""
+
+import struct
+from typing import Optional, Tuple, Union
+
+HEADER = struct.Struct(">BxHIII")
+HEADER_SIZE = HEADER.size
+# 多帧合并负载中每帧的长度前缀
+FRAME_LENGTH = struct.Struct(">H")
+
+# 单帧opus包
+PACKET_TYPE_AUDIO = 1
+# 多帧合并包，负载为若干个2字节长度前缀的opus帧
+PACKET_TYPE_AUDIO_BATCH = 2
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+def pack_packet(
+    payload: BytesLike,
+    timestamp: int,
+    sequence: int,
+    packet_type: int = PACKET_TYPE_AUDIO,
+) -> bytearray:
+    """组包：头部用pack_into直接写入，负载只拷贝一次，整个包只分配一次内存
+
+    复用同一块缓冲区返回memoryview的方式在CPython下反而更慢（见performance_tester_mqtt_framing）
+    """
+    size = len(payload)
+    packet = bytearray(HEADER_SIZE + size)
+    HEADER.pack_into(packet, 0, packet_type, size, sequence, timestamp, size)
+    packet[HEADER_SIZE:] = payload
+    return packet
+
+
+def _write_frames(buffer: bytearray, offset: int, frames) -> None:
+    for frame in frames:
+        FRAME_LENGTH.pack_into(buffer, offset, len(frame))
+        offset += FRAME_LENGTH.size
+        buffer[offset : offset + len(frame)] = frame
+        offset += len(frame)
+
+
+def _frames_size(frames) -> int:
+    return sum(len(frame) for frame in frames) + FRAME_LENGTH.size * len(frames)
+
+
+def pack_frames(frames) -> bytearray:
+    """多帧合并负载：每个opus帧前加2字节大端长度，依次拼接"""
+    packed = bytearray(_frames_size(frames))
+    _write_frames(packed, 0, frames)
+    return packed
+
+
+def pack_batch_packet(frames, timestamp: int, sequence: int) -> bytearray:
+    """组多帧合并包，头部和各帧直接写入同一块缓冲区"""
+    size = _frames_size(frames)
+    packet = bytearray(HEADER_SIZE + size)
+    HEADER.pack_into(
+        packet, 0, PACKET_TYPE_AUDIO_BATCH, size, sequence, timestamp, size
+    )
+    _write_frames(packet, HEADER_SIZE, frames)
+    return packet
+
+
+def parse_header(message: BytesLike) -> Optional[Tuple[int, int, int, int, int]]:
+    """原地解析数据包头部，不切片、不拷贝负载
+
+    Returns:
+        (packet_type, sequence, timestamp, audio_length, payload_end)，
+        负载位于message[HEADER_SIZE:payload_end]；opus长度字段无效时payload_end为消息末尾，
+        长度不足头部时返回None
+    """
+    if len(message) < HEADER_SIZE:
+        return None
+    packet_type, _, sequence, timestamp, audio_length = HEADER.unpack_from(message, 0)
+    if 0 < audio_length <= len(message) - HEADER_SIZE:
+        payload_end = HEADER_SIZE + audio_length
+    else:
+        payload_end = len(message)
+    return packet_type, sequence, timestamp, audio_length, payload_end
@@ -0,0 +1,113 @@
+"""
+Opus编解码器对象池
+进程内按(采样率, 通道数, 应用模式)复用编码器和解码器，借出时重置状态
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+import opuslib_next
+
+# 每个key最多缓存的空闲实例数，超出的实例直接丢弃交给垃圾回收
+DEFAULT_MAX_IDLE_PER_KEY = 16
+
+
+class OpusCodecPool:
+    """线程安全的Opus编解码器池
+
+    编码器和解码器都持有上一帧的预测状态，借出前调用reset_state()，
+    保证复用的实例与新建实例的输出一致
+    """
+
+    def __init__(self, max_idle_per_key: int = DEFAULT_MAX_IDLE_PER_KEY):
+        self.max_idle_per_key = max_idle_per_key
+        self._idle: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "encoder_created": 0,
+            "encoder_reused": 0,
+            "decoder_created": 0,
+            "decoder_reused": 0,
+            "in_use": 0,
+            "discarded": 0,
+        }
+
+    def _checkout(self, key: Tuple, factory) -> Any:
+        kind = key[0]
+        with self._lock:
+            idle = self._idle.get(key)
+            codec = idle.pop() if idle else None
+            self.stats["in_use"] += 1
+            self.stats[f"{kind}_reused" if codec else f"{kind}_created"] += 1
+        if codec is None:
+            return factory()
+        codec.reset_state()
+        return codec
+
+    def _checkin(self, key: Tuple, codec: Any):
+        with self._lock:
+            self.stats["in_use"] -= 1
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(codec)
+            else:
+                self.stats["discarded"] += 1
+
+    @contextmanager
+    def encoder(
+        self,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        application: int = opuslib_next.APPLICATION_AUDIO,
+    ):
+        """借出一个编码器，退出with块时自动归还"""
+        key = ("encoder", sample_rate, channels, application)
+        codec = self._checkout(
+            key, lambda: opuslib_next.Encoder(sample_rate, channels, application)
+        )
+        try:
+            yield codec
+        finally:
+            self._checkin(key, codec)
+
+    @contextmanager
+    def decoder(self, sample_rate: int = 16000, channels: int = 1):
+        """借出一个解码器，退出with块时自动归还"""
+        key = ("decoder", sample_rate, channels, None)
+        codec = self._checkout(
+            key, lambda: opuslib_next.Decoder(sample_rate, channels)
+        )
+        try:
+            yield codec
+        finally:
+            self._checkin(key, codec)
+
+    @staticmethod
+    def _reuse_rate(created: int, reused: int) -> float:
+        total = created + reused
+        return reused / total if total else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["idle"] = sum(len(idle) for idle in self._idle.values())
+        stats["encoder_reuse_rate"] = self._reuse_rate(
+            stats["encoder_created"], stats["encoder_reused"]
+        )
+        stats["decoder_reuse_rate"] = self._reuse_rate(
+            stats["decoder_created"], stats["decoder_reused"]
+        )
+        return stats
+
+    def clear(self, key: Optional[Tuple] = None):
+        """清空空闲实例，key为None时清空全部"""
+        with self._lock:
+            if key is None:
+                self._idle.clear()
+            else:
+                self._idle.pop(key, None)
+
+
+# 进程级共享实例
+opus_codec_pool = OpusCodecPool()
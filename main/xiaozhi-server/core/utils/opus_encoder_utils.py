@@ -3,17 +3,61 @@ Opus编码工具类
 将PCM音频数据编码为Opus格式
 """
 
+import ctypes
 import logging
 import traceback
-import numpy as np
+import opuslib_next
 from opuslib_next import Encoder
 from opuslib_next import constants
+from opuslib_next.api import encoder as opus_api_encoder
 from typing import Optional, Callable, Any
 
-class OpusEncoderUtils:
-    """PCM到Opus的编码器"""
+# 编码档位：复杂度越高音质越好，CPU占用也越高
+# quality与原先固定参数一致；CPU紧张的部署可切换到balanced或low_cpu
+ENCODER_PROFILES = {
+    "quality": {"complexity": 10, "bitrate": 24000},
+    "balanced": {"complexity": 5, "bitrate": 24000},
+    "low_cpu": {"complexity": 2, "bitrate": 16000},
+}
+DEFAULT_PROFILE = "quality"
+_default_profile = DEFAULT_PROFILE
+
+# 单个Opus包的最大字节数（RFC 6716）
+MAX_PACKET_SIZE = 1275
+
+
+def set_default_profile(profile: Optional[str]) -> str:
+    """设置进程内默认编码档位，未知档位回退为quality"""
+    global _default_profile
+    if not profile:
+        profile = DEFAULT_PROFILE
+    if profile not in ENCODER_PROFILES:
+        logging.warning(f"未知的Opus编码档位: {profile}，使用{DEFAULT_PROFILE}")
+        profile = DEFAULT_PROFILE
+    _default_profile = profile
+    return profile
+
 
-    def __init__(self, sample_rate: int, channels: int, frame_size_ms: int):
+def get_default_profile() -> str:
+    return _default_profile
+
+
+class OpusEncoderUtils:
+    """PCM到Opus的编码器
+
+    不足一帧的尾部样本暂存在预分配的缓冲区中，完整帧直接从输入数据的内存地址编码，
+    整个过程不再拼接或复制PCM缓冲区
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int,
+        frame_size_ms: int,
+        profile: Optional[str] = None,
+        complexity: Optional[int] = None,
+        bitrate: Optional[int] = None,
+    ):
         """
         初始化Opus编码器
 
@@ -21,6 +65,9 @@ class OpusEncoderUtils:
             sample_rate: 采样率 (Hz)
             channels: 通道数 (1=单声道, 2=立体声)
             frame_size_ms: 帧大小 (毫秒)
+            profile: 编码档位，默认使用进程内默认档位
+            complexity: 覆盖档位中的复杂度
+            bitrate: 覆盖档位中的比特率
         """
         self.sample_rate = sample_rate
         self.channels = channels
@@ -29,13 +76,24 @@ class OpusEncoderUtils:
         self.frame_size = (sample_rate * frame_size_ms) // 1000
         # 总帧大小 = 每帧样本数 * 通道数
         self.total_frame_size = self.frame_size * channels
+        # 每帧字节数（16位PCM）
+        self.frame_bytes = self.total_frame_size * 2
 
         # 比特率和复杂度设置
-        self.bitrate = 24000  # bps
-        self.complexity = 10  # 最高质量
-
-        # 缓冲区初始化为空
-        self.buffer = np.array([], dtype=np.int16)
+        self.profile = profile or get_default_profile()
+        settings = ENCODER_PROFILES.get(self.profile, ENCODER_PROFILES[DEFAULT_PROFILE])
+        self.bitrate = bitrate if bitrate is not None else settings["bitrate"]
+        self.complexity = complexity if complexity is not None else settings["complexity"]
+
+        # 预分配的半帧缓冲区及其固定地址
+        self._pending = bytearray(self.frame_bytes)
+        self._pending_view = (ctypes.c_char * self.frame_bytes).from_buffer(
+            self._pending
+        )
+        self._pending_address = ctypes.addressof(self._pending_view)
+        self._pending_len = 0
+        # 预分配的输出缓冲区
+        self._packet = (ctypes.c_char * MAX_PACKET_SIZE)()
 
         try:
             # 创建Opus编码器
@@ -52,7 +110,7 @@ class OpusEncoderUtils:
     def reset_state(self):
         """重置编码器状态"""
         self.encoder.reset_state()
-        self.buffer = np.array([], dtype=np.int16)
+        self._pending_len = 0
 
     def encode_pcm_to_opus_stream(self, pcm_data: bytes, end_of_stream: bool, callback: Callable[[Any], Any]):
         """
@@ -66,67 +124,70 @@ class OpusEncoderUtils:
         Returns:
             Opus数据包列表
         """
-        # 将字节数据转换为short数组
-        new_samples = self._convert_bytes_to_shorts(pcm_data)
-
-        # 校验PCM数据
-        self._validate_pcm_data(new_samples)
-
-        # 将新数据追加到缓冲区
-        self.buffer = np.append(self.buffer, new_samples)
-
+        if not isinstance(pcm_data, bytes):
+            pcm_data = bytes(pcm_data)
+        data_len = len(pcm_data)
+        # bytes对象内部缓冲区的地址，按偏移量直接编码，无需切片复制
+        base_address = ctypes.cast(ctypes.c_char_p(pcm_data), ctypes.c_void_p).value
         offset = 0
 
+        # 先补齐上次遗留的半帧
+        if self._pending_len > 0:
+            need = self.frame_bytes - self._pending_len
+            take = min(need, data_len)
+            self._pending[self._pending_len : self._pending_len + take] = memoryview(
+                pcm_data
+            )[:take]
+            self._pending_len += take
+            offset = take
+            if self._pending_len == self.frame_bytes:
+                self._emit(self._pending_address, callback)
+                self._pending_len = 0
+
         # 处理所有完整帧
-        while offset <= len(self.buffer) - self.total_frame_size:
-            frame = self.buffer[offset : offset + self.total_frame_size]
-            output = self._encode(frame)
-            if output:
-                callback(output)
-            offset += self.total_frame_size
+        while data_len - offset >= self.frame_bytes:
+            self._emit(base_address + offset, callback)
+            offset += self.frame_bytes
 
         # 保留未处理的样本
-        self.buffer = self.buffer[offset:]
+        remaining = data_len - offset
+        if remaining > 0:
+            self._pending[:remaining] = memoryview(pcm_data)[offset:]
+            self._pending_len = remaining
 
         # 流结束时处理剩余数据
-        if end_of_stream and len(self.buffer) > 0:
-            # 创建最后一帧并用0填充
-            last_frame = np.zeros(self.total_frame_size, dtype=np.int16)
-            last_frame[: len(self.buffer)] = self.buffer
-
-            output = self._encode(last_frame)
-            if output:
-                callback(output)
-            self.buffer = np.array([], dtype=np.int16)
-
-    def _encode(self, frame: np.ndarray) -> Optional[bytes]:
-        """编码一帧音频数据"""
+        if end_of_stream and self._pending_len > 0:
+            # 最后一帧用0填充
+            self._pending[self._pending_len :] = bytes(
+                self.frame_bytes - self._pending_len
+            )
+            self._emit(self._pending_address, callback)
+            self._pending_len = 0
+
+    def _emit(self, address: int, callback: Callable[[Any], Any]):
+        output = self._encode(address)
+        if output:
+            callback(output)
+
+    def _encode(self, address: int) -> Optional[bytes]:
+        """编码一帧音频数据，address为该帧PCM数据的起始地址"""
         try:
-            # 将numpy数组转换为bytes
-            frame_bytes = frame.tobytes()
-            # opuslib要求输入字节数必须是channels*2的倍数
-            encoded = self.encoder.encode(frame_bytes, self.frame_size)
-            return encoded
+            result = opus_api_encoder.libopus_encode(
+                self.encoder.encoder_state,
+                ctypes.cast(address, opuslib_next.api.c_int16_pointer),
+                self.frame_size,
+                self._packet,
+                MAX_PACKET_SIZE,
+            )
+            if result < 0:
+                raise opuslib_next.OpusError(result)
+            return ctypes.string_at(self._packet, result)
         except Exception as e:
             logging.error(f"Opus编码失败: {e}")
             traceback.print_exc()
             return None
 
-    def _convert_bytes_to_shorts(self, bytes_data: bytes) -> np.ndarray:
-        """将字节数组转换为short数组 (16位PCM)"""
-        # 假设输入是小端字节序的16位PCM
-        return np.frombuffer(bytes_data, dtype=np.int16)
-
-    def _validate_pcm_data(self, pcm_shorts: np.ndarray) -> None:
-        """验证PCM数据是否有效"""
-        # 16位PCM数据范围是 -32768 到 32767
-        if np.any((pcm_shorts < -32768) | (pcm_shorts > 32767)):
-            invalid_samples = pcm_shorts[(pcm_shorts < -32768) | (pcm_shorts > 32767)]
-            logging.warning(f"发现无效PCM样本: {invalid_samples[:5]}...")
-            # 在实际应用中可以选择裁剪而不是抛出异常
-            # np.clip(pcm_shorts, -32768, 32767, out=pcm_shorts)
-
     def close(self):
         """关闭编码器并释放资源"""
         # opuslib没有明确的关闭方法，Python的垃圾回收会处理
-        pass
\ No newline at end of file
+        pass
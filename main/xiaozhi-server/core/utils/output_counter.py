@@ -1,10 +1,51 @@
 import datetime
-from typing import Dict, Tuple
+import threading
+from typing import Dict
 
-# 全局字典，用于存储每个设备的每日输出字数
-_device_daily_output: Dict[Tuple[str, datetime.date], int] = {}
-# 记录最后一次检查的日期
-_last_check_date: datetime.date = None
+
+class DeviceOutputCounter:
+    """每个设备每日输出字数的计数器，日期变化时自动清零
+
+    单进程时直接使用本地实例；多进程模式下由主进程在Manager进程中创建一个实例，
+    各工作进程通过代理访问，保证同一设备的限额在所有工作进程间一致
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._date: datetime.date = None
+        self._lock = threading.Lock()
+
+    def _roll_date(self):
+        current_date = datetime.datetime.now().date()
+        if self._date != current_date:
+            self._counts.clear()
+            self._date = current_date
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def get(self, device_id: str) -> int:
+        with self._lock:
+            self._roll_date()
+            return self._counts.get(device_id, 0)
+
+    def add(self, device_id: str, char_count: int) -> int:
+        with self._lock:
+            self._roll_date()
+            count = self._counts.get(device_id, 0) + char_count
+            self._counts[device_id] = count
+            return count
+
+
+# 当前进程使用的计数器，多进程模式下会被替换为共享计数器的代理
+_counter = DeviceOutputCounter()
+
+
+def use_counter(counter):
+    """替换当前进程使用的计数器（多进程模式下传入共享计数器的代理）"""
+    global _counter
+    _counter = counter
 
 
 def reset_device_output():
@@ -12,31 +53,21 @@ def reset_device_output():
     重置所有设备的每日输出字数
     每天0点调用此函数
     """
-    _device_daily_output.clear()
+    _counter.reset()
 
 
 def get_device_output(device_id: str) -> int:
     """
     获取设备当日的输出字数
     """
-    current_date = datetime.datetime.now().date()
-    return _device_daily_output.get((device_id, current_date), 0)
+    return _counter.get(device_id)
 
 
 def add_device_output(device_id: str, char_count: int):
     """
     增加设备的输出字数
     """
-    current_date = datetime.datetime.now().date()
-    global _last_check_date
-
-    # 如果是第一次调用或者日期发生变化，清空计数器
-    if _last_check_date is None or _last_check_date != current_date:
-        _device_daily_output.clear()
-        _last_check_date = current_date
-
-    current_count = _device_daily_output.get((device_id, current_date), 0)
-    _device_daily_output[(device_id, current_date)] = current_count + char_count
+    _counter.add(device_id, char_count)
 
 
 def check_device_output_limit(device_id: str, max_output_size: int) -> bool:
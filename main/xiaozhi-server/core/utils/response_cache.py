@@ -0,0 +1,292 @@
+"""
+无状态问题的LLM回复缓存
+大量设备反复询问相同的无状态问题（讲个笑话、你是谁、音量调大），每次都是一次完整的LLM请求。
+开启后按「归一化问题 + 角色提示词 + LLM + 可用工具」缓存纯文本回复，命中时直接送TTS：
+- 精确匹配：归一化后的问题完全相同，存放在全局缓存管理器中，按TTL和LRU淘汰
+- 相似匹配（可选）：问题的字符n-gram向量余弦相似度超过阈值时复用最相近问题的回复
+只缓存没有调用工具的回复；包含时间等易变内容的问题可按关键词设置更短的TTL或不缓存，
+依赖上下文的追问（再讲一个、刚才说的）和指定角色不缓存。
+回复可能依赖之前的对话，只有会话的第一个问题，或在stateless_queries中列出的问题才使用缓存；
+回复可能用到设备的记忆或说话人信息时，缓存只在该设备内复用。
+每个上下文最多缓存max_entries个问题，上下文数超过max_contexts时整体淘汰最久未用的上下文
+"""
+
+import re
+import uuid
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.logger import setup_logging
+from core.utils.cache.config import CacheConfig
+from core.utils.cache.manager import cache_manager, CacheType
+from core.utils.cache.strategies import CacheStrategy
+from core.utils.dialogue import VOLATILE_BLOCK_PATTERN
+from core.utils.textUtils import normalize_text
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_TTL = 600
+DEFAULT_MAX_ENTRIES = 2000
+# 按设备区分的上下文会随设备数增长，最多保留的上下文数
+DEFAULT_MAX_CONTEXTS = 1000
+DEFAULT_MAX_QUERY_CHARS = 30
+# 字符n-gram向量的维度，问题很短，哈希冲突对相似度的影响可以忽略
+VECTOR_DIM = 512
+DEFAULT_EXCLUDE_KEYWORDS = ("再", "刚才", "上一个", "继续", "还有呢", "为什么")
+# 相似匹配最多核对的候选问题数
+MAX_SIMILAR_CANDIDATES = 8
+# 数字不同的问题（第3集、调到50）字面上很相似但回复不同，相似匹配要求其中的数字完全一致
+NUMBER_PATTERN = re.compile(r"[0-9零一二两三四五六七八九十百千万亿]+")
+
+
+def embed_text(text: str) -> np.ndarray:
+    """把归一化后的问题转为归一化的字符unigram+bigram哈希向量，在本地计算，不依赖模型"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    grams = list(text) + [text[i : i + 2] for i in range(len(text) - 1)]
+    for gram in grams:
+        vector[zlib.crc32(gram.encode("utf-8")) % VECTOR_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _VectorIndex:
+    """一个上下文下问题向量的索引，向量按槽位存放在预分配的矩阵中，增删不重建矩阵"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.slots: "OrderedDict[str, int]" = OrderedDict()
+        self.keys: List[Optional[str]] = []
+        self.numbers: List[Optional[List[str]]] = []
+        self.free: List[int] = []
+        self.matrix = np.zeros((16, VECTOR_DIM), dtype=np.float32)
+
+    def add(self, key: str, vector: np.ndarray):
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            if len(self.slots) >= self.max_entries:
+                _, slot = self.slots.popitem(last=False)
+            elif self.free:
+                slot = self.free.pop()
+            else:
+                slot = len(self.keys)
+                self.keys.append(None)
+                self.numbers.append(None)
+                if slot >= len(self.matrix):
+                    grown = np.zeros((len(self.matrix) * 2, VECTOR_DIM), np.float32)
+                    grown[: len(self.matrix)] = self.matrix
+                    self.matrix = grown
+        self.keys[slot] = key
+        self.numbers[slot] = NUMBER_PATTERN.findall(key)
+        self.matrix[slot] = vector
+        self.slots[key] = slot
+
+    def remove(self, key: str):
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            self.keys[slot] = None
+            self.numbers[slot] = None
+            self.matrix[slot] = 0
+            self.free.append(slot)
+
+    def search(self, key: str, vector: np.ndarray, threshold: float) -> Optional[str]:
+        """返回相似度不低于阈值且数字一致的最相似问题"""
+        scores = self.matrix[: len(self.keys)] @ vector
+        candidates = np.flatnonzero(scores >= threshold)
+        if len(candidates) > MAX_SIMILAR_CANDIDATES:
+            top = np.argpartition(scores[candidates], -MAX_SIMILAR_CANDIDATES)
+            candidates = candidates[top[-MAX_SIMILAR_CANDIDATES:]]
+        numbers = NUMBER_PATTERN.findall(key)
+        for slot in candidates[np.argsort(scores[candidates])[::-1]]:
+            if self.keys[slot] is not None and self.numbers[slot] == numbers:
+                return self.keys[slot]
+        return None
+
+
+class ResponseCache:
+    """进程内的LLM回复缓存
+
+    Args:
+        config: response_cache配置，包括enabled、ttl、ttl_rules、max_entries、
+            max_contexts、similarity_threshold、max_query_chars、exclude_keywords、exclude_roles、
+            stateless_queries
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.enabled = bool(config.get("enabled", False))
+        self.ttl = float(config.get("ttl") or DEFAULT_TTL)
+        # [{"keywords": [...], "ttl": 秒}]，ttl为0表示不缓存
+        self.ttl_rules: List[Tuple[Tuple[str, ...], float]] = [
+            (tuple(rule.get("keywords") or ()), float(rule.get("ttl") or 0))
+            for rule in config.get("ttl_rules") or []
+        ]
+        self.max_entries = int(config.get("max_entries") or DEFAULT_MAX_ENTRIES)
+        self.max_contexts = int(config.get("max_contexts") or DEFAULT_MAX_CONTEXTS)
+        # 精确匹配的条目按上下文分别存放，每个上下文的条目数上限为max_entries
+        self._store_config = CacheConfig(
+            strategy=CacheStrategy.TTL_LRU, ttl=self.ttl, max_size=self.max_entries
+        )
+        self.similarity_threshold = float(config.get("similarity_threshold") or 0)
+        self.max_query_chars = int(
+            config.get("max_query_chars") or DEFAULT_MAX_QUERY_CHARS
+        )
+        exclude_keywords = config.get("exclude_keywords")
+        self.exclude_keywords = tuple(
+            DEFAULT_EXCLUDE_KEYWORDS if exclude_keywords is None else exclude_keywords
+        )
+        # 角色提示词中包含这些内容时不缓存，如依赖用户个人信息回答的角色
+        self.exclude_roles = tuple(config.get("exclude_roles") or ())
+        # 与之前的对话无关的问题，会话中途提出也可以使用缓存
+        self.stateless_queries = frozenset(
+            filter(None, map(normalize_text, config.get("stateless_queries") or ()))
+        )
+        # 服务配置更新后重新创建缓存，旧实例由close删除已写入的条目
+        self.generation = uuid.uuid4().hex[:8]
+        # 已写入过回复的上下文，按最近使用排序
+        self._contexts: "OrderedDict[str, None]" = OrderedDict()
+        # 相似匹配的向量索引，按上下文分组，与精确匹配的缓存条目一一对应
+        self._index: Dict[str, _VectorIndex] = {}
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "exact_hits": 0, "similar_hits": 0, "stores": 0}
+
+    def context_key(
+        self,
+        prompt: str,
+        llm_name: str,
+        functions: Optional[Iterable],
+        device_id: Optional[str] = None,
+    ) -> str:
+        """回复所依赖的上下文：角色提示词（不含时间、记忆等易变段落）、LLM和可用工具
+
+        回复可能用到设备的记忆或说话人信息时传入device_id，缓存只在该设备内复用
+        """
+        stable_prompt = VOLATILE_BLOCK_PATTERN.sub("", prompt or "")
+        tool_names = sorted(
+            (f.get("function") or {}).get("name", "") for f in (functions or ())
+        )
+        raw = "\n".join(
+            [stable_prompt, llm_name or "", ",".join(tool_names), device_id or ""]
+        )
+        return f"{self.generation}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+    def cacheable(
+        self, query: str, prompt: str, has_history: bool = False
+    ) -> Optional[str]:
+        """问题可以使用缓存时返回归一化后的问题，否则返回None
+
+        has_history表示问题之前还有对话，此时只有stateless_queries中的问题可以使用缓存
+        """
+        if not self.enabled or not query:
+            return None
+        normalized = normalize_text(query)
+        if not normalized or len(normalized) > self.max_query_chars:
+            return None
+        if has_history and normalized not in self.stateless_queries:
+            return None
+        if any(keyword in normalized for keyword in self.exclude_keywords):
+            return None
+        if prompt and any(role in prompt for role in self.exclude_roles):
+            return None
+        if self._ttl_for(normalized) <= 0:
+            return None
+        return normalized
+
+    def _ttl_for(self, normalized: str) -> float:
+        for keywords, ttl in self.ttl_rules:
+            if any(keyword in normalized for keyword in keywords):
+                return ttl
+        return self.ttl
+
+    def get(self, context: str, normalized: str) -> Optional[str]:
+        """查找缓存的回复，先精确匹配，再按相似度匹配"""
+        self.stats["lookups"] += 1
+        response = cache_manager.get(CacheType.LLM_RESPONSE, normalized, context)
+        if response is not None:
+            self.stats["exact_hits"] += 1
+            self._touch(context)
+            return response
+        if self.similarity_threshold <= 0:
+            return None
+        match = self._most_similar(context, normalized)
+        if match is None:
+            return None
+        response = cache_manager.get(CacheType.LLM_RESPONSE, match, context)
+        if response is None:
+            # 精确匹配的条目已过期或被淘汰，同步移出向量索引
+            with self._lock:
+                self._index[context].remove(match)
+            return None
+        self.stats["similar_hits"] += 1
+        self._touch(context)
+        logger.bind(tag=TAG).debug(f"相似问题命中回复缓存: {normalized} -> {match}")
+        return response
+
+    def _most_similar(self, context: str, normalized: str) -> Optional[str]:
+        vector = embed_text(normalized)
+        with self._lock:
+            index = self._index.get(context)
+            if index is None:
+                return None
+            return index.search(normalized, vector, self.similarity_threshold)
+
+    def put(self, context: str, normalized: str, response: str):
+        if not self.enabled or not response or not response.strip():
+            return
+        cache_manager.set(
+            CacheType.LLM_RESPONSE,
+            normalized,
+            response,
+            ttl=self._ttl_for(normalized),
+            namespace=context,
+            config=self._store_config,
+        )
+        self.stats["stores"] += 1
+        self._touch(context, added=True)
+        if self.similarity_threshold <= 0:
+            return
+        vector = embed_text(normalized)
+        with self._lock:
+            index = self._index.get(context)
+            if index is None:
+                index = self._index[context] = _VectorIndex(self.max_entries)
+            index.add(normalized, vector)
+
+    def _touch(self, context: str, added: bool = False):
+        """更新上下文的使用顺序，超过max_contexts时删除最久未用的上下文及其向量索引"""
+        with self._lock:
+            if context in self._contexts:
+                self._contexts.move_to_end(context)
+            elif added:
+                self._contexts[context] = None
+            evicted = []
+            while len(self._contexts) > self.max_contexts:
+                oldest, _ = self._contexts.popitem(last=False)
+                self._index.pop(oldest, None)
+                evicted.append(oldest)
+        for oldest in evicted:
+            cache_manager.remove(CacheType.LLM_RESPONSE, oldest)
+
+    def close(self):
+        """服务配置更新后丢弃本实例的所有缓存，仍在进行的对话不再写入"""
+        self.enabled = False
+        with self._lock:
+            contexts = list(self._contexts)
+            self._contexts.clear()
+            self._index.clear()
+        for context in contexts:
+            cache_manager.remove(CacheType.LLM_RESPONSE, context)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["lookups"]
+        hits = self.stats["exact_hits"] + self.stats["similar_hits"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "contexts": len(self._contexts),
+        }
@@ -0,0 +1,171 @@
+"""
+设备会话缓存
+Wi-Fi环境下设备经常短暂断线后立即重连，每次都重新拉取差异化配置、实例化组件、初始化工具和MCP，
+并且丢失对话历史。连接关闭时把可复用的会话状态按设备暂存一段宽限期，期间重连的设备直接恢复：
+- 对话历史、差异化配置覆盖层
+- LLM、记忆、意图、VAD、本地ASR、声纹等与连接无关的组件实例
+- 工具处理器（含服务端MCP连接和MCP接入点），恢复时重新绑定到新连接
+TTS和远程ASR持有连接级的上游会话，恢复后重新创建
+暂存的会话不保存记忆，过期或被淘汰、不再恢复时才把对话历史保存到记忆
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from config.logger import setup_logging
+from core.utils import llm as llm_utils
+from core.utils.executors import BACKGROUND, get_executor
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_GRACE_SECONDS = 30
+DEFAULT_MAX_SESSIONS = 1000
+
+
+def save_memory_in_background(memory, messages):
+    """在后台线程池中保存记忆，不等待完成
+
+    记忆供应器内部可能同步调用LLM，在线程中用独立的事件循环执行；
+    messages传入对话历史的副本，避免与事件循环上继续进行的对话同时访问
+    """
+
+    def save_memory_task():
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(memory.save_memory(messages))
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
+        finally:
+            loop.close()
+
+    get_executor(BACKGROUND).submit(save_memory_task)
+
+
+class SessionState:
+    """连接关闭时暂存的会话状态
+
+    Args:
+        base_config: 会话所基于的共享配置，服务配置更新后旧会话不再恢复
+        config_overrides: 本连接配置覆盖层中的差异化配置
+        components: 可复用的组件实例，键为连接上的属性名
+        attributes: 需要恢复的连接属性（如输出字数限制）
+    """
+
+    __slots__ = (
+        "base_config",
+        "config_overrides",
+        "components",
+        "attributes",
+        "parked_at",
+        "expire_handle",
+    )
+
+    def __init__(
+        self,
+        base_config,
+        config_overrides: Dict[str, Any],
+        components: Dict[str, Any],
+        attributes: Dict[str, Any],
+    ):
+        self.base_config = base_config
+        self.config_overrides = config_overrides
+        self.components = components
+        self.attributes = attributes
+        self.parked_at = time.monotonic()
+        self.expire_handle: Optional[asyncio.TimerHandle] = None
+
+    async def release(self):
+        """会话过期或被淘汰时保存记忆，归还共享的LLM实例，释放工具处理器持有的MCP连接"""
+        memory = self.components.get("memory")
+        dialogue = self.components.get("dialogue")
+        if memory is not None and dialogue is not None:
+            save_memory_in_background(memory, list(dialogue.dialogue))
+        for instance in self.attributes.get("llm_instances", ()):
+            llm_utils.release_instance(instance)
+        func_handler = self.components.get("func_handler")
+        if func_handler is None:
+            return
+        try:
+            await func_handler.cleanup()
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"释放缓存会话的工具处理器失败: {e}")
+
+
+class SessionCache:
+    """按设备暂存会话，超过宽限期或缓存数量上限时释放
+
+    只在事件循环线程中访问，多进程模式下每个工作进程各自一份
+
+    Args:
+        config: session_resume配置，包括enabled、grace_seconds、max_sessions
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.grace_seconds = float(config.get("grace_seconds") or DEFAULT_GRACE_SECONDS)
+        self.max_sessions = int(config.get("max_sessions") or DEFAULT_MAX_SESSIONS)
+        self._sessions: "OrderedDict[Hashable, SessionState]" = OrderedDict()
+        self.stats = {"parked": 0, "resumed": 0, "expired": 0, "evicted": 0, "stale": 0}
+
+    def park(self, key: Hashable, session: SessionState):
+        """暂存会话，同一设备已有的旧会话直接释放"""
+        if not self.enabled:
+            self._release(session)
+            return
+        previous = self._sessions.pop(key, None)
+        if previous is not None:
+            self._discard(previous)
+        loop = asyncio.get_running_loop()
+        session.expire_handle = loop.call_later(self.grace_seconds, self._expire, key, session)
+        self._sessions[key] = session
+        self.stats["parked"] += 1
+        while len(self._sessions) > self.max_sessions:
+            _, oldest = self._sessions.popitem(last=False)
+            self.stats["evicted"] += 1
+            self._discard(oldest)
+
+    def take(self, key: Hashable, base_config) -> Optional[SessionState]:
+        """取出设备的缓存会话，取出后不再由缓存管理
+
+        Args:
+            key: 设备标识
+            base_config: 当前的共享配置，与会话暂存时不同说明配置已更新，旧会话作废
+        """
+        session = self._sessions.pop(key, None)
+        if session is None:
+            return None
+        if session.expire_handle is not None:
+            session.expire_handle.cancel()
+        if session.base_config is not base_config:
+            self.stats["stale"] += 1
+            self._release(session)
+            return None
+        self.stats["resumed"] += 1
+        return session
+
+    def _expire(self, key: Hashable, session: SessionState):
+        if self._sessions.get(key) is session:
+            del self._sessions[key]
+            self.stats["expired"] += 1
+            self._release(session)
+
+    def _discard(self, session: SessionState):
+        if session.expire_handle is not None:
+            session.expire_handle.cancel()
+        self._release(session)
+
+    def _release(self, session: SessionState):
+        asyncio.get_running_loop().create_task(session.release())
+
+    def clear(self):
+        for session in self._sessions.values():
+            self._discard(session)
+        self._sessions.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "sessions": len(self._sessions)}
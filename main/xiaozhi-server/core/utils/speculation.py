@@ -0,0 +1,248 @@
+"""
+基于流式ASR中间结果的投机式LLM请求
+流式ASR（如doubao_stream、aliyun_stream）要等到句尾静音后才给出最终结果，之后才开始意图识别和LLM请求。
+开启后，中间结果保持不变超过stable_ms时，提前用它发起意图识别和LLM请求并缓存流式输出：
+- 最终结果与投机文本归一化后一致时，直接消费已缓存的输出，LLM首token延迟被句尾等待掩盖
+- 不一致时取消投机请求，按最终结果重新请求，浪费的token计入统计
+投机请求不写入对话历史、不发送TTS，只有被采用后才由chat按正常流程处理
+"""
+
+import json
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+from config.logger import setup_logging
+from core.utils.dialogue import Message, estimate_messages_tokens, estimate_tokens
+from core.utils.textUtils import normalize_text
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_STABLE_MS = 300
+DEFAULT_MIN_CHARS = 2
+
+_END = object()
+
+
+class SpeculativeResponse:
+    """一次投机请求：意图识别结果和缓存的LLM流式输出"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.normalized = normalize_text(text)
+        self.started_at = time.monotonic()
+        self.intent_result = None
+        self.functions = None
+        self.prompt_tokens = 0
+        self.message_count = 0
+        # 渲染结果的前缀指纹，采用时才计入前缀复用统计
+        self.prefix_snapshot = None
+        self.output_tokens = 0
+        # LLM未启动（如意图识别结果需要调用函数）时为None
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None
+        # 意图识别完成、LLM请求已发起（或无需发起）后置位
+        self.ready = asyncio.Event()
+
+    @property
+    def needs_function(self) -> bool:
+        """意图识别结果是否需要调用函数"""
+        if not self.intent_result:
+            return False
+        try:
+            name = json.loads(self.intent_result)["function_call"]["name"]
+        except Exception:
+            return False
+        return name != "continue_chat"
+
+    async def responses(self):
+        """按原顺序产出缓存的LLM输出，未结束时继续等待上游，提前退出时取消上游请求"""
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is _END:
+                    break
+                yield item
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+class SpeculativeChat:
+    """跟踪连接上的流式ASR中间结果，结果稳定后发起投机请求
+
+    只在事件循环线程中访问
+
+    Args:
+        conn: 连接对象
+        config: speculative_llm配置，包括enabled、stable_ms、min_chars
+    """
+
+    def __init__(self, conn, config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        self.conn = conn
+        self.stable_seconds = (
+            float(config.get("stable_ms") or DEFAULT_STABLE_MS) / 1000
+        )
+        self.min_chars = int(config.get("min_chars") or DEFAULT_MIN_CHARS)
+        self._partial = ""
+        self._stable_handle: Optional[asyncio.TimerHandle] = None
+        self.current: Optional[SpeculativeResponse] = None
+        self.stats = {
+            "started": 0,
+            "committed": 0,
+            "cancelled": 0,
+            "wasted_prompt_tokens": 0,
+            "wasted_output_tokens": 0,
+            "head_start_ms": 0,
+        }
+
+    @staticmethod
+    def create(conn) -> Optional["SpeculativeChat"]:
+        config = conn.config.get("speculative_llm") or {}
+        if not config.get("enabled", False):
+            return None
+        return SpeculativeChat(conn, config)
+
+    def on_partial(self, text: str):
+        """流式ASR的中间结果，内容变化时重新计时"""
+        normalized = normalize_text(text)
+        if normalized == normalize_text(self._partial):
+            return
+        self._partial = text
+        if self._stable_handle is not None:
+            self._stable_handle.cancel()
+            self._stable_handle = None
+        if self.current is not None and self.current.normalized != normalized:
+            self._discard()
+        if len(normalized) < self.min_chars:
+            return
+        self._stable_handle = self.conn.loop.call_later(
+            self.stable_seconds, self._on_stable, text
+        )
+
+    def _on_stable(self, text: str):
+        self._stable_handle = None
+        conn = self.conn
+        # 声纹识别的说话人要在句尾才能确定，需要绑定或正在退出的连接也不投机
+        if (
+            self.current is not None
+            or conn.voiceprint_provider is not None
+            or conn.need_bind
+            or conn.close_after_chat
+            or conn.llm is None
+        ):
+            return
+        speculation = SpeculativeResponse(text)
+        self.current = speculation
+        self.stats["started"] += 1
+        speculation.task = conn.start_pipeline_task(self._run(speculation))
+        logger.bind(tag=TAG).debug(f"中间结果已稳定，发起投机请求: {text}")
+
+    async def _run(self, speculation: SpeculativeResponse):
+        conn = self.conn
+        try:
+            await conn.wait_components_ready()
+            if conn.intent_type not in ("function_call", "nointent") and conn.intent:
+                speculation.intent_result = await conn.intent.detect_intent(
+                    conn, conn.dialogue.dialogue, speculation.text
+                )
+                # 需要调用函数的意图有副作用，只缓存意图识别结果
+                if speculation.needs_function:
+                    return
+
+            memory_str = None
+            if conn.memory is not None:
+                memory_str = await conn.memory.query_memory(speculation.text)
+            # 渲染时临时加入用户消息，不写入对话历史
+            message = Message(role="user", content=speculation.text)
+            conn.dialogue.put(message)
+            try:
+                llm_dialogue = conn.dialogue.get_llm_dialogue_with_memory(
+                    memory_str,
+                    conn.config.get("voiceprint", {}),
+                    conn.llm.volatile_context,
+                    record=False,
+                )
+                speculation.prefix_snapshot = conn.dialogue.prefix_snapshot(llm_dialogue)
+            finally:
+                conn.dialogue.dialogue.remove(message)
+            speculation.functions = conn.get_chat_functions()
+            speculation.prompt_tokens = estimate_messages_tokens(llm_dialogue)
+            speculation.message_count = len(llm_dialogue)
+            speculation.queue = asyncio.Queue()
+            stream = conn.open_llm_stream(llm_dialogue, speculation.functions)
+            speculation.ready.set()
+            try:
+                async for item in stream:
+                    speculation.queue.put_nowait(item)
+                    content = item[0] if isinstance(item, tuple) else item
+                    speculation.output_tokens += estimate_tokens(content)
+            finally:
+                await stream.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            speculation.error = e
+            logger.bind(tag=TAG).warning(f"投机请求失败: {e}")
+        finally:
+            if speculation.queue is not None:
+                speculation.queue.put_nowait(_END)
+            speculation.ready.set()
+
+    def take(self, text: str) -> Optional[SpeculativeResponse]:
+        """最终识别结果到达时调用，归一化后与投机文本一致时返回投机请求，否则取消"""
+        if self._stable_handle is not None:
+            self._stable_handle.cancel()
+            self._stable_handle = None
+        self._partial = ""
+        speculation, self.current = self.current, None
+        if speculation is None:
+            return None
+        if speculation.normalized != normalize_text(text) or speculation.error:
+            self._count_wasted(speculation)
+            speculation.cancel()
+            return None
+        if speculation.prefix_snapshot is not None:
+            self.conn.dialogue.record_prefix(speculation.prefix_snapshot)
+        head_start_ms = int((time.monotonic() - speculation.started_at) * 1000)
+        self.stats["committed"] += 1
+        self.stats["head_start_ms"] += head_start_ms
+        logger.bind(tag=TAG).info(f"采用投机请求，比最终结果提前{head_start_ms}ms发起")
+        return speculation
+
+    def _discard(self):
+        speculation, self.current = self.current, None
+        self._count_wasted(speculation)
+        speculation.cancel()
+
+    def _count_wasted(self, speculation: SpeculativeResponse):
+        self.stats["cancelled"] += 1
+        self.stats["wasted_prompt_tokens"] += speculation.prompt_tokens
+        self.stats["wasted_output_tokens"] += speculation.output_tokens
+
+    def cancel(self):
+        if self._stable_handle is not None:
+            self._stable_handle.cancel()
+            self._stable_handle = None
+        if self.current is not None:
+            self._discard()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats
+        started = stats["started"]
+        committed = stats["committed"]
+        return {
+            **stats,
+            "hit_rate": round(committed / started, 3) if started else 0.0,
+            "avg_head_start_ms": round(stats["head_start_ms"] / committed)
+            if committed
+            else 0,
+        }
@@ -1,4 +1,5 @@
 import json
+import unicodedata
 
 TAG = __name__
 EMOJI_MAP = {
@@ -102,6 +103,15 @@ async def get_emotion(conn, text):
     return
 
 
+def normalize_text(text):
+    """去除标点和空白并转为小写，用于比较识别结果或作为缓存的键"""
+    return "".join(
+        ch
+        for ch in (text or "").lower()
+        if not unicodedata.category(ch).startswith(("P", "Z", "C"))
+    )
+
+
 def is_emoji(char):
     """检查字符是否为emoji表情"""
     code_point = ord(char)
@@ -0,0 +1,215 @@
+"""
+流式tool call组装
+LLM流式返回的函数调用有两种形式：
+- 结构化的tool_calls增量（OpenAI兼容接口），同一响应可能包含多个并行调用，按index区分，
+  参数JSON分成多段返回
+- 以<tool_call>开头的文本（部分本地模型），后面跟一个或多个{"name": ..., "arguments": ...}
+每段增量只扫描新增的字符，参数JSON的括号闭合时立即解析并产出完整的调用，
+调用方可以在流结束前开始执行工具
+"""
+
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+TOOL_CALL_TAG = "<tool_call>"
+
+
+class JsonObjectScanner:
+    """增量扫描JSON文本，找出顶层对象的结束位置，只处理新增的字符"""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+
+    def feed(self, text: str) -> int:
+        """扫描新增文本，顶层对象闭合时返回其结束位置之后的下标，否则返回-1"""
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                self.started = True
+            elif ch in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return i + 1
+        return -1
+
+
+class _PendingCall:
+    __slots__ = ("id", "name", "arguments", "scanner", "closed", "done")
+
+    def __init__(self, call_id: Optional[str]):
+        self.id = call_id
+        self.name = ""
+        self.arguments = ""
+        self.scanner = JsonObjectScanner()
+        # 参数JSON已闭合
+        self.closed = False
+        self.done = False
+
+    def to_call(self) -> Dict[str, Any]:
+        return {
+            "id": self.id or uuid.uuid4().hex,
+            "name": self.name,
+            "arguments": self.arguments.strip() or "{}",
+        }
+
+
+def _field(obj, name):
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class ToolCallAssembler:
+    """把一次LLM流式响应中的函数调用增量组装为完整的调用
+
+    产出的调用格式为{"id": ..., "name": ..., "arguments": "JSON字符串"}，
+    与UnifiedToolHandler.handle_llm_function_call的入参一致
+    """
+
+    def __init__(self):
+        self._calls: Dict[Any, _PendingCall] = {}
+        self._order: List[Any] = []
+        self._last_key = None
+        # <tool_call>文本形式的调用
+        self._text = ""
+        self._text_mode: Optional[bool] = None
+        self._text_scanner: Optional[JsonObjectScanner] = None
+        # 已扫描到的位置，以及正在扫描的对象的起始位置
+        self._text_pos = 0
+        self._object_start = 0
+        self.invalid_text: List[str] = []
+
+    @property
+    def has_tool_calls(self) -> bool:
+        """本次响应是否包含函数调用，包含时文本内容不再播报"""
+        return bool(self._order) or bool(self._text_mode)
+
+    def feed_deltas(self, tool_calls) -> List[Dict[str, Any]]:
+        """输入一个chunk的tool_calls增量，返回本次新完成的调用"""
+        completed = []
+        for delta in tool_calls or ():
+            function = _field(delta, "function")
+            call_id = _field(delta, "id")
+            key = _field(delta, "index")
+            if key is None:
+                # 没有index的供应器：出现新的id时视为新的调用
+                last = self._calls.get(self._last_key)
+                if last is not None and (not call_id or last.id in (None, call_id)):
+                    key = self._last_key
+                else:
+                    key = call_id or f"#{len(self._order)}"
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _PendingCall(call_id)
+                self._order.append(key)
+            self._last_key = key
+            if call_id and not call.id:
+                call.id = call_id
+            if function is None or call.done:
+                continue
+            name = _field(function, "name")
+            if name and not call.name:
+                call.name = name
+            arguments = _field(function, "arguments")
+            if arguments and not call.closed:
+                if isinstance(arguments, dict):
+                    arguments = json.dumps(arguments, ensure_ascii=False)
+                call.arguments += arguments
+                call.closed = call.scanner.feed(arguments) >= 0
+            if call.closed and call.name:
+                call.done = True
+                completed.append(call.to_call())
+        return completed
+
+    def feed_text(self, content: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """输入一个chunk的文本，返回(可以播报的文本, 本次新完成的调用)
+
+        只有响应以<tool_call>开头时才按函数调用解析；开头可能是标签的一部分时先暂存
+        """
+        if not content:
+            return "", []
+        if self._text_mode is False:
+            return content, []
+        self._text += content
+        if self._text_mode is None:
+            stripped = self._text.lstrip()
+            if stripped.startswith(TOOL_CALL_TAG):
+                self._text_mode = True
+                self._text_pos = len(self._text) - len(stripped) + len(TOOL_CALL_TAG)
+            elif TOOL_CALL_TAG.startswith(stripped):
+                return "", []
+            else:
+                self._text_mode = False
+                text, self._text = self._text, ""
+                return text, []
+        return "", self._scan_text()
+
+    def _scan_text(self) -> List[Dict[str, Any]]:
+        completed = []
+        while self._text_pos < len(self._text):
+            if self._text_scanner is None:
+                start = self._text.find("{", self._text_pos)
+                if start < 0:
+                    self._text_pos = len(self._text)
+                    break
+                self._text_pos = self._object_start = start
+                self._text_scanner = JsonObjectScanner()
+            end = self._text_scanner.feed(self._text[self._text_pos :])
+            if end < 0:
+                # 下一次只扫描新增的字符
+                self._text_pos = len(self._text)
+                break
+            self._text_pos += end
+            raw = self._text[self._object_start : self._text_pos]
+            self._text_scanner = None
+            call = self._parse_text_call(raw)
+            if call is not None:
+                completed.append(call)
+        return completed
+
+    def _parse_text_call(self, raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(raw)
+            arguments = data.get("arguments", {})
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments, ensure_ascii=False)
+            return {"id": uuid.uuid4().hex, "name": data["name"], "arguments": arguments}
+        except Exception:
+            self.invalid_text.append(raw)
+            return None
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """流结束时调用，返回参数为空或未能提前判断结束的调用"""
+        completed = []
+        for key in self._order:
+            call = self._calls[key]
+            if not call.done and call.name:
+                call.done = True
+                completed.append(call.to_call())
+        if self._text_mode is None and self._text:
+            # 整个响应只有<tool_call>标签的一部分，按普通文本处理
+            self._text_mode = False
+        elif self._text_mode and self._text_scanner is not None:
+            self.invalid_text.append(self._text[self._object_start :])
+            self._text_scanner = None
+        return completed
+
+    def pending_text(self) -> str:
+        """流结束时仍暂存、最终判定为普通文本的内容"""
+        if self._text_mode is False and self._text:
+            text, self._text = self._text, ""
+            return text
+        return ""
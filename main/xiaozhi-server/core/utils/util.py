@@ -6,10 +6,10 @@ import wave
 import socket
 import requests
 import subprocess
-import numpy as np
 import opuslib_next
 from io import BytesIO
 from core.utils import p3
+from core.utils.opus_codec_pool import opus_codec_pool
 from pydub import AudioSegment
 from typing import Callable, Any
 
@@ -251,33 +251,8 @@ def audio_to_data(audio_file_path: str, is_opus: bool = True) -> list[bytes]:
     # 获取原始PCM数据（16位小端）
     raw_data = audio.raw_data
 
-    # 初始化Opus编码器
-    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
-
-    # 编码参数
-    frame_duration = 60  # 60ms per frame
-    frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
-
     datas = []
-    # 按帧处理所有音频数据（包括最后一帧可能补零）
-    for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-        # 获取当前帧的二进制数据
-        chunk = raw_data[i : i + frame_size * 2]
-
-        # 如果最后一帧不足，补零
-        if len(chunk) < frame_size * 2:
-            chunk += b"\x00" * (frame_size * 2 - len(chunk))
-
-        if is_opus:
-            # 转换为numpy数组处理
-            np_frame = np.frombuffer(chunk, dtype=np.int16)
-            # 编码Opus数据
-            frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-        else:
-            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
-
-        datas.append(frame_data)
-
+    pcm_to_data_stream(raw_data, is_opus, datas.append)
     return datas
 
 def audio_bytes_to_data_stream(audio_bytes, file_type, is_opus, callback: Callable[[Any], Any]) -> None:
@@ -298,46 +273,47 @@ def audio_bytes_to_data_stream(audio_bytes, file_type, is_opus, callback: Callab
 
 
 def pcm_to_data_stream(raw_data, is_opus=True, callback: Callable[[Any], Any] = None):
-    # 初始化Opus编码器
-    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
-
     # 编码参数
     frame_duration = 60  # 60ms per frame
     frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
 
-    # 按帧处理所有音频数据（包括最后一帧可能补零）
-    for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-        # 获取当前帧的二进制数据
-        chunk = raw_data[i : i + frame_size * 2]
-
-        # 如果最后一帧不足，补零
-        if len(chunk) < frame_size * 2:
-            chunk += b"\x00" * (frame_size * 2 - len(chunk))
+    if not is_opus:
+        for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
+            chunk = raw_data[i : i + frame_size * 2]
+            # 如果最后一帧不足，补零
+            if len(chunk) < frame_size * 2:
+                chunk += b"\x00" * (frame_size * 2 - len(chunk))
+            callback(chunk if isinstance(chunk, bytes) else bytes(chunk))
+        return
+
+    # 从进程级对象池借出Opus编码器，避免每段音频新建编码器
+    with opus_codec_pool.encoder(16000, 1, opuslib_next.APPLICATION_AUDIO) as encoder:
+        # 按帧处理所有音频数据（包括最后一帧可能补零）
+        for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
+            # 获取当前帧的二进制数据
+            chunk = raw_data[i : i + frame_size * 2]
+
+            # 如果最后一帧不足，补零
+            if len(chunk) < frame_size * 2:
+                chunk += b"\x00" * (frame_size * 2 - len(chunk))
 
-        if is_opus:
-            # 转换为numpy数组处理
-            np_frame = np.frombuffer(chunk, dtype=np.int16)
             # 编码Opus数据
-            frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-            callback(frame_data)
-        else:
-            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
-            callback(frame_data)
+            callback(encoder.encode(bytes(chunk), frame_size))
 
 def opus_datas_to_wav_bytes(opus_datas, sample_rate=16000, channels=1):
     """
     将opus帧列表解码为wav字节流
     """
-    decoder = opuslib_next.Decoder(sample_rate, channels)
     pcm_datas = []
 
     frame_duration = 60  # ms
     frame_size = int(sample_rate * frame_duration / 1000)  # 960
 
-    for opus_frame in opus_datas:
-        # 解码为PCM（返回bytes，2字节/采样点）
-        pcm = decoder.decode(opus_frame, frame_size)
-        pcm_datas.append(pcm)
+    with opus_codec_pool.decoder(sample_rate, channels) as decoder:
+        for opus_frame in opus_datas:
+            # 解码为PCM（返回bytes，2字节/采样点）
+            pcm = decoder.decode(opus_frame, frame_size)
+            pcm_datas.append(pcm)
 
     pcm_bytes = b"".join(pcm_datas)
 
@@ -0,0 +1,340 @@
+"""
+流式TTS上游WebSocket连接池
+进程级长连接复用：多个逻辑会话共享少量上游连接，下行消息按session id路由
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import websockets
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class PooledSession:
+    """连接池中的一个逻辑会话，对外提供与websocket一致的send/recv/close接口"""
+
+    def __init__(self, connection: "UpstreamConnection", session_id: str):
+        self.connection = connection
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.released = False
+
+    async def send(self, message):
+        if self.released:
+            raise RuntimeError(f"会话已释放: {self.session_id}")
+        await self.connection.send(message)
+
+    async def recv(self):
+        item = await self.queue.get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    async def release(self, reusable: bool = True):
+        """归还会话；reusable为False时同时关闭底层上游连接"""
+        if self.released:
+            return
+        self.released = True
+        await self.connection.pool.release(self, reusable)
+
+    async def close(self):
+        """兼容websocket的close语义：放弃本会话，底层连接只在已损坏或不再承载其他会话时关闭"""
+        await self.release(reusable=False)
+
+
+class UpstreamConnection:
+    """一条上游长连接，由独立读任务按session id分发下行消息"""
+
+    def __init__(self, pool: "StreamSessionPool", ws):
+        self.pool = pool
+        self.ws = ws
+        self.sessions: Dict[str, PooledSession] = {}
+        self.created_at = time.monotonic()
+        self.last_active_time = self.created_at
+        self.closed = False
+        # 发送失败，连接已不可用
+        self.broken = False
+        self.reader_task = asyncio.create_task(self._reader())
+
+    async def send(self, message):
+        self.last_active_time = time.monotonic()
+        try:
+            await self.ws.send(message)
+        except Exception:
+            self.broken = True
+            raise
+
+    def _dispatch(self, message):
+        try:
+            session_id = self.pool.route(message)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"{self.pool.name} 下行消息路由失败: {e}")
+            session_id = None
+        session = self.sessions.get(session_id) if session_id else None
+        # 无法识别会话的消息（如纯音频帧、错误帧），在连接只承载一个会话时交给它
+        if session is None and session_id is None and len(self.sessions) == 1:
+            session = next(iter(self.sessions.values()))
+        if session is None:
+            self.pool.stats["dropped_messages"] += 1
+            return
+        session.queue.put_nowait(message)
+
+    async def _reader(self):
+        error: BaseException = None
+        try:
+            while True:
+                message = await self.ws.recv()
+                self.last_active_time = time.monotonic()
+                self._dispatch(message)
+        except asyncio.CancelledError:
+            error = websockets.ConnectionClosedError(None, None)
+        except Exception as e:
+            error = e
+        finally:
+            self.closed = True
+            for session in list(self.sessions.values()):
+                session.queue.put_nowait(error)
+            self.sessions.clear()
+            self.pool.discard(self)
+
+    async def close(self):
+        self.closed = True
+        if not self.reader_task.done():
+            self.reader_task.cancel()
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+class StreamSessionPool:
+    """上游长连接池
+
+    Args:
+        name: 连接池名称，用于日志和统计
+        connect: 建立一条上游websocket连接的协程工厂
+        route: 从下行消息中解析session id，无法解析时返回None
+        cancel: 通知上游结束单个会话的协程，连接上还有其他会话时，用它结束被放弃的会话而不关闭连接
+        max_sessions_per_connection: 每条连接可同时承载的会话数
+        min_idle: 预热并保持的空闲连接数
+        idle_timeout: 空闲连接最长保留时间（秒），None表示不限
+        max_lifetime: 连接最长存活时间（秒），None表示不限
+        maintain_interval: 维护任务的检查间隔（秒）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[], Awaitable[Any]],
+        route: Callable[[Any], Optional[str]],
+        cancel: Optional[Callable[[PooledSession], Awaitable[Any]]] = None,
+        max_sessions_per_connection: int = 1,
+        min_idle: int = 0,
+        idle_timeout: Optional[float] = 60,
+        max_lifetime: Optional[float] = None,
+        maintain_interval: float = 5,
+    ):
+        self.name = name
+        self.connect = connect
+        self.route = route
+        self.cancel = cancel
+        self.max_sessions_per_connection = max(1, int(max_sessions_per_connection))
+        self.min_idle = max(0, int(min_idle))
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.maintain_interval = maintain_interval
+        self.connections = set()
+        self._opening = 0
+        self._maintain_task = None
+        # (完成时刻, 耗时ms)
+        self._session_start_ms = deque(maxlen=200)
+        self.stats = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "sessions_started": 0,
+            "sessions_reused": 0,
+            "sessions_cancelled": 0,
+            "dropped_messages": 0,
+        }
+
+    def _is_expired(self, connection: UpstreamConnection, now: float) -> bool:
+        if self.max_lifetime and now - connection.created_at > self.max_lifetime:
+            return True
+        return (
+            not connection.sessions
+            and self.idle_timeout is not None
+            and now - connection.last_active_time > self.idle_timeout
+        )
+
+    def _pick_connection(self) -> Optional[UpstreamConnection]:
+        now = time.monotonic()
+        candidates = [
+            c
+            for c in self.connections
+            if not c.closed
+            and len(c.sessions) < self.max_sessions_per_connection
+            and not self._is_expired(c, now)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: len(c.sessions))
+
+    async def _open_connection(self) -> UpstreamConnection:
+        self._opening += 1
+        try:
+            ws = await self.connect()
+        finally:
+            self._opening -= 1
+        connection = UpstreamConnection(self, ws)
+        self.connections.add(connection)
+        self.stats["connections_opened"] += 1
+        logger.bind(tag=TAG).info(
+            f"{self.name} 新建上游连接，当前连接数: {len(self.connections)}"
+        )
+        return connection
+
+    def _ensure_maintainer(self):
+        if self._maintain_task is None or self._maintain_task.done():
+            self._maintain_task = asyncio.create_task(self._maintain())
+
+    async def acquire(self, session_id: str) -> PooledSession:
+        """为逻辑会话分配一条上游连接，优先复用已有长连接"""
+        begin = time.perf_counter()
+        self._ensure_maintainer()
+        connection = self._pick_connection()
+        if connection is None:
+            connection = await self._open_connection()
+        else:
+            self.stats["sessions_reused"] += 1
+        session = PooledSession(connection, session_id)
+        connection.sessions[session_id] = session
+        connection.last_active_time = time.monotonic()
+        self.stats["sessions_started"] += 1
+        self._session_start_ms.append(
+            (time.monotonic(), (time.perf_counter() - begin) * 1000)
+        )
+        return session
+
+    async def release(self, session: PooledSession, reusable: bool = True):
+        connection = session.connection
+        if connection.sessions.get(session.session_id) is session:
+            del connection.sessions[session.session_id]
+        connection.last_active_time = time.monotonic()
+        if reusable or connection.closed:
+            return
+        if not connection.broken and connection.sessions:
+            # 连接上还有其他设备的会话，只结束本会话
+            if await self._cancel_session(session):
+                return
+        self.discard(connection)
+        await connection.close()
+
+    async def _cancel_session(self, session: PooledSession) -> bool:
+        """结束被放弃的会话，其后续下行消息按session id路由时被丢弃；通知失败时返回False"""
+        if self.cancel is not None:
+            try:
+                await self.cancel(session)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(
+                    f"{self.name} 取消会话失败，关闭上游连接: {session.session_id}, {e}"
+                )
+                return False
+        self.stats["sessions_cancelled"] += 1
+        return True
+
+    def discard(self, connection: UpstreamConnection):
+        if connection in self.connections:
+            self.connections.discard(connection)
+            self.stats["connections_closed"] += 1
+
+    async def prewarm(self, count: Optional[int] = None):
+        """预先建立空闲连接，默认补足到min_idle"""
+        self._ensure_maintainer()
+        target = self.min_idle if count is None else count
+        idle = sum(1 for c in self.connections if not c.closed and not c.sessions)
+        missing = target - idle - self._opening
+        if missing <= 0:
+            return
+        results = await asyncio.gather(
+            *(self._open_connection() for _ in range(missing)), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.bind(tag=TAG).warning(f"{self.name} 预热连接失败: {result}")
+
+    async def _maintain(self):
+        """定期淘汰过期连接并补足预热连接"""
+        while True:
+            await asyncio.sleep(self.maintain_interval)
+            try:
+                now = time.monotonic()
+                for connection in list(self.connections):
+                    if connection.closed:
+                        self.discard(connection)
+                    elif self._is_expired(connection, now) and not connection.sessions:
+                        self.discard(connection)
+                        await connection.close()
+                await self.prewarm()
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"{self.name} 连接池维护失败: {e}")
+
+    def recent_session_start_ms(self, window: float) -> Optional[float]:
+        """最近window秒内建立会话的平均耗时，期间没有新会话时返回None"""
+        since = time.monotonic() - window
+        latencies = [ms for at, ms in self._session_start_ms if at >= since]
+        if not latencies:
+            return None
+        return sum(latencies) / len(latencies)
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = [ms for _, ms in self._session_start_ms]
+        return {
+            **self.stats,
+            "connections_open": len(self.connections),
+            "sessions_active": sum(len(c.sessions) for c in self.connections),
+            "session_start_avg_ms": (
+                sum(latencies) / len(latencies) if latencies else 0.0
+            ),
+            "session_start_max_ms": max(latencies) if latencies else 0.0,
+        }
+
+    async def close(self):
+        if self._maintain_task:
+            self._maintain_task.cancel()
+            self._maintain_task = None
+        for connection in list(self.connections):
+            self.discard(connection)
+            await connection.close()
+
+
+_pools: Dict[Hashable, StreamSessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_session_pool(key: Hashable, **kwargs) -> StreamSessionPool:
+    """按key获取进程级连接池，不存在时用kwargs创建"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = StreamSessionPool(**kwargs)
+            _pools[key] = pool
+        return pool
+
+
+def get_recent_session_start_ms(window: float) -> float:
+    """所有连接池最近window秒内建立会话平均耗时的最大值，没有新样本的连接池视为正常"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    recent = [pool.recent_session_start_ms(window) for pool in pools]
+    return max((ms for ms in recent if ms is not None), default=0.0)
+
+
+def get_all_pool_stats() -> Dict[str, Dict[str, Any]]:
+    with _pools_lock:
+        return {pool.name: pool.get_stats() for pool in _pools.values()}
@@ -1,9 +1,14 @@
+import json
 import asyncio
 import websockets
 from config.logger import setup_logging
 from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api
-from core.utils.modules_initialize import initialize_modules
+from core.utils.admission import AdmissionController
+from core.utils.session_cache import SessionCache
+from core.utils.response_cache import ResponseCache
+from core.utils import llm as llm_utils
+from core.utils.modules_initialize import initialize_modules, initialize_tts
 from core.utils.util import check_vad_update, check_asr_update
 
 TAG = __name__
@@ -31,19 +36,82 @@ class WebSocketServer:
         self._memory = modules["memory"] if "memory" in modules else None
 
         self.active_connections = set()
+        self.server = None
+        self.admission = AdmissionController(self.config.get("admission"))
+        # 设备断线重连时恢复会话
+        self.session_cache = SessionCache(self.config.get("session_resume"))
+        # 无状态问题的LLM回复缓存
+        self.response_cache = ResponseCache(self.config.get("response_cache"))
 
-    async def start(self):
+    async def start(self, sock=None):
+        """启动服务
+
+        Args:
+            sock: 已绑定的监听socket，多进程模式下由工作进程创建；为None时按配置的地址端口监听
+        """
         server_config = self.config["server"]
-        host = server_config.get("ip", "0.0.0.0")
-        port = int(server_config.get("port", 8000))
+        if sock is not None:
+            listen_kwargs = {"sock": sock}
+        else:
+            listen_kwargs = {
+                "host": server_config.get("ip", "0.0.0.0"),
+                "port": int(server_config.get("port", 8000)),
+            }
+
+        # 后台预热流式TTS上游连接池，不阻塞服务启动
+        asyncio.create_task(self._prewarm_tts())
+        self.admission.start()
 
         async with websockets.serve(
-            self._handle_connection, host, port, process_request=self._http_response
-        ):
+            self._handle_connection, process_request=self._http_response, **listen_kwargs
+        ) as server:
+            self.server = server
             await asyncio.Future()
 
+    async def drain(self, timeout: float) -> int:
+        """停止接受新连接，等待已有连接自然结束
+
+        Args:
+            timeout: 最长等待时间（秒），超时后仍未结束的连接由调用方取消
+
+        Returns:
+            int: 超时后仍在进行中的连接数
+        """
+        if self.server is not None:
+            # 只关闭监听socket，已建立的连接继续服务
+            self.server.server.close()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.active_connections:
+            if asyncio.get_running_loop().time() >= deadline:
+                break
+            await asyncio.sleep(0.5)
+        return len(self.active_connections)
+
+    async def _prewarm_tts(self):
+        """按默认TTS配置预热上游长连接"""
+        selected_tts = self.config.get("selected_module", {}).get("TTS")
+        if not selected_tts or selected_tts not in self.config.get("TTS", {}):
+            return
+        try:
+            tts = await asyncio.get_running_loop().run_in_executor(
+                None, initialize_tts, self.config
+            )
+            await tts.prewarm()
+        except Exception as e:
+            self.logger.bind(tag=TAG).warning(f"预热TTS连接失败: {e}")
+
     async def _handle_connection(self, websocket):
         """处理新连接，每次创建独立的ConnectionHandler"""
+        # 过载时在创建ConnectionHandler之前拒绝，避免拖慢已有对话
+        admitted, reasons = await self.admission.admit(
+            lambda: len(self.active_connections)
+        )
+        if not admitted:
+            await self._reject_busy(websocket, reasons)
+            return
+        if reasons:
+            self.logger.bind(tag=TAG).info(f"负载回落后接入新连接，等待原因: {reasons}")
+
         # 创建ConnectionHandler时传入当前server实例
         handler = ConnectionHandler(
             self.config,
@@ -77,6 +145,18 @@ class WebSocketServer:
                     f"服务器端强制关闭连接时出错: {close_error}"
                 )
 
+    async def _reject_busy(self, websocket, reasons):
+        """回复busy消息并以1013(Try Again Later)关闭连接"""
+        message = self.admission.busy_message(reasons)
+        self.logger.bind(tag=TAG).warning(
+            f"服务器过载，拒绝新连接: {reasons}，准入统计: {self.admission.get_stats()}"
+        )
+        try:
+            await websocket.send(json.dumps(message))
+            await websocket.close(1013, "server busy")
+        except Exception as e:
+            self.logger.bind(tag=TAG).debug(f"回复busy消息失败: {e}")
+
     async def _http_response(self, websocket, request_headers):
         # 检查是否为 WebSocket 升级请求
         if request_headers.headers.get("connection", "").lower() == "upgrade":
@@ -106,8 +186,11 @@ class WebSocketServer:
                 self.logger.bind(tag=TAG).info(
                     f"检查VAD和ASR类型是否需要更新: {update_vad} {update_asr}"
                 )
-                # 更新配置
+                # 更新配置，进程内共享的LLM实例按新配置重新创建
                 self.config = new_config
+                llm_utils.invalidate_instances()
+                self.response_cache.close()
+                self.response_cache = ResponseCache(new_config.get("response_cache"))
                 # 重新初始化组件
                 modules = initialize_modules(
                     self.logger,
@@ -126,6 +209,7 @@ class WebSocketServer:
                 if "asr" in modules:
                     self._asr = modules["asr"]
                 if "llm" in modules:
+                    llm_utils.release_instance(self._llm)
                     self._llm = modules["llm"]
                 if "intent" in modules:
                     self._intent = modules["intent"]
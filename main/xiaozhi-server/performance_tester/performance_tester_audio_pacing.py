@@ -0,0 +1,104 @@
+import time
+import asyncio
+import statistics
+from tabulate import tabulate
+from core.utils.audio_scheduler import PacedAudioScheduler
+
+description = "下行音频节拍发送测试（逐连接sleep vs 全局调度器）"
+
+FRAME_DURATION = 60
+PRE_BUFFER_FRAMES = 3
+
+
+class AudioPacingPerformanceTester:
+    def __init__(self, streams=500, frames=50):
+        self.streams = streams
+        self.frames = frames
+        self.results = []
+
+    async def _bench_sleep(self):
+        """原有方式：每个连接每帧一次asyncio.sleep"""
+        lateness = []
+
+        async def play():
+            start_time = time.perf_counter()
+            play_position = 0
+            for i in range(self.frames):
+                if i < PRE_BUFFER_FRAMES:
+                    continue
+                expected_time = start_time + play_position / 1000
+                delay = expected_time - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lateness.append((time.perf_counter() - expected_time) * 1000)
+                play_position += FRAME_DURATION
+
+        await asyncio.gather(*(play() for _ in range(self.streams)))
+        return lateness, None
+
+    async def _bench_scheduler(self):
+        """全局调度器：所有连接共享一个时间轮"""
+        scheduler = PacedAudioScheduler()
+        streams = []
+        for _ in range(self.streams):
+
+            async def send_frame(frame, timestamp, sequence):
+                pass
+
+            streams.append(scheduler.create_stream(send_frame, FRAME_DURATION))
+        await asyncio.gather(
+            *(s.enqueue([b"\x00"] * self.frames, PRE_BUFFER_FRAMES) for s in streams)
+        )
+        lateness = [
+            s.stats["lateness_total_ms"] / max(1, s.stats["frames_sent"] - PRE_BUFFER_FRAMES)
+            for s in streams
+        ]
+        return lateness, scheduler.get_stats()
+
+    def _record(self, name, lateness, cpu, wall):
+        ordered = sorted(lateness)
+        self.results.append(
+            [
+                name,
+                f"{statistics.mean(ordered):.2f}",
+                f"{ordered[int(len(ordered) * 0.99) - 1]:.2f}",
+                f"{cpu * 1000:.0f}",
+                f"{wall:.2f}",
+            ]
+        )
+
+    async def run(self):
+        for name, bench in (
+            ("逐连接asyncio.sleep", self._bench_sleep),
+            ("全局时间轮调度器", self._bench_scheduler),
+        ):
+            wall_begin = time.perf_counter()
+            cpu_begin = time.process_time()
+            lateness, stats = await bench()
+            cpu = time.process_time() - cpu_begin
+            self._record(name, lateness, cpu, time.perf_counter() - wall_begin)
+            if stats:
+                print(f"调度器统计: {stats}")
+
+        print(f"\n并发流: {self.streams}，每流帧数: {self.frames}，帧时长: {FRAME_DURATION}ms")
+        print(
+            tabulate(
+                self.results,
+                headers=["方式", "平均延迟(ms)", "P99延迟(ms)", "CPU耗时(ms)", "总耗时(s)"],
+                tablefmt="grid",
+            )
+        )
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="下行音频节拍发送测试")
+    parser.add_argument("--streams", type=int, default=500, help="并发音频流数量")
+    parser.add_argument("--frames", type=int, default=50, help="每个音频流的帧数")
+    args, _ = parser.parse_known_args()
+    await AudioPacingPerformanceTester(args.streams, args.frames).run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
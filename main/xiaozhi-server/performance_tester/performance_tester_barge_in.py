@@ -0,0 +1,157 @@
+import time
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+from core.providers.llm.base import iterate_until_aborted
+from core.providers.tts.base import TTSProviderBase, SynthesisCancelled
+
+description = "打断测试（打断后LLM流式请求关闭、语音合成停止的耗时和多生成的token）"
+
+# (场景, 首token延迟ms, token间隔ms, 打断时刻ms)
+SCENARIOS = [
+    ("等待首token时打断", 1500, 50, 300),
+    ("慢速输出中打断", 200, 400, 800),
+    ("快速输出中打断", 200, 30, 615),
+]
+
+
+class FakeLLM:
+    """按固定节奏输出token的模拟LLM，记录流关闭的时刻和生成的token数"""
+
+    def __init__(self, first_token_ms, token_interval_ms, tokens=100):
+        self.first_token_ms = first_token_ms
+        self.token_interval_ms = token_interval_ms
+        self.tokens = tokens
+        self.generated = 0
+        self.closed_at = None
+
+    async def response_async(self):
+        try:
+            await asyncio.sleep(self.first_token_ms / 1000)
+            for _ in range(self.tokens):
+                self.generated += 1
+                yield "好"
+                await asyncio.sleep(self.token_interval_ms / 1000)
+        finally:
+            # 对应供应器中async with关闭上游HTTP流的时刻
+            self.closed_at = time.monotonic()
+
+
+class FakeTTS(TTSProviderBase):
+    """固定耗时的模拟非流式TTS"""
+
+    def __init__(self, synthesis_ms):
+        super().__init__({}, delete_audio_file=True)
+        self.synthesis_ms = synthesis_ms
+
+    async def text_to_speak(self, text, output_file):
+        await asyncio.sleep(self.synthesis_ms / 1000)
+        return b"\x00" * 3200
+
+
+class BargeInPerformanceTester:
+    def __init__(self, synthesis_ms=800, tts_abort_ms=200):
+        self.synthesis_ms = synthesis_ms
+        self.tts_abort_ms = tts_abort_ms
+
+    async def _llm_legacy(self, llm, abort_ms):
+        """原实现：打断只设置标志，下一个token到达时才退出循环"""
+        aborted = False
+
+        async def set_flag():
+            nonlocal aborted
+            await asyncio.sleep(abort_ms / 1000)
+            aborted = True
+            return time.monotonic()
+
+        flag_task = asyncio.ensure_future(set_flag())
+        stream = llm.response_async()
+        async with contextlib.aclosing(stream):
+            async for _ in stream:
+                if aborted:
+                    break
+        return await flag_task
+
+    async def _llm_cooperative(self, llm, abort_ms):
+        abort = asyncio.get_running_loop().create_future()
+
+        def set_abort():
+            abort.set_result(time.monotonic())
+
+        asyncio.get_running_loop().call_later(abort_ms / 1000, set_abort)
+        stream = llm.response_async()
+        async with contextlib.aclosing(stream):
+            async for _ in iterate_until_aborted(stream, abort):
+                pass
+        return abort.result()
+
+    async def _llm_case(self, runner, first_token_ms, token_interval_ms, abort_ms):
+        llm = FakeLLM(first_token_ms, token_interval_ms)
+        aborted_at = await runner(llm, abort_ms)
+        # 打断时刻之前应当生成的token数
+        expected = 0
+        if abort_ms >= first_token_ms:
+            expected = int((abort_ms - first_token_ms) / token_interval_ms) + 1
+        return (llm.closed_at - aborted_at) * 1000, llm.generated - expected
+
+    async def _tts_case(self, cooperative):
+        """在线程中执行一次合成，打断后统计线程还被占用多久"""
+        tts = FakeTTS(self.synthesis_ms)
+        loop = asyncio.get_running_loop()
+
+        def synthesize():
+            try:
+                if cooperative:
+                    tts.run_synthesis(tts.text_to_speak("你好", None), "你好")
+                else:
+                    asyncio.run(tts.text_to_speak("你好", None))
+            except SynthesisCancelled:
+                pass
+            return time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = loop.run_in_executor(executor, synthesize)
+            await asyncio.sleep(self.tts_abort_ms / 1000)
+            aborted_at = time.monotonic()
+            if cooperative:
+                await tts.cancel_synthesis()
+            finished_at = await future
+        return (finished_at - aborted_at) * 1000
+
+    async def run(self):
+        results = []
+        for name, first_token_ms, token_interval_ms, abort_ms in SCENARIOS:
+            for mode, runner in (
+                ("标志位", self._llm_legacy),
+                ("协作取消", self._llm_cooperative),
+            ):
+                close_ms, extra_tokens = await self._llm_case(
+                    runner, first_token_ms, token_interval_ms, abort_ms
+                )
+                results.append([name, mode, f"{close_ms:.1f}", extra_tokens])
+        for mode, cooperative in (("标志位", False), ("协作取消", True)):
+            busy_ms = await self._tts_case(cooperative)
+            results.append([f"合成中打断({self.synthesis_ms}ms)", mode, f"{busy_ms:.1f}", "-"])
+        print(
+            tabulate(
+                results,
+                headers=["场景", "打断方式", "打断到停止(ms)", "打断后多生成token"],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="打断测试")
+    parser.add_argument("--synthesis-ms", type=int, default=800, help="模拟单句合成耗时")
+    parser.add_argument("--tts-abort-ms", type=int, default=200, help="合成开始后多久打断")
+    args, _ = parser.parse_known_args()
+    tester = BargeInPerformanceTester(args.synthesis_ms, args.tts_abort_ms)
+    asyncio.run(tester.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import copy
+import time
+import tracemalloc
+import yaml
+from tabulate import tabulate
+from core.utils.config_overlay import ConfigOverlay
+
+description = "连接配置内存测试（每个连接深拷贝配置 vs 配置覆盖层）"
+
+
+class ConfigOverlayPerformanceTester:
+    def __init__(self, connections=1000):
+        self.connections = connections
+        project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(project_dir, "config.yaml"), "r", encoding="utf-8") as f:
+            self.config = yaml.safe_load(f)
+        # 模拟智控台下发的差异化配置：每个连接各自的TTS/LLM和提示词
+        self.private_config = {
+            "TTS": {"TTS_private": {"type": "edge", "voice": "zh-CN-XiaoxiaoNeural"}},
+            "LLM": {"LLM_private": {"type": "openai", "model_name": "qwen-turbo"}},
+            "prompt": "你是一个叫小智的台湾女孩" * 20,
+        }
+        self.results = []
+
+    def _apply_private_config(self, config):
+        """与ConnectionHandler._apply_private_config相同的写入方式"""
+        config["selected_module"] = dict(config["selected_module"])
+        for module in ("TTS", "LLM"):
+            config[module] = copy.deepcopy(self.private_config[module])
+            config["selected_module"][module] = next(iter(self.private_config[module]))
+        config["prompt"] = self.private_config["prompt"]
+
+    def _measure(self, name, create):
+        tracemalloc.start()
+        begin = time.perf_counter()
+        configs = []
+        for _ in range(self.connections):
+            config = create()
+            self._apply_private_config(config)
+            configs.append(config)
+        elapsed = time.perf_counter() - begin
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.results.append(
+            [
+                name,
+                f"{current / self.connections / 1024:.1f}",
+                f"{current / 1024 / 1024:.1f}",
+                f"{elapsed / self.connections * 1e6:.1f}",
+            ]
+        )
+        return configs
+
+    def run(self):
+        deepcopied = self._measure("copy.deepcopy", lambda: copy.deepcopy(self.config))
+        overlays = self._measure("ConfigOverlay", lambda: ConfigOverlay(self.config))
+
+        # 两种方式读出的配置应完全一致，且覆盖层不修改共享配置
+        assert copy.deepcopy(overlays[0]) == deepcopied[0]
+        assert self.config["selected_module"]["TTS"] != "TTS_private"
+
+        print(f"\n连接数: {self.connections}")
+        print(
+            tabulate(
+                self.results,
+                headers=["方式", "每连接内存(KB)", "总内存(MB)", "每连接耗时(us)"],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="连接配置内存测试")
+    parser.add_argument("--connections", type=int, default=1000, help="模拟连接数")
+    args, _ = parser.parse_known_args()
+    ConfigOverlayPerformanceTester(args.connections).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import time
+from tabulate import tabulate
+from core.utils.dialogue import Dialogue, Message, estimate_messages_tokens
+
+description = "对话窗口token预算测试（长对话中每轮提示词大小和渲染耗时）"
+
+
+class DialogueWindowPerformanceTester:
+    def __init__(self, turns=200, token_budget=4000, tool_every=5):
+        self.turns = turns
+        self.token_budget = token_budget
+        self.tool_every = tool_every
+        project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(
+            os.path.join(project_dir, "agent-base-prompt.txt"), "r", encoding="utf-8"
+        ) as f:
+            self.prompt = f.read()
+
+    def _put_turn(self, dialogue: Dialogue, turn: int):
+        dialogue.put(Message(role="user", content=f"第{turn}轮：帮我查一下明天的天气和日程安排"))
+        if self.tool_every and turn % self.tool_every == 0:
+            call_id = f"call_{turn}"
+            dialogue.put(
+                Message(
+                    role="assistant",
+                    tool_calls=[
+                        {
+                            "id": call_id,
+                            "function": {"arguments": "{}", "name": "get_weather"},
+                            "type": "function",
+                            "index": 0,
+                        }
+                    ],
+                )
+            )
+            dialogue.put(
+                Message(role="tool", tool_call_id=call_id, content="晴，15到24度，微风。" * 8)
+            )
+        dialogue.put(
+            Message(role="assistant", content="明天天气晴朗，上午十点有一个会议。" * 4)
+        )
+
+    @staticmethod
+    def _check_tool_pairs(messages):
+        """检查每个工具结果前面都有对应的工具调用"""
+        call_ids = set()
+        for m in messages:
+            for call in m.get("tool_calls") or []:
+                call_ids.add(call["id"])
+            if m["role"] == "tool" and m["tool_call_id"] not in call_ids:
+                return False
+        return True
+
+    def _simulate(self, name, token_budget):
+        dialogue = Dialogue()
+        dialogue.update_system_message(self.prompt)
+        dialogue.set_token_budget(token_budget)
+        checkpoints = {10, 50, 100, self.turns}
+        rows = []
+        render_time = 0.0
+        pairs_ok = True
+        for turn in range(1, self.turns + 1):
+            self._put_turn(dialogue, turn)
+            begin = time.perf_counter()
+            messages = dialogue.get_llm_dialogue_with_memory("用户喜欢听音乐", {})
+            tokens = estimate_messages_tokens(messages)
+            render_time += time.perf_counter() - begin
+            pairs_ok = pairs_ok and self._check_tool_pairs(messages)
+            if dialogue.trim_to_budget():
+                # 模拟后台总结完成
+                dialogue.update_summary(dialogue.fallback_summary(dialogue.pending_evicted))
+                dialogue.pending_evicted = []
+            if turn in checkpoints:
+                rows.append([name, turn, len(messages), tokens])
+        return rows, render_time / self.turns * 1e6, pairs_ok
+
+    def run(self):
+        results = []
+        summary = []
+        for name, budget in (("不限制", None), (f"预算{self.token_budget}", self.token_budget)):
+            rows, render_us, pairs_ok = self._simulate(name, budget)
+            results.extend(rows)
+            summary.append([name, f"{render_us:.1f}", "是" if pairs_ok else "否"])
+        print(f"\n对话轮数: {self.turns}，每{self.tool_every}轮调用一次工具")
+        print(
+            tabulate(
+                results,
+                headers=["对话窗口", "轮次", "消息数", "提示词估算tokens"],
+                tablefmt="grid",
+            )
+        )
+        print(
+            tabulate(
+                summary,
+                headers=["对话窗口", "每轮渲染耗时(us)", "工具调用成对完整"],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="对话窗口token预算测试")
+    parser.add_argument("--turns", type=int, default=200, help="对话轮数")
+    parser.add_argument("--token-budget", type=int, default=4000, help="token预算")
+    parser.add_argument("--tool-every", type=int, default=5, help="每隔几轮调用一次工具")
+    args, _ = parser.parse_known_args()
+    DialogueWindowPerformanceTester(args.turns, args.token_budget, args.tool_every).run()
+
+
+if __name__ == "__main__":
+    main()
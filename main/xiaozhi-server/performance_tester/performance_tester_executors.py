@@ -0,0 +1,127 @@
+import time
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+from core.utils.executors import BACKGROUND, INTERACTIVE, QoSExecutor
+
+description = "共享线程池QoS调度测试（后台任务积压时的实时任务等待时间）"
+
+
+class ExecutorQoSPerformanceTester:
+    def __init__(
+        self,
+        workers=16,
+        background_tasks=400,
+        interactive_tasks=200,
+        task_ms=20,
+        background_limit=4,
+    ):
+        self.workers = workers
+        self.background_tasks = background_tasks
+        self.interactive_tasks = interactive_tasks
+        self.task_ms = task_ms
+        self.background_limit = background_limit
+        self.results = []
+
+    def _run_load(self, submit_background, submit_interactive):
+        """先灌入大量后台任务，再按固定间隔提交实时任务，统计实时任务的排队时间"""
+        waits = []
+        lock = threading.Lock()
+
+        def work(submitted_at=None):
+            if submitted_at is not None:
+                with lock:
+                    waits.append((time.perf_counter() - submitted_at) * 1000)
+            time.sleep(self.task_ms / 1000)
+
+        begin = time.perf_counter()
+        background = [submit_background(work) for _ in range(self.background_tasks)]
+        interactive = []
+        for _ in range(self.interactive_tasks):
+            interactive.append(submit_interactive(work, time.perf_counter()))
+            time.sleep(self.task_ms / 1000 / 4)
+        for future in interactive:
+            future.result()
+        interactive_done = time.perf_counter() - begin
+        for future in background:
+            future.result()
+        return waits, interactive_done, time.perf_counter() - begin
+
+    def _record(self, name, waits, interactive_done, total):
+        ordered = sorted(waits)
+        self.results.append(
+            [
+                name,
+                f"{statistics.mean(ordered):.1f}",
+                f"{ordered[int(len(ordered) * 0.99) - 1]:.1f}",
+                f"{interactive_done:.2f}",
+                f"{total:.2f}",
+            ]
+        )
+
+    def run(self):
+        # 原有方式：一个不分等级的线程池
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self._record(
+                "ThreadPoolExecutor(不分等级)",
+                *self._run_load(pool.submit, pool.submit),
+            )
+
+        pool = QoSExecutor(
+            max_workers=self.workers,
+            class_limits={BACKGROUND: self.background_limit},
+        )
+        self._record(
+            "QoSExecutor(interactive优先)",
+            *self._run_load(
+                lambda fn, *args: pool.submit(BACKGROUND, fn, *args),
+                lambda fn, *args: pool.submit(INTERACTIVE, fn, *args),
+            ),
+        )
+        stats = pool.get_stats()
+        pool.shutdown()
+
+        print(
+            f"\n线程数: {self.workers}，后台任务: {self.background_tasks}，"
+            f"实时任务: {self.interactive_tasks}，单任务耗时: {self.task_ms}ms"
+        )
+        print(
+            tabulate(
+                self.results,
+                headers=[
+                    "线程池",
+                    "实时任务平均排队(ms)",
+                    "实时任务P99排队(ms)",
+                    "实时任务完成(s)",
+                    "全部完成(s)",
+                ],
+                tablefmt="grid",
+            )
+        )
+        print(f"QoSExecutor统计: {stats['classes']}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="共享线程池QoS调度测试")
+    parser.add_argument("--workers", type=int, default=16, help="线程数")
+    parser.add_argument("--background", type=int, default=400, help="后台任务数")
+    parser.add_argument("--interactive", type=int, default=200, help="实时任务数")
+    parser.add_argument("--task-ms", type=int, default=20, help="单个任务耗时(ms)")
+    parser.add_argument(
+        "--background-limit", type=int, default=4, help="后台任务并发上限"
+    )
+    args, _ = parser.parse_known_args()
+    ExecutorQoSPerformanceTester(
+        args.workers,
+        args.background,
+        args.interactive,
+        args.task_ms,
+        args.background_limit,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
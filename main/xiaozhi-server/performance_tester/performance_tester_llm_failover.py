@@ -0,0 +1,185 @@
+import time
+import random
+import asyncio
+from tabulate import tabulate
+from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.failover.failover import LLMProvider as FailoverLLM
+
+description = "LLM故障转移测试（主LLM偶发慢、宕机时的首token耗时分布）"
+
+# 场景: (名称, 主LLM配置, 备用LLM配置)
+# 配置: 正常首token耗时ms, 慢请求比例, 慢请求首token耗时ms, 出错比例
+SCENARIOS = [
+    (
+        "主LLM偶发慢",
+        {"ttft_ms": 150, "slow_ratio": 0.1, "slow_ms": 3000, "error_ratio": 0.05},
+        {"ttft_ms": 300, "slow_ratio": 0, "slow_ms": 0, "error_ratio": 0},
+    ),
+    (
+        "主LLM无响应",
+        {"ttft_ms": 150, "slow_ratio": 1, "slow_ms": 10000, "error_ratio": 0},
+        {"ttft_ms": 300, "slow_ratio": 0, "slow_ms": 0, "error_ratio": 0},
+    ),
+]
+
+
+class FakeBackendLLM(LLMProviderBase):
+    """按配置的首token耗时和出错比例输出的模拟LLM，同一请求在各模式下的表现相同"""
+
+    def __init__(self, config):
+        self.name = config["name"]
+        self.ttft_ms = config["ttft_ms"]
+        self.slow_ratio = config["slow_ratio"]
+        self.slow_ms = config["slow_ms"]
+        self.error_ratio = config["error_ratio"]
+        self.calls = 0
+
+    def _plan(self, session_id):
+        rng = random.Random(f"{self.name}-{session_id}")
+        if rng.random() < self.error_ratio:
+            return self.ttft_ms, True
+        if rng.random() < self.slow_ratio:
+            return self.slow_ms, False
+        return self.ttft_ms * rng.uniform(0.8, 1.5), False
+
+    def response(self, session_id, dialogue, **kwargs):
+        self.calls += 1
+        delay_ms, error = self._plan(session_id)
+        time.sleep(delay_ms / 1000)
+        if error:
+            yield "【FakeLLM服务响应异常】"
+            return
+        for _ in range(10):
+            yield "好"
+
+    async def response_async(self, session_id, dialogue, **kwargs):
+        self.calls += 1
+        delay_ms, error = self._plan(session_id)
+        await asyncio.sleep(delay_ms / 1000)
+        if error:
+            yield "【FakeLLM服务响应异常】"
+            return
+        for _ in range(10):
+            yield "好"
+            await asyncio.sleep(0.02)
+
+
+class FakeFailoverLLM(FailoverLLM):
+    def _create_backend(self, backend_type, backend_config):
+        return FakeBackendLLM(backend_config)
+
+
+class LLMFailoverPerformanceTester:
+    def __init__(self, requests=60, interval_ms=100, timeout_ms=1000, hedge_ms=400):
+        self.requests = requests
+        self.interval_ms = interval_ms
+        self.timeout_ms = timeout_ms
+        self.hedge_ms = hedge_ms
+
+    def _modes(self):
+        return [
+            ("单一LLM", None),
+            ("故障转移", {"first_token_timeout_ms": self.timeout_ms}),
+            (
+                f"故障转移+对冲({self.hedge_ms}ms)",
+                {"first_token_timeout_ms": self.timeout_ms, "hedge_after_ms": self.hedge_ms},
+            ),
+            (
+                "故障转移+对冲(auto)",
+                {"first_token_timeout_ms": self.timeout_ms, "hedge_after_ms": "auto"},
+            ),
+        ]
+
+    async def _request(self, llm, index):
+        """按间隔依次发起请求，返回(首token耗时ms, 是否失败)"""
+        await asyncio.sleep(index * self.interval_ms / 1000)
+        start = time.monotonic()
+        ttft = None
+        failed = True
+        async for item in llm.response_async(f"req-{index}", []):
+            if ttft is None:
+                ttft = (time.monotonic() - start) * 1000
+                failed = item.startswith("【")
+        if ttft is None:
+            ttft = (time.monotonic() - start) * 1000
+        return ttft, failed
+
+    async def _simulate(self, scenario, primary, secondary, mode, options):
+        backend_configs = {
+            "PrimaryLLM": {"name": "PrimaryLLM", **primary},
+            "SecondaryLLM": {"name": "SecondaryLLM", **secondary},
+        }
+        if options is None:
+            llm = FakeBackendLLM(backend_configs["PrimaryLLM"])
+            backends = [llm]
+        else:
+            llm = FakeFailoverLLM({"backend_configs": backend_configs, **options})
+            backends = [backend.provider for backend in llm.backends]
+        results = await asyncio.gather(
+            *(self._request(llm, i) for i in range(self.requests))
+        )
+        ttfts = sorted(ttft for ttft, _ in results)
+
+        def percentile(p):
+            return ttfts[min(len(ttfts) - 1, int(len(ttfts) * p))]
+
+        stats = llm.get_stats() if options is not None else None
+        return [
+            scenario,
+            mode,
+            f"{percentile(0.5):.0f}",
+            f"{percentile(0.9):.0f}",
+            f"{percentile(0.99):.0f}",
+            f"{ttfts[-1]:.0f}",
+            sum(1 for _, failed in results if failed),
+            sum(backend.calls for backend in backends) - self.requests,
+            stats["backends"]["PrimaryLLM"]["circuit_opened"] if stats else "-",
+        ]
+
+    async def run(self):
+        results = []
+        for scenario, primary, secondary in SCENARIOS:
+            for mode, options in self._modes():
+                results.append(
+                    await self._simulate(scenario, primary, secondary, mode, options)
+                )
+        print(
+            f"\n请求数: {self.requests}，请求间隔 {self.interval_ms}ms，"
+            f"首token超时 {self.timeout_ms}ms"
+        )
+        print(
+            tabulate(
+                results,
+                headers=[
+                    "场景",
+                    "模式",
+                    "首token p50(ms)",
+                    "p90(ms)",
+                    "p99(ms)",
+                    "最大(ms)",
+                    "失败请求",
+                    "额外请求",
+                    "熔断次数",
+                ],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM故障转移测试")
+    parser.add_argument("--requests", type=int, default=60, help="请求数")
+    parser.add_argument("--interval-ms", type=int, default=100, help="请求间隔")
+    parser.add_argument("--timeout-ms", type=int, default=1000, help="首token超时")
+    parser.add_argument("--hedge-ms", type=int, default=400, help="对冲等待时间")
+    args, _ = parser.parse_known_args()
+    tester = LLMFailoverPerformanceTester(
+        args.requests, args.interval_ms, args.timeout_ms, args.hedge_ms
+    )
+    asyncio.run(tester.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import timeit
+from tabulate import tabulate
+from core.utils.mqtt_framing import HEADER, HEADER_SIZE, pack_packet, parse_header
+
+description = "MQTT网关音频包组包/解包微基准测试"
+
+
+def legacy_pack(opus_packet, timestamp, sequence):
+    """原有组包方式：bytearray头部再与负载拼接"""
+    header = bytearray(16)
+    header[0] = 1
+    header[2:4] = len(opus_packet).to_bytes(2, "big")
+    header[4:8] = sequence.to_bytes(4, "big")
+    header[8:12] = timestamp.to_bytes(4, "big")
+    header[12:16] = len(opus_packet).to_bytes(4, "big")
+    return bytes(header) + opus_packet
+
+
+def legacy_parse(message):
+    """原有解包方式：逐字段切片后转换"""
+    sequence = int.from_bytes(message[4:8], "big")
+    timestamp = int.from_bytes(message[8:12], "big")
+    audio_length = int.from_bytes(message[12:16], "big")
+    return sequence, timestamp, message[16 : 16 + audio_length]
+
+
+class PacketWriter:
+    """对照组：复用同一块缓冲区组包，返回memoryview"""
+
+    def __init__(self, initial_size: int = 1024):
+        self._buffer = bytearray(HEADER_SIZE + initial_size)
+        self._view = memoryview(self._buffer)
+
+    def pack(
+        self,
+        payload,
+        timestamp: int,
+        sequence: int,
+        packet_type: int = 1,
+    ) -> memoryview:
+        size = len(payload)
+        total = HEADER_SIZE + size
+        if len(self._buffer) < total:
+            self._buffer = bytearray(total)
+            self._view = memoryview(self._buffer)
+        HEADER.pack_into(
+            self._buffer, 0, packet_type, size, sequence, timestamp, size
+        )
+        self._buffer[HEADER_SIZE:total] = payload
+        return self._view[:total]
+
+
+class MqttFramingPerformanceTester:
+    def __init__(self, number=200000, payload_size=120):
+        self.number = number
+        self.payload = os.urandom(payload_size)
+        self.results = []
+
+    def _bench(self, name, func):
+        seconds = timeit.timeit(func, number=self.number)
+        self.results.append(
+            [name, f"{seconds / self.number * 1e9:.0f}", f"{self.number / seconds:,.0f}"]
+        )
+
+    def run(self):
+        payload = self.payload
+        writer = PacketWriter()
+        message = legacy_pack(payload, 123456, 42)
+
+        # 先校验新旧实现的结果一致
+        assert bytes(pack_packet(payload, 123456, 42)) == message
+        assert bytes(writer.pack(payload, 123456, 42)) == message
+        _, sequence, timestamp, _, payload_end = parse_header(message)
+        assert (
+            sequence,
+            timestamp,
+            message[HEADER_SIZE:payload_end],
+        ) == legacy_parse(message)
+
+        self._bench("组包: bytearray头部+拼接(原有)", lambda: legacy_pack(payload, 123456, 42))
+        self._bench("组包: pack_packet单次分配", lambda: pack_packet(payload, 123456, 42))
+        self._bench("组包: PacketWriter复用缓冲区", lambda: writer.pack(payload, 123456, 42))
+        self._bench("解包: 切片+int.from_bytes(原有)", lambda: legacy_parse(message))
+        self._bench("解包: parse_header原地解析头部", lambda: parse_header(message))
+        self._bench(
+            "解包: parse_header+负载切片",
+            lambda: message[HEADER_SIZE : parse_header(message)[4]],
+        )
+
+        print(f"\n负载大小: {len(payload)}字节，每项执行次数: {self.number}")
+        print(
+            tabulate(
+                self.results,
+                headers=["操作", "单次耗时(ns)", "每秒次数"],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MQTT网关音频包组包/解包微基准测试")
+    parser.add_argument("--number", type=int, default=200000, help="每项执行次数")
+    parser.add_argument("--payload-size", type=int, default=120, help="opus负载字节数")
+    args, _ = parser.parse_known_args()
+    MqttFramingPerformanceTester(args.number, args.payload_size).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import math
+import time
+import numpy as np
+import opuslib_next
+from tabulate import tabulate
+from core.utils.opus_encoder_utils import OpusEncoderUtils, ENCODER_PROFILES
+
+description = "Opus编码器吞吐测试（每核每秒编码帧数）"
+
+
+class LegacyOpusEncoder:
+    """旧实现：每次调用用np.append拼接缓冲区，再按帧切片编码"""
+
+    def __init__(self, sample_rate, channels, frame_size_ms):
+        self.frame_size = sample_rate * frame_size_ms // 1000
+        self.total_frame_size = self.frame_size * channels
+        self.buffer = np.array([], dtype=np.int16)
+        self.encoder = opuslib_next.Encoder(
+            sample_rate, channels, opuslib_next.APPLICATION_AUDIO
+        )
+        self.encoder.bitrate = 24000
+        self.encoder.complexity = 10
+        self.encoder.signal = opuslib_next.constants.SIGNAL_VOICE
+
+    def encode_pcm_to_opus_stream(self, pcm_data, end_of_stream, callback):
+        self.buffer = np.append(self.buffer, np.frombuffer(pcm_data, dtype=np.int16))
+        offset = 0
+        while offset <= len(self.buffer) - self.total_frame_size:
+            frame = self.buffer[offset : offset + self.total_frame_size]
+            callback(self.encoder.encode(frame.tobytes(), self.frame_size))
+            offset += self.total_frame_size
+        self.buffer = self.buffer[offset:]
+
+
+class OpusEncoderPerformanceTester:
+    def __init__(self, seconds=60, chunk_bytes=4096, sample_rate=16000):
+        self.seconds = seconds
+        self.chunk_bytes = chunk_bytes
+        self.sample_rate = sample_rate
+        self.pcm = self._make_pcm()
+
+    def _make_pcm(self):
+        """生成带谐波的测试语音信号"""
+        t = np.arange(self.sample_rate * self.seconds) / self.sample_rate
+        signal = sum(
+            np.sin(2 * math.pi * f * t) / (i + 1)
+            for i, f in enumerate((220, 440, 880, 1760))
+        )
+        return (signal / 2 * 20000).astype(np.int16).tobytes()
+
+    def _bench(self, encoder):
+        """按上游TTS的分块粒度喂入PCM，返回 (帧数, CPU耗时, 墙钟耗时)"""
+        frames = 0
+
+        def count(_):
+            nonlocal frames
+            frames += 1
+
+        cpu_begin, wall_begin = time.process_time(), time.perf_counter()
+        for i in range(0, len(self.pcm), self.chunk_bytes):
+            encoder.encode_pcm_to_opus_stream(
+                self.pcm[i : i + self.chunk_bytes], False, count
+            )
+        return (
+            frames,
+            time.process_time() - cpu_begin,
+            time.perf_counter() - wall_begin,
+        )
+
+    def run(self):
+        rows = []
+        cases = [("legacy(np.append)", LegacyOpusEncoder(self.sample_rate, 1, 60))]
+        cases += [
+            (profile, OpusEncoderUtils(self.sample_rate, 1, 60, profile=profile))
+            for profile in ENCODER_PROFILES
+        ]
+        for name, encoder in cases:
+            frames, cpu, wall = self._bench(encoder)
+            rows.append(
+                [
+                    name,
+                    frames,
+                    f"{frames / cpu:.0f}",
+                    f"{frames * 0.06 / cpu:.0f}",
+                    f"{wall:.2f}",
+                ]
+            )
+        print(
+            f"\n音频时长: {self.seconds}秒，采样率: {self.sample_rate}Hz，"
+            f"输入分块: {self.chunk_bytes}字节"
+        )
+        print(
+            tabulate(
+                rows,
+                headers=["编码档位", "帧数", "每核每秒帧数", "每核实时倍数", "墙钟(秒)"],
+                tablefmt="grid",
+            )
+        )
+        print("每核实时倍数：单个CPU核心可同时支撑的60ms帧实时音频流数量")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Opus编码器吞吐测试")
+    parser.add_argument("--seconds", type=int, default=60, help="测试音频时长(秒)")
+    parser.add_argument("--chunk", type=int, default=4096, help="每次喂入的PCM字节数")
+    args, _ = parser.parse_known_args()
+    OpusEncoderPerformanceTester(args.seconds, args.chunk).run()
+
+
+if __name__ == "__main__":
+    main()
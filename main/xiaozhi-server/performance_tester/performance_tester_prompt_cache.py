@@ -0,0 +1,109 @@
+import os
+import re
+import json
+import time
+from datetime import datetime
+from unittest import mock
+from tabulate import tabulate
+from core.utils.dialogue import Dialogue, Message
+
+description = "提示词前缀稳定性测试（多轮对话中可被上游前缀缓存复用的比例）"
+
+
+def render_legacy(dialogue: Dialogue, memory_str: str):
+    """旧的渲染方式：时间和记忆直接替换在系统提示词中"""
+    messages = []
+    system_message = next((m for m in dialogue.dialogue if m.role == "system"), None)
+    if system_message:
+        prompt = system_message.content.replace(
+            "{{current_time}}", datetime.now().strftime("%H:%M")
+        )
+        prompt = re.sub(
+            r"<memory>.*?</memory>",
+            f"<memory>\n{memory_str}\n</memory>",
+            prompt,
+            flags=re.DOTALL,
+        )
+        messages.append({"role": "system", "content": prompt})
+    for m in dialogue.dialogue:
+        if m.role != "system":
+            messages.append({"role": m.role, "content": m.content})
+    return messages
+
+
+class PromptCachePerformanceTester:
+    def __init__(self, turns=20, minutes_per_turn=1):
+        self.turns = turns
+        self.minutes_per_turn = minutes_per_turn
+        project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(
+            os.path.join(project_dir, "agent-base-prompt.txt"), "r", encoding="utf-8"
+        ) as f:
+            self.prompt = f.read()
+        self.results = []
+
+    def _simulate(self, name, render):
+        dialogue = Dialogue()
+        dialogue.update_system_message(self.prompt)
+        previous = None
+        reused_chars = total_chars = 0
+        render_time = 0.0
+        for turn in range(self.turns):
+            dialogue.put(Message(role="user", content=f"第{turn}轮的问题，今天天气怎么样？"))
+            # 每轮的记忆总结和时间都会变化
+            memory_str = f"用户喜欢听音乐，已经聊了{turn}轮"
+            now = datetime(2025, 1, 1, 8, 0).replace(
+                minute=(turn * self.minutes_per_turn) % 60
+            )
+            with mock.patch("core.utils.dialogue.datetime") as mocked:
+                mocked.now.return_value = now
+                begin = time.perf_counter()
+                messages = render(dialogue, memory_str)
+                render_time += time.perf_counter() - begin
+            request = json.dumps(messages, ensure_ascii=False)
+            if previous is not None:
+                common = len(os.path.commonprefix([previous, request]))
+                reused_chars += common
+                total_chars += len(request)
+            previous = request
+            dialogue.put(Message(role="assistant", content=f"第{turn}轮的回答。" * 5))
+        self.results.append(
+            [
+                name,
+                f"{reused_chars / total_chars * 100:.1f}%",
+                f"{render_time / self.turns * 1e6:.1f}",
+            ]
+        )
+        return dialogue
+
+    def run(self):
+        self._simulate("系统提示词内替换", render_legacy)
+        dialogue = self._simulate(
+            "易变段落后置",
+            lambda d, memory_str: d.get_llm_dialogue_with_memory(memory_str, {}),
+        )
+        print(f"\n对话轮数: {self.turns}")
+        print(
+            tabulate(
+                self.results,
+                headers=["提示词布局", "可复用前缀占比", "每轮渲染耗时(us)"],
+                tablefmt="grid",
+            )
+        )
+        print(f"前缀稳定性统计: {dialogue.get_prefix_stats()}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="提示词前缀稳定性测试")
+    parser.add_argument("--turns", type=int, default=20, help="对话轮数")
+    parser.add_argument(
+        "--minutes-per-turn", type=int, default=1, help="每轮对话间隔的分钟数"
+    )
+    args, _ = parser.parse_known_args()
+    PromptCachePerformanceTester(args.turns, args.minutes_per_turn).run()
+
+
+if __name__ == "__main__":
+    main()
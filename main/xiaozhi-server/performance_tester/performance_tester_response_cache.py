@@ -0,0 +1,109 @@
+import time
+import random
+from tabulate import tabulate
+from core.utils.response_cache import ResponseCache
+
+description = "LLM回复缓存测试（设备群重复问题的命中率和查询耗时）"
+
+# 每组为同一个问题的不同说法，第一种最常见
+QUESTIONS = [
+    ["讲个笑话", "讲个笑话吧", "给我讲个笑话"],
+    ["你是谁", "你是谁呀", "你叫什么名字"],
+    ["音量调大一点", "把音量调大一点", "声音大一点"],
+    ["音量调小一点", "把音量调小一点", "声音小一点"],
+    ["唱首歌", "给我唱首歌", "唱一首歌吧"],
+    ["你好", "你好呀", "你好啊"],
+    ["晚安", "晚安啦", "晚安晚安"],
+    ["讲个故事", "给我讲个故事", "讲一个故事吧"],
+    ["现在几点了", "几点了", "现在几点"],
+    ["今天天气怎么样", "今天天气如何", "今天天气好吗"],
+]
+PROMPT = "你是小智，一个活泼可爱的语音助手"
+
+
+class ResponseCachePerformanceTester:
+    def __init__(self, queries=5000, long_tail=0.5, seed=1):
+        self.queries = queries
+        self.long_tail = long_tail
+        self.seed = seed
+
+    def _query_stream(self):
+        """高频问题按Zipf分布出现，其余是各不相同的长尾问题，每种模式使用相同的请求序列"""
+        rng = random.Random(self.seed)
+        weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+        for i in range(self.queries):
+            if rng.random() < self.long_tail:
+                yield f"帮我查一下第{i}号快递到哪了"
+                continue
+            variants = rng.choices(QUESTIONS, weights)[0]
+            yield rng.choices(variants, [6, 3, 1])[0]
+
+    def _simulate(self, name, similarity_threshold):
+        cache = ResponseCache(
+            {
+                "enabled": True,
+                "similarity_threshold": similarity_threshold,
+                "ttl_rules": [{"keywords": ["几点", "天气"], "ttl": 0}],
+            }
+        )
+        context = cache.context_key(PROMPT, "ChatGLMLLM", [])
+        llm_calls = 0
+        lookup_time = 0.0
+        for query in self._query_stream():
+            begin = time.perf_counter()
+            normalized = cache.cacheable(query, PROMPT)
+            response = cache.get(context, normalized) if normalized else None
+            lookup_time += time.perf_counter() - begin
+            if response is None:
+                llm_calls += 1
+                if normalized:
+                    cache.put(context, normalized, f"关于「{query}」的回答")
+        stats = cache.get_stats()
+        return [
+            name,
+            self.queries,
+            llm_calls,
+            f"{(1 - llm_calls / self.queries) * 100:.1f}%",
+            stats["exact_hits"],
+            stats["similar_hits"],
+            f"{lookup_time / self.queries * 1e6:.1f}",
+        ]
+
+    def run(self):
+        results = [
+            self._simulate("关闭", None),
+            self._simulate("精确匹配", 0),
+            self._simulate("精确+相似(0.9)", 0.9),
+            self._simulate("精确+相似(0.8)", 0.8),
+        ]
+        # 关闭缓存时所有请求都调用LLM
+        results[0][2:7] = [self.queries, "0.0%", 0, 0, "0.0"]
+        print(
+            tabulate(
+                results,
+                headers=[
+                    "缓存",
+                    "请求数",
+                    "LLM调用",
+                    "节省比例",
+                    "精确命中",
+                    "相似命中",
+                    "每次查询(us)",
+                ],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM回复缓存测试")
+    parser.add_argument("--queries", type=int, default=5000, help="请求数")
+    parser.add_argument("--long-tail", type=float, default=0.5, help="长尾问题占比")
+    args, _ = parser.parse_known_args()
+    ResponseCachePerformanceTester(args.queries, args.long_tail).run()
+
+
+if __name__ == "__main__":
+    main()
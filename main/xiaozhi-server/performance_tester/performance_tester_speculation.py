@@ -0,0 +1,149 @@
+import time
+import asyncio
+import statistics
+from tabulate import tabulate
+from core.utils.dialogue import Dialogue
+from core.utils.speculation import SpeculativeChat
+
+description = "投机请求测试（流式ASR中间结果提前发起LLM请求的首token延迟和命中率）"
+
+# (中间结果序列, 最终结果)，中间结果按固定间隔到达，最后一个中间结果之后经过句尾静音给出最终结果
+UTTERANCES = [
+    (["今天", "今天天气", "今天天气怎么样"], "今天天气怎么样？"),
+    (["帮我", "帮我放", "帮我放一首歌"], "帮我放一首歌。"),
+    (["讲个", "讲个笑话"], "讲个笑话吧"),
+    (["明天", "明天早上", "明天早上七点"], "明天早上七点叫我起床"),
+    (["你叫", "你叫什么", "你叫什么名字"], "你叫什么名字？"),
+]
+
+
+class FakeLLM:
+    """固定首token延迟的模拟LLM"""
+
+    def __init__(self, first_token_ms, token_interval_ms=20, tokens=10):
+        self.first_token_ms = first_token_ms
+        self.token_interval_ms = token_interval_ms
+        self.tokens = tokens
+
+    async def response_async(self, session_id, dialogue, **kwargs):
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for _ in range(self.tokens):
+            yield "好的。"
+            await asyncio.sleep(self.token_interval_ms / 1000)
+
+
+class FakeConnection:
+    def __init__(self, llm):
+        self.loop = asyncio.get_running_loop()
+        self.llm = llm
+        self.voiceprint_provider = None
+        self.need_bind = False
+        self.close_after_chat = False
+        self.intent_type = "nointent"
+        self.intent = None
+        self.memory = None
+        self.dialogue = Dialogue()
+        self.dialogue.update_system_message("你是一个语音助手")
+        self.config = {}
+        self.session_id = "test"
+        self.pipeline_tasks = set()
+
+    async def wait_components_ready(self):
+        return
+
+    def get_chat_functions(self):
+        return None
+
+    def open_llm_stream(self, llm_dialogue, functions):
+        return self.llm.response_async(self.session_id, llm_dialogue)
+
+    def start_pipeline_task(self, coro):
+        task = self.loop.create_task(coro)
+        self.pipeline_tasks.add(task)
+        task.add_done_callback(self.pipeline_tasks.discard)
+        return task
+
+
+class SpeculationPerformanceTester:
+    def __init__(self, first_token_ms=800, partial_interval_ms=200, silence_ms=600, stable_ms=300):
+        self.first_token_ms = first_token_ms
+        self.partial_interval_ms = partial_interval_ms
+        self.silence_ms = silence_ms
+        self.stable_ms = stable_ms
+
+    async def _first_token_after_final(self, conn, speculative, partials, final):
+        """返回最终结果到达后到第一个token的耗时(ms)"""
+        for partial in partials:
+            if speculative:
+                speculative.on_partial(partial)
+            await asyncio.sleep(self.partial_interval_ms / 1000)
+        await asyncio.sleep(self.silence_ms / 1000)
+        start = time.monotonic()
+        speculation = speculative.take(final) if speculative else None
+        if speculation is not None:
+            await speculation.ready.wait()
+            stream = speculation.responses()
+        else:
+            stream = conn.open_llm_stream([], None)
+        async for _ in stream:
+            first_token_ms = (time.monotonic() - start) * 1000
+            break
+        await stream.aclose()
+        return first_token_ms
+
+    async def _run_mode(self, enabled):
+        conn = FakeConnection(FakeLLM(self.first_token_ms))
+        speculative = (
+            SpeculativeChat(conn, {"stable_ms": self.stable_ms}) if enabled else None
+        )
+        latencies = []
+        for partials, final in UTTERANCES:
+            latencies.append(
+                await self._first_token_after_final(conn, speculative, partials, final)
+            )
+        return latencies, speculative.get_stats() if speculative else None
+
+    async def run(self):
+        results = []
+        stats = None
+        for name, enabled in (("关闭", False), ("开启", True)):
+            latencies, mode_stats = await self._run_mode(enabled)
+            stats = mode_stats or stats
+            results.append(
+                [
+                    name,
+                    f"{statistics.mean(latencies):.0f}",
+                    f"{max(latencies):.0f}",
+                ]
+            )
+        print(
+            f"\nLLM首token {self.first_token_ms}ms，句尾静音 {self.silence_ms}ms，"
+            f"稳定判定 {self.stable_ms}ms"
+        )
+        print(
+            tabulate(
+                results,
+                headers=["投机请求", "最终结果后首token平均(ms)", "最大(ms)"],
+                tablefmt="grid",
+            )
+        )
+        print(f"投机请求统计: {stats}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="投机请求测试")
+    parser.add_argument("--first-token-ms", type=int, default=800, help="模拟LLM首token延迟")
+    parser.add_argument("--partial-interval-ms", type=int, default=200, help="中间结果间隔")
+    parser.add_argument("--silence-ms", type=int, default=600, help="句尾静音判定时长")
+    parser.add_argument("--stable-ms", type=int, default=300, help="中间结果稳定判定时长")
+    args, _ = parser.parse_known_args()
+    tester = SpeculationPerformanceTester(
+        args.first_token_ms, args.partial_interval_ms, args.silence_ms, args.stable_ms
+    )
+    asyncio.run(tester.run())
+
+
+if __name__ == "__main__":
+    main()
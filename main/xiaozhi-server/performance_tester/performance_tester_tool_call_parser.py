@@ -0,0 +1,132 @@
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+from tabulate import tabulate
+from core.utils.tool_call_parser import ToolCallAssembler
+
+description = "流式tool call解析测试（并行调用的参数完整时刻和解析耗时）"
+
+
+def build_stream(calls, chunk_chars, trailing_chunks):
+    """按OpenAI流式格式把多个并行调用的参数切成小段，调用依次输出，最后附带若干空chunk"""
+    chunks = []
+    for index, (name, arguments) in enumerate(calls):
+        text = json.dumps(arguments, ensure_ascii=False)
+        pieces = [text[i : i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        for i, piece in enumerate(pieces):
+            chunks.append(
+                [
+                    SimpleNamespace(
+                        index=index,
+                        id=f"call_{index}" if i == 0 else None,
+                        function=SimpleNamespace(
+                            name=name if i == 0 else None, arguments=piece
+                        ),
+                    )
+                ]
+            )
+    # 部分模型在调用之后还会输出usage等空chunk，流结束前还有一段时间
+    chunks.extend([[]] * trailing_chunks)
+    return chunks
+
+
+class ToolCallParserPerformanceTester:
+    def __init__(self, calls=3, chunk_chars=4, chunk_interval_ms=15, trailing_chunks=10):
+        self.calls = [
+            (
+                f"tool_{i}",
+                {"query": f"第{i}个查询" * 5, "options": {"limit": 10, "lang": "zh"}},
+            )
+            for i in range(calls)
+        ]
+        self.chunk_chars = chunk_chars
+        self.chunk_interval = chunk_interval_ms / 1000
+        self.trailing_chunks = trailing_chunks
+
+    async def _legacy(self, chunks):
+        """原实现：拼接第一个调用的参数，流结束后才处理"""
+        start = time.monotonic()
+        parse_time = 0.0
+        name = None
+        arguments = ""
+        for chunk in chunks:
+            await asyncio.sleep(self.chunk_interval)
+            begin = time.perf_counter()
+            if chunk:
+                if chunk[0].function.name is not None:
+                    name = name or chunk[0].function.name
+                if chunk[0].function.arguments is not None:
+                    arguments += chunk[0].function.arguments
+            parse_time += time.perf_counter() - begin
+        ready_ms = (time.monotonic() - start) * 1000
+        return [ready_ms], parse_time
+
+    async def _assembler(self, chunks):
+        start = time.monotonic()
+        parse_time = 0.0
+        assembler = ToolCallAssembler()
+        ready = []
+        for chunk in chunks:
+            await asyncio.sleep(self.chunk_interval)
+            begin = time.perf_counter()
+            completed = assembler.feed_deltas(chunk)
+            parse_time += time.perf_counter() - begin
+            for _ in completed:
+                ready.append((time.monotonic() - start) * 1000)
+        completed = assembler.finish()
+        ready.extend((time.monotonic() - start) * 1000 for _ in completed)
+        return ready, parse_time
+
+    async def run(self):
+        chunks = build_stream(self.calls, self.chunk_chars, self.trailing_chunks)
+        legacy_ready, legacy_parse = await self._legacy(chunks)
+        ready, parse = await self._assembler(chunks)
+        results = [
+            [
+                "拼接后流结束时处理",
+                1,
+                f"{legacy_ready[0]:.0f}",
+                f"{legacy_ready[0]:.0f}",
+                f"{legacy_parse / len(chunks) * 1e6:.2f}",
+            ],
+            [
+                "增量组装",
+                len(ready),
+                f"{ready[0]:.0f}",
+                f"{ready[-1]:.0f}",
+                f"{parse / len(chunks) * 1e6:.2f}",
+            ],
+        ]
+        print(f"\n并行调用: {len(self.calls)}个，共{len(chunks)}个chunk")
+        print(
+            tabulate(
+                results,
+                headers=[
+                    "方式",
+                    "识别到的调用数",
+                    "首个调用可执行(ms)",
+                    "最后一个调用可执行(ms)",
+                    "每chunk解析(us)",
+                ],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="流式tool call解析测试")
+    parser.add_argument("--calls", type=int, default=3, help="并行调用数")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="每个chunk的参数字符数")
+    parser.add_argument("--chunk-interval-ms", type=int, default=15, help="chunk间隔")
+    args, _ = parser.parse_known_args()
+    tester = ToolCallParserPerformanceTester(
+        args.calls, args.chunk_chars, args.chunk_interval_ms
+    )
+    asyncio.run(tester.run())
+
+
+if __name__ == "__main__":
+    main()
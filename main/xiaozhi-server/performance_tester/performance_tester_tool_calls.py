@@ -0,0 +1,112 @@
+import time
+import asyncio
+from types import SimpleNamespace
+from tabulate import tabulate
+from core.providers.tools.base import ToolType, ToolDefinition, ToolExecutor
+from core.providers.tools.unified_tool_manager import ToolManager
+from plugins_func.register import Action, ActionResponse
+
+description = "多函数调用测试（同一轮多个工具串行/并行执行的整轮耗时）"
+
+# 本地模拟工具：名称 -> 执行耗时(ms)，不访问外部服务
+FAKE_TOOLS = {
+    "get_weather": 600,
+    "get_news": 900,
+    "get_device_state": 300,
+    # 上游无响应的工具
+    "hang_tool": 8000,
+}
+
+SCENARIOS = [
+    ("天气+新闻+设备状态", ["get_weather", "get_news", "get_device_state"]),
+    ("天气+设备状态+无响应工具", ["get_weather", "get_device_state", "hang_tool"]),
+]
+
+
+class FakeToolExecutor(ToolExecutor):
+    """按固定耗时返回结果的模拟工具集"""
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+
+    async def execute(self, conn, tool_name, arguments):
+        await asyncio.sleep(self.latencies[tool_name] / 1000)
+        return ActionResponse(action=Action.REQLLM, result=f"{tool_name}的结果")
+
+    def get_tools(self):
+        return {
+            name: ToolDefinition(
+                name=name,
+                description={"type": "function", "function": {"name": name}},
+                tool_type=ToolType.SERVER_PLUGIN,
+            )
+            for name in self.latencies
+        }
+
+    def has_tool(self, tool_name):
+        return tool_name in self.latencies
+
+
+class ToolCallsPerformanceTester:
+    def __init__(self, llm_ms=700, timeout=2):
+        self.llm_ms = llm_ms
+        conn = SimpleNamespace(config={"tool_call": {"timeout": timeout}})
+        self.manager = ToolManager(conn)
+        self.manager.register_executor(
+            ToolType.SERVER_PLUGIN, FakeToolExecutor(FAKE_TOOLS)
+        )
+
+    async def _follow_up(self):
+        """模拟工具结果交给LLM后生成回复的耗时"""
+        await asyncio.sleep(self.llm_ms / 1000)
+
+    async def _sequential(self, names):
+        """原实现：逐个执行，每个结果各请求一次LLM，没有超时"""
+        start = time.monotonic()
+        for name in names:
+            await self.manager.executors[ToolType.SERVER_PLUGIN].execute(
+                None, name, {}
+            )
+            await self._follow_up()
+        return (time.monotonic() - start) * 1000, len(names), 0
+
+    async def _parallel(self, names):
+        start = time.monotonic()
+        results = await asyncio.gather(
+            *(self.manager.execute_tool(name, {}) for name in names)
+        )
+        await self._follow_up()
+        failed = sum(1 for result in results if result.action == Action.ERROR)
+        return (time.monotonic() - start) * 1000, 1, failed
+
+    async def run(self):
+        results = []
+        for scenario, names in SCENARIOS:
+            for mode, runner in (("串行", self._sequential), ("并行", self._parallel)):
+                total_ms, llm_calls, failed = await runner(names)
+                results.append([scenario, mode, f"{total_ms:.0f}", llm_calls, failed])
+        print(
+            f"\n工具耗时: {FAKE_TOOLS}(ms)，LLM生成回复 {self.llm_ms}ms，"
+            f"工具超时 {self.manager.get_tool_timeout('hang_tool'):.0f}秒"
+        )
+        print(
+            tabulate(
+                results,
+                headers=["场景", "执行方式", "整轮耗时(ms)", "LLM请求次数", "超时工具数"],
+                tablefmt="grid",
+            )
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="多函数调用测试")
+    parser.add_argument("--llm-ms", type=int, default=700, help="模拟LLM生成回复耗时")
+    parser.add_argument("--timeout", type=float, default=2, help="工具执行超时(秒)")
+    args, _ = parser.parse_known_args()
+    asyncio.run(ToolCallsPerformanceTester(args.llm_ms, args.timeout).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import json
+import time
+import asyncio
+import functools
+import statistics
+import websockets
+from tabulate import tabulate
+from core.utils.ws_session_pool import StreamSessionPool
+from core.providers.tts.huoshan_double_stream import (
+    Header,
+    Optional,
+    route_session_message,
+    FULL_CLIENT_REQUEST,
+    FULL_SERVER_RESPONSE,
+    AUDIO_ONLY_RESPONSE,
+    MsgTypeFlagWithEvent,
+    JSON,
+    EVENT_StartSession,
+    EVENT_FinishSession,
+    EVENT_CancelSession,
+    EVENT_TaskRequest,
+    EVENT_SessionStarted,
+    EVENT_SessionFinished,
+    EVENT_SessionCanceled,
+    EVENT_TTSSentenceStart,
+    EVENT_TTSSentenceEnd,
+    EVENT_TTSResponse,
+)
+
+description = "双流式TTS上游连接池会话启动延迟测试（本地模拟服务）"
+
+
+class FakeBidirectionalTTSServer:
+    """本地模拟火山双流式TTS的Header/Optional二进制协议
+
+    每条连接可以承载多个会话，握手时人为加入延迟以模拟公网TLS建连耗时
+    """
+
+    def __init__(self, handshake_delay=0.15, audio_frames=5):
+        self.handshake_delay = handshake_delay
+        self.audio_frames = audio_frames
+        self.connections_total = 0
+        self.connections_active = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await websockets.serve(
+            self._handler, "127.0.0.1", 0, process_request=self._delay_handshake
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{self.port}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _delay_handshake(self, connection, request):
+        await asyncio.sleep(self.handshake_delay)
+        return None
+
+    @staticmethod
+    def _frame(message_type, event, session_id, payload=b"{}"):
+        header = Header(
+            message_type=message_type,
+            message_type_specific_flags=MsgTypeFlagWithEvent,
+            serial_method=JSON,
+        ).as_bytes()
+        optional = Optional(event=event, sessionId=session_id).as_bytes()
+        return bytes(header) + bytes(optional) + len(payload).to_bytes(
+            4, "big", signed=True
+        ) + payload
+
+    @staticmethod
+    def _parse_request(message):
+        event = int.from_bytes(message[4:8], "big", signed=True)
+        size = int.from_bytes(message[8:12], "big", signed=True)
+        session_id = message[12 : 12 + size].decode("utf-8")
+        offset = 12 + size
+        payload_size = int.from_bytes(message[offset : offset + 4], "big", signed=True)
+        payload = message[offset + 4 : offset + 4 + payload_size]
+        return event, session_id, payload
+
+    async def _handler(self, ws):
+        self.connections_total += 1
+        self.connections_active += 1
+        try:
+            async for message in ws:
+                if (message[1] >> 4) != FULL_CLIENT_REQUEST:
+                    continue
+                event, session_id, payload = self._parse_request(message)
+                if event == EVENT_StartSession:
+                    await ws.send(
+                        self._frame(FULL_SERVER_RESPONSE, EVENT_SessionStarted, session_id)
+                    )
+                elif event == EVENT_TaskRequest:
+                    text = json.loads(payload)["req_params"]["text"]
+                    await ws.send(
+                        self._frame(
+                            FULL_SERVER_RESPONSE,
+                            EVENT_TTSSentenceStart,
+                            session_id,
+                            json.dumps({"text": text}).encode(),
+                        )
+                    )
+                    for _ in range(self.audio_frames):
+                        await ws.send(
+                            self._frame(
+                                AUDIO_ONLY_RESPONSE,
+                                EVENT_TTSResponse,
+                                session_id,
+                                bytes(1920),
+                            )
+                        )
+                    await ws.send(
+                        self._frame(FULL_SERVER_RESPONSE, EVENT_TTSSentenceEnd, session_id)
+                    )
+                elif event == EVENT_FinishSession:
+                    await ws.send(
+                        self._frame(FULL_SERVER_RESPONSE, EVENT_SessionFinished, session_id)
+                    )
+                elif event == EVENT_CancelSession:
+                    await ws.send(
+                        self._frame(FULL_SERVER_RESPONSE, EVENT_SessionCanceled, session_id)
+                    )
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections_active -= 1
+
+
+def _request(event, session_id, payload=b"{}"):
+    header = Header(
+        message_type=FULL_CLIENT_REQUEST,
+        message_type_specific_flags=MsgTypeFlagWithEvent,
+        serial_method=JSON,
+    ).as_bytes()
+    optional = Optional(event=event, sessionId=session_id).as_bytes()
+    return bytes(header) + bytes(optional) + len(payload).to_bytes(
+        4, "big", signed=True
+    ) + payload
+
+
+class TTSSessionPoolPerformanceTester:
+    def __init__(self, devices=20, turns=5, handshake_delay=0.15):
+        self.devices = devices
+        self.turns = turns
+        self.handshake_delay = handshake_delay
+        self.results = []
+
+    async def _bench_per_turn_connection(self, url):
+        """原有方式：每轮对话新建上游连接"""
+        latencies = []
+
+        async def device(index):
+            for turn in range(self.turns):
+                begin = time.perf_counter()
+                ws = await websockets.connect(url)
+                try:
+                    session_id = f"d{index}-t{turn}"
+                    await ws.send(_request(EVENT_StartSession, session_id))
+                    await ws.recv()
+                    latencies.append(time.perf_counter() - begin)
+                    await ws.send(_request(EVENT_FinishSession, session_id))
+                    await ws.recv()
+                finally:
+                    await ws.close()
+
+        await asyncio.gather(*(device(i) for i in range(self.devices)))
+        return latencies
+
+    async def _bench_pool(self, url, sessions_per_connection):
+        """连接池方式：多设备共享上游长连接"""
+        pool = StreamSessionPool(
+            name="fake_bidirectional_tts",
+            connect=functools.partial(websockets.connect, url),
+            route=route_session_message,
+            max_sessions_per_connection=sessions_per_connection,
+            min_idle=self.devices // sessions_per_connection,
+        )
+        await pool.prewarm()
+        latencies = []
+
+        async def device(index):
+            for turn in range(self.turns):
+                session_id = f"d{index}-t{turn}"
+                begin = time.perf_counter()
+                session = await pool.acquire(session_id)
+                await session.send(_request(EVENT_StartSession, session_id))
+                await session.recv()
+                latencies.append(time.perf_counter() - begin)
+                await session.send(_request(EVENT_FinishSession, session_id))
+                await session.recv()
+                await session.release()
+
+        try:
+            await asyncio.gather(*(device(i) for i in range(self.devices)))
+            stats = pool.get_stats()
+        finally:
+            await pool.close()
+        return latencies, stats
+
+    def _record(self, name, latencies, server, opened_before):
+        self.results.append(
+            [
+                name,
+                f"{statistics.mean(latencies) * 1000:.1f}",
+                f"{sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000:.1f}",
+                server.connections_total - opened_before,
+            ]
+        )
+
+    async def run(self):
+        server = FakeBidirectionalTTSServer(handshake_delay=self.handshake_delay)
+        url = await server.start()
+        try:
+            opened = server.connections_total
+            latencies = await self._bench_per_turn_connection(url)
+            self._record("每轮新建连接", latencies, server, opened)
+
+            for sessions_per_connection in (1, 4):
+                opened = server.connections_total
+                latencies, stats = await self._bench_pool(url, sessions_per_connection)
+                self._record(
+                    f"连接池(每连接{sessions_per_connection}会话)",
+                    latencies,
+                    server,
+                    opened,
+                )
+                print(f"连接池统计: {stats}")
+        finally:
+            await server.stop()
+
+        print(
+            f"\n设备数: {self.devices}，每设备对话轮数: {self.turns}，"
+            f"模拟建连延迟: {self.handshake_delay * 1000:.0f}ms"
+        )
+        print(
+            tabulate(
+                self.results,
+                headers=["方式", "会话启动平均(ms)", "会话启动P95(ms)", "上游连接数"],
+                tablefmt="grid",
+            )
+        )
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="双流式TTS连接池会话启动延迟测试")
+    parser.add_argument("--devices", type=int, default=20, help="并发设备数")
+    parser.add_argument("--turns", type=int, default=5, help="每个设备的对话轮数")
+    parser.add_argument(
+        "--handshake-delay", type=float, default=0.15, help="模拟建连延迟(秒)"
+    )
+    args, _ = parser.parse_known_args()
+    await TTSSessionPoolPerformanceTester(
+        args.devices, args.turns, args.handshake_delay
+    ).run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())